@@ -0,0 +1,288 @@
+"""
+Time the CRMFunctions methods and the BaseView list renderers on generated data at each scale,
+recording wall time, query count and peak memory, and compare them to a baseline.
+
+    python benchmarks/crm_functions.py --scales 1k,100k            # report and compare to the baseline
+    python benchmarks/crm_functions.py --scales 1k --update        # report and record a new baseline
+
+The data is generated in a throwaway test database of the configured engine,
+DB_ENGINE=sqlite DB_NAME=:memory: runs it without a MySQL server.
+"""
+import argparse
+import copy
+import gc
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+from itertools import count
+from pathlib import Path
+from typing import Callable, Dict, List
+from unittest.mock import patch
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "epic_events_CRM.settings")
+
+import django
+
+django.setup()
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from crm.models import Collaborator, Client, Contract, Evenement
+from services.crm_functions import CRMFunctions
+from services.dashboard import dashboard_cache
+from services.reference_cache import reference_cache
+from services.reporting import reporter
+from views.crm_base_view import BaseView
+
+
+BASELINE_PATH = Path(__file__).resolve().parent / "crm_functions_baseline.json"
+
+# Allowed slowdown against the baseline before the benchmark fails,
+# the query count and the peak memory must not grow at all
+TOLERANCE = 1.5
+# Scales of generate_crm_data with a recorded baseline, 1m takes too long to generate for each run
+SCALES = ("1k", "100k")
+# Past the generated events, the support contacts are free on this day
+FREE_DAY = date(2099, 1, 5)
+
+
+class Rollback(Exception):
+    pass
+
+
+def rolled_back(action: Callable) -> Callable:
+    """
+    Run a writing action in a transaction rolled back afterwards, so that every run
+    and every case sees the same data. The actions work on copies of the objects
+    since the services modify the instances they are given
+    """
+    def run():
+        try:
+            with transaction.atomic():
+                action()
+                raise Rollback
+        except Rollback:
+            pass
+    return run
+
+
+def build_cases() -> Dict[str, Callable]:
+    """
+    The benchmarked actions. Query sets are consumed the way the views do, one page at a time
+    """
+    crm = CRMFunctions()
+    view = BaseView()
+    unique = count()
+
+    sales = Collaborator.objects.filter(role__name="sales").order_by("id").first()
+    support = Collaborator.objects.filter(role__name="support").order_by("id").first()
+    other_sales = CRMFunctions.get_reassignment_candidates(sales).first()
+    client = Client.objects.filter(commercial_contact=sales).order_by("id").first()
+    contract = Contract.objects.filter(client_infos=client).order_by("id").first()
+    event = Evenement.objects.order_by("id").first()
+    middle_event_id = Evenement.objects.order_by("-id").values_list("id", flat=True).first() // 2
+    calendar_start = Evenement.objects.filter(support_contact=support).order_by("day_start").values_list(
+        "day_start", flat=True).first()
+    # The last month of the generated events, fixed whatever today's date
+    planning_start = Evenement.objects.order_by("-day_start").values_list("day_start", flat=True).first() - \
+        timedelta(days=30)
+    crm.load_permissions(sales)
+
+    def free_days(event):
+        # The generated support contacts are booked most days, a double booking would be refused
+        event = copy.copy(event)
+        event.day_start, event.date_end = FREE_DAY, FREE_DAY + timedelta(days=1)
+        return event
+
+    def page(objects):
+        return lambda: crm.get_page(objects)
+
+    first_page = {object_type: list(crm.get_page(crm.get_all_objects(object_type)).objects)
+                  for object_type in ("collaborators", "clients", "contracts", "events")}
+
+    cases = {
+        "authenticate_collaborator": lambda: crm.authenticate_collaborator(sales.username, "generated"),
+        "load_permissions": lambda: crm.load_permissions(sales),
+        "has_permission": lambda: crm.has_permission(sales, "crm.add_client"),
+        "invalidate_permissions": lambda: crm.invalidate_permissions(support.id),
+        "register_collaborator": rolled_back(lambda: crm.register_collaborator(
+            "Bench", "Mark", f"bench{next(unique)}", "benchMdp1", f"bench{next(unique)}@example.net", "support",
+            f"bench{next(unique)}")),
+        "get_all_objects:collaborators": page(crm.get_all_objects("collaborators")),
+        "get_all_objects:clients": page(crm.get_all_objects("clients")),
+        "get_all_objects:contracts": page(crm.get_all_objects("contracts")),
+        "get_all_objects:events": page(crm.get_all_objects("events")),
+        "has_objects": lambda: crm.has_objects(crm.get_all_objects("events")),
+        "get_page:jump": lambda: crm.get_page(crm.get_all_objects("events"), from_id=middle_event_id),
+        "get_page:previous": lambda: crm.get_page(crm.get_all_objects("events"), before_id=middle_event_id),
+        "modify_item": rolled_back(lambda: crm.modify_item(copy.copy(client), {"phone": "0612345678"})),
+        "modify_collaborator": rolled_back(lambda: crm.modify_collaborator(copy.copy(support),
+                                                                           {"first_name": "Bench"})),
+        "delete_collaborator": rolled_back(lambda: crm.delete_collaborator(copy.copy(sales))),
+        "delete_collaborator:reassign": rolled_back(lambda: crm.delete_collaborator(copy.copy(sales), other_sales)),
+        "create_contract": rolled_back(lambda: crm.create_contract(client, sales, 1000, 100, "signed")),
+        "modify_contract": rolled_back(lambda: crm.modify_contract(copy.copy(contract), {"due": 0})),
+        "get_support_collaborators": crm.get_support_collaborators,
+        "get_all_events_with_optional_filter:all": page(crm.get_all_events_with_optional_filter()),
+        "get_all_events_with_optional_filter:assigned": page(crm.get_all_events_with_optional_filter(True)),
+        "get_all_events_with_optional_filter:unassigned": page(crm.get_all_events_with_optional_filter(False)),
+        "add_support_contact_to_event": rolled_back(lambda: crm.add_support_contact_to_event(free_days(event),
+                                                                                             support)),
+        "create_client": rolled_back(lambda: crm.create_client(
+            "bench client", f"bench{next(unique)}@client.com", "0600000000", "bench company", sales)),
+        "modify_client": rolled_back(lambda: crm.modify_client(copy.copy(client),
+                                                               {"company_name": "bench company"})),
+        "get_clients_for_collaborator": page(crm.get_clients_for_collaborator(sales.id)),
+        "create_event": rolled_back(lambda: crm.create_event(
+            contract, client.name, "bench event", "John Doe", support.username, FREE_DAY,
+            FREE_DAY + timedelta(days=1), "Paris", 50, "Bench")),
+        "get_events_for_collaborator": page(crm.get_events_for_collaborator(support.id)),
+        "count_assignments": lambda: crm.count_assignments(sales),
+        "search": lambda: crm.search(f"{client.name} {client.company_name}"),
+        "get_calendar": lambda: list(crm.get_calendar(support.id, calendar_start)),
+        # The dashboard is cached, each run computes it again
+        "get_management_dashboard": lambda: (dashboard_cache.clear(), crm.get_management_dashboard()),
+        "plan_support_assignments": lambda: crm.plan_support_assignments(since=planning_start),
+        "get_commercial_summaries": lambda: list(crm.get_commercial_summaries()),
+    }
+    for filter_type in (None, "signed", "not_signed", "no_fully_paid"):
+        cases[f"get_filtered_contracts_for_collaborator:{filter_type}"] = page(
+            crm.get_filtered_contracts_for_collaborator(sales.id, filter_type))
+
+    # BaseView has no collaborators renderer, the list views show clients, contracts and events
+    for object_type in ("clients", "contracts", "events"):
+        objects = first_page[object_type]
+        cases[f"BaseView.display_list:{object_type}"] = (
+            lambda object_type=object_type: view.display_list(crm.get_all_objects(object_type), object_type))
+        cases[f"BaseView.display_list_page:{object_type}"] = (
+            lambda object_type=object_type, objects=objects: view.display_list_page(objects, object_type))
+    cases["BaseView.display_objects_for_selection"] = lambda: view.display_objects_for_selection(
+        first_page["clients"])
+    cases["BaseView.display_clients_for_selection"] = lambda: view.display_clients_for_selection(
+        first_page["clients"])
+    cases["BaseView.display_contracts_for_selection"] = lambda: view.display_contracts_for_selection(
+        first_page["contracts"])
+    cases["BaseView.display_events_for_selection"] = lambda: view.display_events_for_selection(
+        first_page["events"])
+    return cases
+
+
+def measure(action: Callable, repeat: int) -> dict:
+    """
+    Best wall time of repeat runs, then one more run counting the queries and tracing the memory,
+    which slows the code down too much to be timed. A first run is not measured, the lazy
+    imports and caches it initialises would be counted in the peak memory
+    """
+    action()
+    # The events it reported are sent by a background thread, which imports Sentry the first time
+    reporter.flush()
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        action()
+        timings.append(time.perf_counter() - started)
+
+    # Otherwise the thread would be traced with the measured run
+    reporter.flush()
+    gc.collect()
+    # The printed output of the earlier runs is dropped, the growing buffer would count in the peak
+    output = io.StringIO()
+    tracemalloc.start()
+    with CaptureQueriesContext(connection) as queries, redirect_stdout(output):
+        action()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {"time_ms": round(min(timings) * 1000, 3), "queries": len(queries), "peak_kb": round(peak / 1024, 1)}
+
+
+def run_scale(scale: str, repeat: int) -> Dict[str, dict]:
+    call_command("generate_crm_data", scale=scale, clear=True, verbosity=0, stdout=io.StringIO())
+    reference_cache.clear()
+    results = {}
+    # The views and some services print, the list views wait for a navigation choice
+    with redirect_stdout(io.StringIO()), patch("click.prompt", return_value="q"):
+        for name, action in build_cases().items():
+            try:
+                results[name] = measure(action, repeat)
+            except Exception as e:
+                # Reported instead of stopping the run, a renderer or service may be broken at this point
+                results[name] = {"error": f"{type(e).__name__}: {e}"}
+    return results
+
+
+def compare(report: dict, baseline: dict) -> List[str]:
+    failures = []
+    for scale, results in report.items():
+        for name, result in results.items():
+            expected = baseline.get(scale, {}).get(name)
+            if expected is None:
+                continue
+            if "error" in expected:
+                # A case broken when the baseline was recorded is not monitored until it is fixed
+                failures.append(f"{scale} {name}: the baseline records an error, {expected['error']}")
+                continue
+            if "error" in result:
+                failures.append(f"{scale} {name}: {result['error']}")
+                continue
+            if result["time_ms"] > expected["time_ms"] * TOLERANCE:
+                failures.append(f"{scale} {name}: {result['time_ms']}ms, baseline {expected['time_ms']}ms")
+            if result["queries"] > expected["queries"]:
+                failures.append(f"{scale} {name}: {result['queries']} queries, baseline {expected['queries']}")
+            if result["peak_kb"] > expected["peak_kb"] * TOLERANCE:
+                failures.append(f"{scale} {name}: {result['peak_kb']}KB peak, baseline {expected['peak_kb']}KB")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="1k", help=f"Comma separated scales among {', '.join(SCALES)}")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--update", action="store_true", help="Record the measures as the new baseline")
+    args = parser.parse_args()
+    scales = args.scales.split(",")
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"unknown scales {', '.join(unknown)}, expected {', '.join(SCALES)}")
+
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        report = {scale: run_scale(scale, args.repeat) for scale in scales}
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    for scale, results in report.items():
+        print(f"\n{scale}")
+        for name, result in results.items():
+            if "error" in result:
+                print(f"  {name:<60} {result['error']}")
+            else:
+                print(f"  {name:<60} {result['time_ms']:>10.3f}ms {result['queries']:>4} queries "
+                      f"{result['peak_kb']:>10.1f}KB")
+
+    failures = []
+    if args.update:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        baseline.update(report)
+        args.baseline.write_text(json.dumps(baseline, indent=4) + "\n")
+        print(f"\nBaseline written to {args.baseline}")
+    elif args.baseline.exists():
+        failures = compare(report, json.loads(args.baseline.read_text()))
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
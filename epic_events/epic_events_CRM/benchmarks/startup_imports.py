@@ -0,0 +1,103 @@
+"""
+Measure the time to the login prompt with python -X importtime and compare it to a baseline.
+
+    python benchmarks/startup_imports.py            # report and compare to the baseline
+    python benchmarks/startup_imports.py --update   # report and record a new baseline
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Tuple
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+BASELINE_PATH = Path(__file__).resolve().parent / "startup_baseline.json"
+
+# Modules that are imported once logged in and must stay out of the startup
+DEFERRED_MODULES = ("controllers.menus", "views.menus", "sentry_sdk")
+
+# Allowed slowdown against the baseline before the benchmark fails
+TOLERANCE = 1.2
+
+
+def parse_importtime(output: str) -> Tuple[Dict[str, int], int]:
+    """
+    Read the -X importtime report and return the cumulative time of each module
+    and the total import time, in microseconds
+    """
+    modules = {}
+    total = 0
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_time, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative)
+        # Only top level imports add up, the nested ones are in their cumulative time
+        if not name[1:].startswith(" "):
+            total += int(cumulative)
+    return modules, total
+
+
+def measure(runs: int) -> dict:
+    """
+    Import main, which stops right before the login prompt, in fresh interpreters
+    and report the median time to prompt with the slowest imports of the median run
+    """
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                                   cwd=BASE_DIR, capture_output=True, text=True, check=True)
+        samples.append((time.perf_counter() - started, completed.stderr))
+
+    samples.sort(key=lambda sample: sample[0])
+    wall_time, output = samples[len(samples) // 2]
+    modules, total = parse_importtime(output)
+    slowest = sorted(((name, cumulative) for name, cumulative in modules.items() if "." not in name),
+                     key=lambda item: item[1], reverse=True)[:10]
+
+    return {
+        "time_to_prompt_ms": round(wall_time * 1000, 1),
+        "import_time_ms": round(total / 1000, 1),
+        "imported_modules": len(modules),
+        "slowest_top_level_imports_ms": {name: round(cumulative / 1000, 1) for name, cumulative in slowest},
+        "deferred_modules_loaded": sorted(name for name in modules if name.startswith(DEFERRED_MODULES)),
+        "spread_ms": round(statistics.pstdev(sample[0] for sample in samples) * 1000, 1),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--update", action="store_true", help="Record the measure as the new baseline")
+    args = parser.parse_args()
+
+    report = measure(args.runs)
+    print(json.dumps(report, indent=4))
+
+    failures = []
+    if report["deferred_modules_loaded"]:
+        failures.append(f"Modules loaded before the prompt: {', '.join(report['deferred_modules_loaded'])}")
+
+    if args.update:
+        args.baseline.write_text(json.dumps(report, indent=4) + "\n")
+        print(f"Baseline written to {args.baseline}")
+    elif args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+        limit = baseline["time_to_prompt_ms"] * TOLERANCE
+        if report["time_to_prompt_ms"] > limit:
+            failures.append(f"Time to prompt {report['time_to_prompt_ms']}ms is over {limit:.1f}ms "
+                            f"(baseline {baseline['time_to_prompt_ms']}ms)")
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
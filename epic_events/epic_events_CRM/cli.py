@@ -0,0 +1,307 @@
+"""
+Non-interactive commands over the CRM services, for scripts and scheduled jobs.
+
+    python cli.py token create
+    python cli.py contracts list --status signed --owner me --format jsonl
+    python cli.py events assign --event 12 --support emma
+    python cli.py events auto-assign --max-attendees 200 --apply
+    python cli.py events calendar --support emma --start 2024-05-06
+    python cli.py search "acme paris" --format jsonl
+
+Credentials come from CRM_TOKEN, or from CRM_USERNAME and CRM_PASSWORD.
+"""
+import json
+import os
+import sys
+from datetime import date
+from typing import Optional
+import click
+import django
+from dotenv import load_dotenv
+
+load_dotenv()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "epic_events_CRM.settings")
+django.setup()
+
+from django.core.exceptions import ValidationError
+from django.db.models import QuerySet
+from rich.console import Console
+from rich.table import Table
+from crm.management.commands.export_crm import EXPORTS, Command as ExportCommand, to_text
+from controllers.menus.general_controller import GeneralController
+from crm.models import Collaborator
+from services.calendar import week_of
+from services.crm_functions import CRMFunctions
+from services.reporting import capture_message, init_sentry_in_background, operation
+from views.menus.general_view import GeneralView
+from views.menus.management_view import ManagementView
+
+
+FORMATS = ["table", "csv", "jsonl"]
+
+
+def login() -> Collaborator:
+    """
+    Authenticate the collaborator from CRM_TOKEN, or CRM_USERNAME and CRM_PASSWORD
+    """
+    with operation("cli.login", "login"):
+        try:
+            if os.getenv("CRM_TOKEN"):
+                collaborator = CRMFunctions.authenticate_token(os.getenv("CRM_TOKEN"))
+            elif os.getenv("CRM_USERNAME") and os.getenv("CRM_PASSWORD"):
+                collaborator = CRMFunctions.authenticate_collaborator(os.getenv("CRM_USERNAME"),
+                                                                      os.getenv("CRM_PASSWORD"))
+            else:
+                raise click.ClickException("Set CRM_TOKEN, or CRM_USERNAME and CRM_PASSWORD.")
+        except ValidationError as e:
+            raise click.ClickException(f"Login failed: {e.messages[0]}")
+        CRMFunctions.load_permissions(collaborator)
+    return collaborator
+
+
+def require(collaborator: Collaborator, permission: str, role: Optional[str] = None) -> None:
+    if not CRMFunctions.has_permission(collaborator, permission) or (
+            role and (collaborator.role is None or collaborator.role.name != role)):
+        capture_message(f"Unauthorized command attempt by collaborator: {collaborator.username}"
+                        f" needing {permission}.", level="info")
+        raise click.ClickException("You do not have permission to run this command.")
+
+
+def find_collaborator(collaborator: Collaborator, username: str) -> Collaborator:
+    """
+    The logged in collaborator for "me", otherwise the collaborator with this username
+    """
+    if username == "me":
+        return collaborator
+    found = Collaborator.objects.filter(username=username).first()
+    if found is None:
+        raise click.ClickException(f"No collaborator with the username {username}.")
+    return found
+
+
+def write(objects: QuerySet, table: str, output_format: str) -> None:
+    """
+    Stream the objects in the columns of the export_crm command
+    """
+    model, columns = EXPORTS[table]
+    rows = ExportCommand.stream(objects.values(*[lookup for name, lookup in columns]).order_by("id"), 2000)
+    if output_format != "table":
+        ExportCommand.write_rows(rows, columns, output_format, sys.stdout)
+        return
+
+    view = Table(show_header=True, header_style="bold magenta")
+    for name, lookup in columns:
+        view.add_column(name)
+    for row in rows:
+        view.add_row(*["" if row[lookup] is None else str(to_text(row[lookup])) for name, lookup in columns])
+    Console().print(view)
+
+
+class TracedCommand(click.Command):
+    """
+    Command run in a Sentry transaction of the cli.command operation
+    """
+    def invoke(self, ctx: click.Context):
+        with operation("cli.command", ctx.command_path):
+            return super().invoke(ctx)
+
+
+class TracedGroup(click.Group):
+    command_class = TracedCommand
+    group_class = type
+
+
+@click.group(cls=TracedGroup)
+def crm():
+    """Epic Events CRM commands"""
+    # Scripts without Sentry configured never import it, otherwise it starts while the command runs
+    if os.getenv("SENTRY_DSN"):
+        init_sentry_in_background()
+
+
+@crm.group()
+def token():
+    """Access tokens"""
+
+
+@token.command("create")
+def token_create():
+    """Print an access token to use as CRM_TOKEN"""
+    if not os.getenv("CRM_TOKEN") and not os.getenv("CRM_PASSWORD"):
+        os.environ["CRM_USERNAME"] = os.getenv("CRM_USERNAME") or click.prompt("Username")
+        os.environ["CRM_PASSWORD"] = click.prompt("Password", hide_input=True)
+    click.echo(CRMFunctions.create_token(login()))
+
+
+@crm.group()
+def clients():
+    """Clients"""
+
+
+@clients.command("list")
+@click.option("--owner", help="Username of the commercial contact, or me")
+@click.option("--format", "output_format", type=click.Choice(FORMATS), default="table")
+def clients_list(owner, output_format):
+    """List the clients"""
+    collaborator = login()
+    require(collaborator, "crm.view_client")
+    if owner:
+        objects = CRMFunctions.get_clients_for_collaborator(find_collaborator(collaborator, owner).id)
+    else:
+        objects = CRMFunctions.get_all_objects("clients")
+    write(objects, "clients", output_format)
+
+
+@crm.group()
+def contracts():
+    """Contracts"""
+
+
+@contracts.command("list")
+@click.option("--status", type=click.Choice(["signed", "not_signed"]))
+@click.option("--unpaid", is_flag=True, help="Only the contracts not fully paid")
+@click.option("--owner", help="Username of the commercial contact of the client, or me")
+@click.option("--format", "output_format", type=click.Choice(FORMATS), default="table")
+def contracts_list(status, unpaid, owner, output_format):
+    """List the contracts"""
+    collaborator = login()
+    require(collaborator, "crm.view_contract")
+    if owner:
+        objects = CRMFunctions().get_filtered_contracts_for_collaborator(find_collaborator(collaborator, owner).id,
+                                                                         status)
+    else:
+        objects = CRMFunctions.get_all_objects("contracts")
+        if status:
+            objects = objects.filter(status=status)
+    if unpaid:
+        objects = objects.filter(due__gt=0)
+    write(objects, "contracts", output_format)
+
+
+@crm.group()
+def events():
+    """Events"""
+
+
+@events.command("list")
+@click.option("--support", help="Username of the support contact, me, or none for the unassigned events")
+@click.option("--format", "output_format", type=click.Choice(FORMATS), default="table")
+def events_list(support, output_format):
+    """List the events"""
+    collaborator = login()
+    require(collaborator, "crm.view_event")
+    if support == "none":
+        objects = CRMFunctions.get_all_events_with_optional_filter(support_contact_required=False)
+    elif support:
+        objects = CRMFunctions.get_events_for_collaborator(find_collaborator(collaborator, support).id)
+    else:
+        objects = CRMFunctions.get_all_events_with_optional_filter()
+    write(objects, "events", output_format)
+
+
+@events.command("calendar")
+@click.option("--support", default="me", show_default=True, help="Username of the support contact, or me")
+@click.option("--start", type=click.DateTime(formats=["%Y-%m-%d"]), help="First day, the current week by default")
+@click.option("--days", type=click.IntRange(min=1), default=7, show_default=True)
+@click.option("--format", "output_format", type=click.Choice(FORMATS), default="table")
+def events_calendar(support, start, days, output_format):
+    """List the events of a support contact overlapping the days, flagging double bookings"""
+    collaborator = login()
+    require(collaborator, "crm.view_event")
+    start = start.date() if start else week_of(date.today())[0]
+    objects = CRMFunctions.get_calendar(find_collaborator(collaborator, support).id, start, days)
+    if output_format != "table":
+        write(objects, "events", output_format)
+        return
+    events = list(objects)
+    double_booked = {event_id for pair in CRMFunctions.find_double_bookings(events) for event_id in pair}
+    GeneralView.display_calendar(events, start, days, double_booked)
+
+
+@events.command("auto-assign")
+@click.option("--max-attendees", type=click.IntRange(min=1), help="Largest event a support contact can handle")
+@click.option("--since", type=click.DateTime(formats=["%Y-%m-%d"]), help="First day of the events, today by default")
+@click.option("--apply", "apply_plan", is_flag=True, help="Apply the plan instead of only showing it")
+def events_auto_assign(max_attendees, since, apply_plan):
+    """Plan support contacts for the events without one, balancing their load"""
+    collaborator = login()
+    require(collaborator, "crm.view_event", role="management")
+    plan = CRMFunctions.plan_support_assignments(max_attendees, since.date() if since else None)
+    ManagementView.display_assignment_plan(plan)
+    if apply_plan:
+        click.echo(f"{CRMFunctions.apply_support_assignments(plan)} events assigned.")
+    else:
+        click.echo(f"{len(plan.assignments)} events would be assigned, run again with --apply to assign them.")
+
+
+@events.command("assign")
+@click.option("--event", "event_id", type=int, required=True)
+@click.option("--support", required=True, help="Username of the support collaborator")
+def events_assign(event_id, support):
+    """Assign a support collaborator to an event"""
+    collaborator = login()
+    require(collaborator, "crm.view_event", role="management")
+    event = CRMFunctions.get_all_events_with_optional_filter().filter(id=event_id).first()
+    if event is None:
+        raise click.ClickException(f"No event with the id {event_id}.")
+    support_contact = next((contact for contact in CRMFunctions.get_support_collaborators()
+                            if contact.username == support), None)
+    if support_contact is None:
+        raise click.ClickException(f"No support collaborator with the username {support}.")
+    try:
+        CRMFunctions.add_support_contact_to_event(event, support_contact)
+    except ValidationError as e:
+        raise click.ClickException(e.messages[0])
+    click.echo(f"Event {event.id} assigned to {support_contact.username}.")
+
+
+@crm.command("search")
+@click.argument("text")
+@click.option("--limit", type=click.IntRange(min=1), default=20, show_default=True,
+              help="Maximum number of results of each kind")
+@click.option("--format", "output_format", type=click.Choice(["table", "jsonl"]), default="table")
+def search_command(text, limit, output_format):
+    """Search the clients, contracts and events, best matches first"""
+    collaborator = login()
+    results = {object_type: objects for object_type, objects in CRMFunctions.search(text, limit).items()
+               if CRMFunctions.has_permission(collaborator, GeneralController.SEARCH_PERMISSIONS[object_type])}
+    if output_format == "table":
+        GeneralView.display_search_results(results)
+        return
+    for client in results.get("clients", []):
+        click.echo(json.dumps({"type": "client", "id": client.id, "name": client.name,
+                               "company_name": client.company_name, "email": client.email}))
+    for contract in results.get("contracts", []):
+        click.echo(json.dumps({"type": "contract", "id": contract.id, "client": contract.client_infos.name,
+                               "value": contract.value, "due": contract.due, "status": contract.status}))
+    for event in results.get("events", []):
+        click.echo(json.dumps({"type": "event", "id": event.id, "name": event.name, "client": event.client_name,
+                               "day_start": to_text(event.day_start), "location": event.location}))
+
+
+@crm.command()
+@click.option("--days", type=click.IntRange(min=0), default=30, show_default=True,
+              help="Horizon of the upcoming events")
+@click.option("--months", type=click.IntRange(min=1), default=12, show_default=True,
+              help="Months of signed revenue")
+@click.option("--format", "output_format", type=click.Choice(["table", "json"]), default="table")
+def dashboard(days, months, output_format):
+    """Show the management KPIs"""
+    collaborator = login()
+    require(collaborator, "crm.view_event", role="management")
+    figures = CRMFunctions.get_management_dashboard(days, months)
+    if output_format == "table":
+        ManagementView().display_dashboard(figures)
+        return
+    click.echo(json.dumps({
+        **figures,
+        "top_debtors": [{"client": summary.client.name, "contract_count": summary.contract_count,
+                         "total_due": summary.total_due} for summary in figures["top_debtors"]],
+        "upcoming_events": [{"id": event.id, "client": event.client_name, "day_start": event.day_start,
+                             "support_contact": event.support_contact.username if event.support_contact else None}
+                            for event in figures["upcoming_events"]],
+    }, default=to_text, indent=2))
+
+
+if __name__ == "__main__":
+    crm(prog_name="crm")
@@ -1,16 +1,28 @@
+from importlib import import_module
 from typing import Optional
 from django.core.exceptions import ValidationError
 from crm.models import Collaborator
 from services.crm_functions import CRMFunctions
+from services.reporting import operation
 from views.crm_views import CRMView
-from controllers.menus.management_controller import ManagementController
-from controllers.menus.sales_controller import SalesController
-from views.menus.management_view import ManagementView
-from views.menus.general_view import GeneralView
-from views.menus.sales_view import SalesView
-from controllers.menus.general_controller import GeneralController
-from controllers.menus.support_controller import SupportController
-from views.menus.support_view import SupportView
+
+
+# Controller and view of each role, imported only once a collaborator
+# with this role is logged in so that startup loads the login path alone
+ROLE_MENUS = {
+    "support": ("controllers.menus.support_controller.SupportController", "views.menus.support_view.SupportView"),
+    "sales": ("controllers.menus.sales_controller.SalesController", "views.menus.sales_view.SalesView"),
+    "management": ("controllers.menus.management_controller.ManagementController",
+                   "views.menus.management_view.ManagementView"),
+}
+
+
+def import_class(path: str) -> type:
+    """
+    Import the class from its dotted path
+    """
+    module_path, class_name = path.rsplit(".", 1)
+    return getattr(import_module(module_path), class_name)
 
 
 class CRMController:
@@ -26,8 +38,9 @@ class CRMController:
         """
         login_data = self.view_cli.prompt_login()
         try:
-
-            user = self.crm_services.authenticate_collaborator(**login_data)
+            with operation("cli.login", "login"):
+                user = self.crm_services.authenticate_collaborator(**login_data)
+                self.crm_services.load_permissions(user)
             self.view_cli.display_info_message("Logged in successfully!")
             return user
         except ValidationError as e:
@@ -51,24 +64,17 @@ class CRMController:
             self.view_cli.display_warning_message("Your account does not have a role assigned")
             return
 
-        match role_name:
-            case "support":
-                view_cli = SupportView()
-                general_view = GeneralView()
-                general_controller = GeneralController(collaborator, self.crm_services, general_view)
-                support_role_controller = SupportController(collaborator, self.crm_services, view_cli, general_controller,general_view)
-                support_role_controller.start()
-            case "sales":
-                view_cli = SalesView()
-                general_view = GeneralView()
-                general_controller = GeneralController(collaborator, self.crm_services, general_view)
-                sales_role_controller = SalesController(collaborator, self.crm_services, view_cli, general_controller,general_view)
-                sales_role_controller.start()
-            case "management":
-                view_cli = ManagementView()
-                general_view = GeneralView()
-                general_controller = GeneralController(collaborator, self.crm_services, general_view)
-                management_role_controller = ManagementController(collaborator, self.crm_services, view_cli, general_controller, general_view)
-                management_role_controller.start()
-            case _:
-                self.view_cli.display_warning_message("Your role does not have specific task assigned.")
+        if role_name not in ROLE_MENUS:
+            self.view_cli.display_warning_message("Your role does not have specific task assigned.")
+            return
+
+        controller_path, view_path = ROLE_MENUS[role_name]
+        role_controller_class, role_view_class = import_class(controller_path), import_class(view_path)
+        from controllers.menus.general_controller import GeneralController
+        from views.menus.general_view import GeneralView
+
+        general_view = GeneralView()
+        general_controller = GeneralController(collaborator, self.crm_services, general_view)
+        role_controller = role_controller_class(collaborator, self.crm_services, role_view_class(),
+                                                general_controller, general_view)
+        role_controller.start()
@@ -1,13 +1,16 @@
-from crm.models import Collaborator, Client, Contract, Evenement
+from crm.models import Collaborator, Client, Contract, Evenement, ConcurrentModificationError
 from services.crm_functions import CRMFunctions
 from views.menus.general_view import GeneralView
 from typing import Any, List, Optional
 from django.core.exceptions import ValidationError
 from django.db import DatabaseError
-from sentry_sdk import capture_message, capture_exception
+from django.db.models import QuerySet
+from services.reporting import capture_message, capture_exception
 
 
 class GeneralController:
+    # Permission needed to see each kind of search result
+    SEARCH_PERMISSIONS = {"clients": "crm.view_client", "contracts": "crm.view_contract", "events": "crm.view_event"}
 
     def __init__(self, collaborator: Collaborator,
                 services_crm: CRMFunctions,
@@ -23,33 +26,25 @@ class GeneralController:
             """
             # check for permissions
             if object_type.lower() == "clients":
-                if not self.collaborator.has_perm("crm.add_client"):
+                if not self.services_crm.has_permission(self.collaborator, "crm.add_client"):
                     capture_message(f"Unauthorized access attempt by collaborator: {self.collaborator.username}"
                                 f" to manage {object_type}.", level="info")
                     self.general_view.display_error_message(f"You do not have permission to manage {object_type}.")
                     return
             elif object_type.lower() == "collaborators":
-                if not self.collaborator.has_perm("crm.manage_collaborators"):
+                if not self.services_crm.has_permission(self.collaborator, "crm.manage_collaborators"):
                     capture_message(f"Unauthorized access attempt by collaborator: {self.collaborator.username}"
                                 f" to manage {object_type}.", level="info")
                     self.general_view.display_error_message(f"You do not have permission to manage {object_type}.")
                     return
             elif object_type.lower() == "contracts":
-                if not self.collaborator.has_perm("crm.manage_contracts_creation_modification"):
+                if not self.services_crm.has_permission(self.collaborator, "crm.manage_contracts_creation_modification"):
                     capture_message(f"Unauthorized access attempt by collaborator: {self.collaborator.username}"
                                     f" to manage {object_type}.", level="info")
                     self.general_view.display_error_message(f"You do not have permission to manage {object_type}.")
                     return
             elif object_type.lower() == "events":
-                permissions = self.collaborator.get_all_permissions()
-
-                print("Permissions de l'utilisateur :")
-
-                for perm in permissions:
-                    print(perm)
-
-                print("our object type", object_type)
-                if not self.collaborator.has_perm("crm.add_event"):
+                if not self.services_crm.has_permission(self.collaborator, "crm.add_event"):
                     capture_message(f"Unauthorized access attempt by collaborator: {self.collaborator.username}"
                                     f" to manage {object_type}.", level="info")
                     self.general_view.display_error_message(f"You do not have permission to manage {object_type}.")
@@ -79,7 +74,7 @@ class GeneralController:
                 contracts = CRMFunctions.get_all_objects('contracts')
                 print(f'the clients are {clients}')
                 print(f'the contracts are {contracts}')
-                if not clients:
+                if not self.services_crm.has_objects(clients):
                     print("No clients for the moment")
                     return
                 selected_contract = self.select_object_from(clients, "contracts")
@@ -105,7 +100,7 @@ class GeneralController:
                 self.general_view.clear_screen()
                 signed_contracts = self.get_contracts_assigned_to(self.collaborator.id, filter_type="signed")
                 print('signed contracts', signed_contracts)
-                if not signed_contracts:
+                if not self.services_crm.has_objects(signed_contracts):
                     return
 
                 selected_contract = self.select_object_from(signed_contracts, "Events")
@@ -139,7 +134,7 @@ class GeneralController:
             self.general_view.display_error_message(str(e))
             return []
 
-        if not contracts:
+        if not self.services_crm.has_objects(contracts):
             self.general_view.display_info_message("There are no contracts to display")
         return contracts
 
@@ -152,6 +147,9 @@ class GeneralController:
         self.general_view.clear_screen()
         self.general_view.display_object_details(signed_contract)
         event_data = self.general_view.get_data_for_add_new_event()
+        if event_data is None:
+            self.general_view.display_info_message("Event creation cancelled.")
+            return
 
         event_data["contract"] = signed_contract
 
@@ -180,7 +178,11 @@ class GeneralController:
         """
         self.general_view.clear_screen()
 
-        print('list of objects', list_of_objects)
+        if isinstance(list_of_objects, QuerySet):
+            # Only the displayed page is fetched, the selected object is returned by the view
+            selected_object = self.general_view.select_object_in_pages(list_of_objects, object_type, message)
+            print(f"Selected object: {selected_object}")
+            return selected_object
 
         self.general_view.display_objects_for_selection(list_of_objects)
 
@@ -250,7 +252,7 @@ class GeneralController:
             our_objects = CRMFunctions.get_all_objects(object_type)
             print('apres')
             print(our_objects, 'la liste des objets')
-        if not our_objects:
+        if not self.services_crm.has_objects(our_objects):
             return
         print(our_objects, 'la liste des objets')
         selected_object = self.select_object_from(our_objects, object_type)
@@ -285,6 +287,8 @@ class GeneralController:
                 self.general_view.clear_screen()
                 self.general_view.display_item_details(client_modified)
                 self.general_view.display_info_message("The client has been modified successfully.")
+            except ConcurrentModificationError as e:
+                self.general_view.display_error_message(e.message)
             except ValidationError as e:
                 self.general_view.display_error_message(str(e))
             except DatabaseError:
@@ -307,6 +311,8 @@ class GeneralController:
                 self.general_view.display_object_details(contract_modified)
                 self.general_view.display_info_message("The contract has been modified successfully.")
                 return
+            except ConcurrentModificationError as e:
+                self.general_view.display_error_message(e.message)
             except ValidationError as e:
                 self.general_view.display_error_message(str(e))
             except DatabaseError:
@@ -329,6 +335,9 @@ class GeneralController:
                     self.general_view.display_item_details(collaborator_modified)
                     self.general_view.display_info_message("The collaborator has been modified successfully.")
                     break
+                except ConcurrentModificationError as e:
+                    self.general_view.display_error_message(e.message)
+                    break
                 except Exception as e:
                     self.general_view.display_error_message(str(e))
                     break
@@ -346,6 +355,8 @@ class GeneralController:
                 self.general_view.clear_screen()
                 self.general_view.display_item_details(event_modified)
                 self.general_view.display_info_message("The event has been modified successfully.")
+            except ConcurrentModificationError as e:
+                self.general_view.display_error_message(e.message)
             except ValidationError as e:
                 self.general_view.display_error_message(str(e))
             except DatabaseError:
@@ -400,7 +411,7 @@ class GeneralController:
             self.general_view.display_error_message(str(e))
             return []
 
-        if not events:
+        if not self.services_crm.has_objects(events):
             self.general_view.display_info_message("There is no events available to display.")
 
         return events
@@ -415,25 +426,25 @@ class GeneralController:
         self.general_view.clear_screen()
         objects = CRMFunctions.get_all_objects(object_type)
 
-        if not objects:
+        if not self.services_crm.has_objects(objects):
             print(f"No {object_type} found.")
             return
 
         if object_type.lower() == "collaborators":
-            if not self.collaborator.has_perm("crm.manage_collaborators"):
+            if not self.services_crm.has_permission(self.collaborator, "crm.manage_collaborators"):
                 capture_message(f"Unauthorized access attempt by collaborator: {self.collaborator.username}"
                             f" to manage {object_type}.", level="info")
                 self.general_view.display_error_message(f"You do not have permission to manage {object_type}.")
                 return
         elif object_type.lower() == "contracts":
-            if not self.collaborator.has_perm("crm.view_contract"):
+            if not self.services_crm.has_permission(self.collaborator, "crm.view_contract"):
                 capture_message(f"Unauthorized access attempt by collaborator: {self.collaborator.username}"
                             f" to manage {object_type}.", level="info")
 
                 self.general_view.display_error_message(f"You do not have permission to manage {object_type}.")
                 return
         elif object_type.lower() == "events":
-            if not self.collaborator.has_perm("crm.view_event"):
+            if not self.services_crm.has_permission(self.collaborator, "crm.view_event"):
                 capture_message(f"Unauthorized access attempt by collaborator: {self.collaborator.username}"
                             f" to manage {object_type}.", level="info")
 
@@ -449,3 +460,26 @@ class GeneralController:
             self.general_view.display_list(objects, "contracts")
         elif object_type.lower() == "events":
             self.general_view.display_list(objects, object_type)
+
+
+    def search(self) -> None:
+        """
+        search takes no parameters,
+        ask for the text to search, and display the clients, contracts and events
+        matching it that the collaborator is allowed to see
+        """
+        self.general_view.clear_screen()
+        text = self.general_view.get_search_text()
+        try:
+            results = self.services_crm.search(text)
+        except DatabaseError as e:
+            capture_exception(e)
+            self.general_view.display_error_message("I encountered a problem with the database. Please try again later.")
+            return
+
+        results = {object_type: objects for object_type, objects in results.items()
+                   if self.services_crm.has_permission(self.collaborator, self.SEARCH_PERMISSIONS[object_type])}
+        if not any(results.values()):
+            self.general_view.display_info_message(f"Nothing matches '{text}'.")
+            return
+        self.general_view.display_search_results(results)
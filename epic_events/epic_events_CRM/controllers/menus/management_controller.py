@@ -2,10 +2,12 @@ from crm.models import Collaborator, Evenement
 from services.crm_functions import CRMFunctions
 from views.menus.management_view import ManagementView
 from typing import Any, List, Optional
+from django.core.exceptions import ValidationError
 from django.db import DatabaseError
 from controllers.menus.general_controller import GeneralController
+from controllers.menus.menu_loop import MenuLoop, MenuState
 from views.menus.general_view import GeneralView
-from sentry_sdk import capture_message, capture_exception
+from services.reporting import capture_message, capture_exception
 
 
 class ManagementController:
@@ -17,7 +19,9 @@ class ManagementController:
         "5 - View the list of all clients.",
         "6 - View the list of all contracts.",
         "7 - View the list of all events.",
-        "8 - Exit the CRM."
+        "8 - View the dashboard.",
+        "9 - Search clients, contracts and events.",
+        "10 - Exit the CRM."
     ]
 
     SUB_MENU_MANAGE_COLLABORATORS_MANAGEMENT = [
@@ -36,7 +40,8 @@ class ManagementController:
     SUB_MENU_EVENTS_MANAGEMENT = [
         "1 - View events with support contact assigned.",
         "2 - View events without support contact assigned.",
-        "3 - Return to main menu"
+        "3 - Assign support contacts to the upcoming events automatically.",
+        "4 - Return to main menu"
     ]
 
 
@@ -57,55 +62,51 @@ class ManagementController:
         """
         start takes no parameters, 
         display the main menu for a collaborator with role management
-        and redirect him accordingly
+        and run his choices until he exits
         """
+        MenuLoop(show_menu=self.show_main_menu,
+                 read_choice=lambda: self.view_cli.get_collaborator_choice(
+                     limit=len(self.MAIN_MENU_OPTIONS_MANAGEMENT)),
+                 actions={
+                     # Manage collaborators
+                     1: lambda: self.manage_management_objects("Collaborators"),
+                     # Manage contracts
+                     2: lambda: self.manage_management_objects("Contracts"),
+                     # Manage events
+                     3: lambda: self.manage_management_objects("Events"),
+                     # Manage support contacts
+                     4: self.modify_support_contact,
+                     # Show All Clients
+                     5: lambda: self.general_controller.show_all_objects("Clients"),
+                     # Show All Contracts
+                     6: lambda: self.general_controller.show_all_objects("Contracts"),
+                     # Show All Events
+                     7: lambda: self.general_controller.show_all_objects("Events"),
+                     # Show the dashboard
+                     8: self.show_dashboard,
+                     # Full-text search
+                     9: self.general_controller.search,
+                 },
+                 # Exit the CRM
+                 exit_choice=10,
+                 invalid_choice=self.invalid_choice,
+                 ask_continue=self.view_cli.ask_user_if_continue).run()
+
+
+    def show_main_menu(self) -> None:
         name_to_display = self.collaborator.get_full_name() or self.collaborator.username
-
         self.view_cli.show_menu(name_to_display, self.MAIN_MENU_OPTIONS_MANAGEMENT)
 
-        choice = self.view_cli.get_collaborator_choice(limit=len(self.MAIN_MENU_OPTIONS_MANAGEMENT))
-
-        match choice:
-            case 1:
-                # Manage collaborators
-                self.manage_management_objects("Collaborators")
-            case 2:
-                # Manage contracts
-                self.manage_management_objects("Contracts")
-            case 3:
-                # Manage events
-                self.manage_management_objects("Events")
-            case 4:
-                # Manage support contacts
-                self.modify_support_contact()
-            case 5:
-                # Show All Clients
-                self.general_controller.show_all_objects("Clients")
-            case 6:
-                # Show All Contracts
-                self.general_controller.show_all_objects("Contracts")
-            case 7:
-                # Show All Events
-                self.general_controller.show_all_objects("Events")
-            case 8:
-                # Exit the CRM
-                return
-            case _:
-                capture_message(
-                    f"Invalid menu option : {choice}. in start() - management controller."
-                    f"Expected options between 1 and {len(self.MAIN_MENU_OPTIONS_MANAGEMENT)}.",
-                    level='error')
-                self.view_cli.display_error_message("Invalid option selected. Please try again.")
 
-        continue_operation = self.view_cli.ask_user_if_continue()
-
-        if not continue_operation:
-            return
-        
-        self.start()
+    def invalid_choice(self, choice: int) -> None:
+        capture_message(
+            f"Invalid menu option : {choice}. in start() - management controller."
+            f"Expected options between 1 and {len(self.MAIN_MENU_OPTIONS_MANAGEMENT)}.",
+            level='error')
+        self.view_cli.display_error_message("Invalid option selected. Please try again.")
 
 
-    def manage_management_objects(self, object_type: str) -> None:
+    def manage_management_objects(self, object_type: str) -> Optional[MenuState]:
         """
         manage_management_objects takes the object_type str as parameter, 
         check for permissions, and redirect the user either to another menu
@@ -114,19 +115,19 @@ class ManagementController:
         self.view_cli.clear_screen()
         # Check for Permissions according to the object_type
         if object_type.lower() == "collaborators":
-            if not self.collaborator.has_perm("crm.manage_collaborators"):
+            if not self.services_crm.has_permission(self.collaborator, "crm.manage_collaborators"):
                 capture_message(f"Unauthorized access attempt by collaborator: {self.collaborator.username}"
                             f" to manage {object_type}.", level="info")
                 self.view_cli.display_error_message(f"You do not have permission to manage {object_type}.")
                 return
         elif object_type.lower() == "contracts":
-            if not self.collaborator.has_perm("crm.manage_contracts_creation_modification"):
+            if not self.services_crm.has_permission(self.collaborator, "crm.manage_contracts_creation_modification"):
                 capture_message(f"Unauthorized access attempt by collaborator: {self.collaborator.username}"
                             f" to manage {object_type}.", level="info")
                 self.view_cli.display_error_message(f"You do not have permission to manage {object_type}.")
                 return
         elif object_type.lower() == "events":
-            if not self.collaborator.has_perm("crm.view_event"):
+            if not self.services_crm.has_permission(self.collaborator, "crm.view_event"):
                 capture_message(f"Unauthorized access attempt by collaborator: {self.collaborator.username}"
                             f" to manage {object_type}.", level="info")
                 self.view_cli.display_error_message(f"You do not have permission to manage {object_type}.")
@@ -160,12 +161,12 @@ class ManagementController:
                 case 3:
                     # Delete an instance object if the object_type is contracts, else restart the menu
                     if object_type.lower() == "contracts":
-                        self.start()
+                        return MenuState.MAIN_MENU
                     else:
                         self.instance_deletion(object_type)
                 case 4:
                     # Return to the main menu
-                    self.start()
+                    return MenuState.MAIN_MENU
                 case _:
                     capture_message(
                     f"Invalid option : {choice}. in start() - management controller."
@@ -182,8 +183,11 @@ class ManagementController:
                     # Show events without support contact assigned
                     self.show_events_without_support()
                 case 3:
+                    # Plan, preview and apply the assignments
+                    self.auto_assign_support_contacts()
+                case 4:
                     # Return to the main menu
-                    self.start()
+                    return MenuState.MAIN_MENU
                 case _:
                     capture_message(
                     f"Invalid menu option : {choice}. in start() - management controller."
@@ -193,6 +197,20 @@ class ManagementController:
                     return
 
 
+    def show_dashboard(self) -> None:
+        """
+        show_dashboard takes no parameters,
+        get the management KPIs and display them
+        """
+        try:
+            dashboard = self.services_crm.get_management_dashboard()
+        except DatabaseError as e:
+            capture_exception(e)
+            self.view_cli.display_error_message("I encountered a problem with the database. Please try again later.")
+            return
+        self.view_cli.display_dashboard(dashboard)
+
+
     def show_events_with_support(self) -> None:
         """
         show_events_with_support takes no parameters, 
@@ -202,7 +220,7 @@ class ManagementController:
         events_to_show = self.get_events_with_optional_filter(support_contact_required=True)
 
 
-        if not events_to_show:
+        if not self.services_crm.has_objects(events_to_show):
             return
 
         self.view_cli.display_list(events_to_show, "events")
@@ -217,7 +235,7 @@ class ManagementController:
         events_to_show = self.get_events_with_optional_filter(support_contact_required=False)
 
 
-        if not events_to_show:
+        if not self.services_crm.has_objects(events_to_show):
             return
         
         self.view_cli.display_list(events_to_show, "events")
@@ -232,7 +250,7 @@ class ManagementController:
         self.view_cli.clear_screen()
 
         events = self.get_events_with_optional_filter(support_contact_required=None)
-        if not events:
+        if not self.services_crm.has_objects(events):
             return
         print(events, 'events')
         selected_event = self.general_controller.select_object_from(events, object_type="Events")
@@ -241,7 +259,7 @@ class ManagementController:
 
         support_collaborators = self.get_support_collaborators()
         print(support_collaborators, "le type de support_collaborators")
-        if not support_collaborators:
+        if not self.services_crm.has_objects(support_collaborators):
             return
         
         selected_support_collaborator = self.general_controller.select_object_from(support_collaborators,
@@ -252,11 +270,48 @@ class ManagementController:
         event_with_new_support_collaborator = self.add_support_contact_to_event(selected_event,
                                                                                 selected_support_collaborator)
         print(event_with_new_support_collaborator, "le type de event_with_new_support_collaborator")
+        if event_with_new_support_collaborator is None:
+            return
         self.view_cli.display_object_details(event_with_new_support_collaborator)
         self.view_cli.display_info_message(f"The support contact {selected_support_collaborator.get_full_name()}"
                                         f" has been correctly assigned to the event.")
 
 
+    def auto_assign_support_contacts(self) -> None:
+        """
+        auto_assign_support_contacts takes no parameters,
+        plan support contacts for the upcoming events without one,
+        display the plan, and apply it if the collaborator confirms
+        """
+        self.view_cli.clear_screen()
+        max_attendees = self.view_cli.get_max_attendees()
+        try:
+            plan = self.services_crm.plan_support_assignments(max_attendees)
+        except DatabaseError as e:
+            capture_exception(e)
+            self.view_cli.display_error_message("I encountered a problem with the database. Please try again later.")
+            return
+
+        if not plan.assignments and not plan.unassigned:
+            self.view_cli.display_info_message("Every upcoming event already has a support contact.")
+            return
+        self.view_cli.display_assignment_plan(plan)
+        if not plan.assignments or not self.view_cli.get_user_confirmation("Apply these assignments?"):
+            self.view_cli.display_info_message("No event has been assigned.")
+            return
+
+        try:
+            assigned = self.services_crm.apply_support_assignments(plan)
+        except DatabaseError as e:
+            capture_exception(e)
+            self.view_cli.display_error_message("I encountered a problem with the database. Please try again later.")
+            return
+        self.view_cli.display_info_message(f"{assigned} events assigned.")
+        if assigned < len(plan.assignments):
+            self.view_cli.display_warning_message(f"{len(plan.assignments) - assigned} events were assigned by "
+                                                  f"someone else meanwhile and kept their support contact.")
+
+
     def instance_deletion(self, object_type: str) -> None:
         """
         instance_deletion takes the object_type str as parameter, 
@@ -266,7 +321,7 @@ class ManagementController:
         """
         self.view_cli.clear_screen()
         our_objects = CRMFunctions.get_all_objects(object_type)
-        if not our_objects:
+        if not self.services_crm.has_objects(our_objects):
             return
 
         select_collaborator = self.general_controller.select_object_from(our_objects, object_type)
@@ -294,9 +349,17 @@ class ManagementController:
             self.view_cli.display_info_message("The deletion of the collaborator has been canceled.")
             return
         try:
-            self.services_crm.delete_collaborator(collaborator)
+            reassign_to = self.select_reassignment_target(collaborator)
+            moved = self.services_crm.delete_collaborator(collaborator, reassign_to)
             self.view_cli.display_info_message("Collaborator successfully deleted.")
-        except DatabaseError:
+            if reassign_to is not None:
+                self.view_cli.display_info_message(
+                    f"{moved['clients']} clients, {moved['contracts']} contracts and {moved['events']} events "
+                    f"moved to {reassign_to.get_full_name() or reassign_to.username}.")
+                if moved["double_booked"]:
+                    self.view_cli.display_warning_message(
+                        f"{moved['double_booked']} events now overlap another event of the same support contact.")
+        except DatabaseError as e:
             capture_exception(e)
             self.view_cli.display_error_message("A problem occurred with the database. Please try again later.")
         except Exception as e:
@@ -304,6 +367,29 @@ class ManagementController:
             self.view_cli.display_error_message(f"An unexpected error occurred: {e}")
 
 
+    def select_reassignment_target(self, collaborator: Collaborator) -> Optional[Collaborator]:
+        """
+        select_reassignment_target takes the collaborator about to be deleted as parameter,
+        and when they are the contact of clients, contracts or events, offer to choose
+        a collaborator with the same role to take them over
+        """
+        assignments = self.services_crm.count_assignments(collaborator)
+        if not any(assignments.values()):
+            return None
+
+        self.view_cli.display_info_message(
+            f"{collaborator.username} is the contact of {assignments['clients']} clients, "
+            f"{assignments['contracts']} contracts and {assignments['events']} events.")
+        candidates = self.services_crm.get_reassignment_candidates(collaborator)
+        if not candidates.exists():
+            self.view_cli.display_warning_message("No other collaborator has the same role, "
+                                                  "they will be left without contact.")
+            return None
+        if not self.view_cli.get_user_confirmation("Do you want to move them to another collaborator?"):
+            return None
+        return self.general_controller.select_object_from(candidates, "collaborators")
+
+
     def get_events_with_optional_filter(self, support_contact_required: Optional[bool] = None) -> List[Evenement]:
         """
         get_events_with_optional_filter takes the support_contact_required bool as parameter, 
@@ -322,7 +408,7 @@ class ManagementController:
             self.view_cli.display_error_message(f"{e}")
             return []
 
-        if not events:
+        if not self.services_crm.has_objects(events):
             self.view_cli.display_info_message("There are no events available to display.")
 
         return events
@@ -346,7 +432,7 @@ class ManagementController:
             self.view_cli.display_error_message(str(e))
             return []
 
-        if not support_collaborators:
+        if not self.services_crm.has_objects(support_collaborators):
             self.view_cli.display_info_message("There not support collaborators to display.")
 
         return support_collaborators
@@ -364,6 +450,9 @@ class ManagementController:
             event_with_new_support_contact = self.services_crm.add_support_contact_to_event(event, support_contact)
             print(event_with_new_support_contact, "event with new support contact")
             return event_with_new_support_contact
+        except ValidationError as e:
+            # Already booked on these days, the message names the conflicting events
+            self.view_cli.display_error_message(e.messages[0])
         except DatabaseError:
             capture_exception(e)
             self.view_cli.display_error_message("I encountered a problem with the database. Please try again later.")
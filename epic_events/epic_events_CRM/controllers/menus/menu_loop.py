@@ -0,0 +1,56 @@
+from enum import Enum
+from typing import Callable, Dict, Optional
+from django.db import close_old_connections
+from services.reporting import operation
+
+
+class MenuState(Enum):
+    MAIN_MENU = "main_menu"
+    ACTION = "action"
+    ASK_CONTINUE = "ask_continue"
+    EXIT = "exit"
+
+
+class MenuLoop:
+    """
+    Event loop shared by the role menus: show the main menu, run the chosen
+    action, then ask whether to continue, until the collaborator exits.
+    Each action runs and returns before the next one, so the stack and the
+    objects kept alive stay the same however long the session is.
+    An action can return the next state, MAIN_MENU to go back without asking
+    """
+    def __init__(self, show_menu: Callable[[], None],
+                read_choice: Callable[[], int],
+                actions: Dict[int, Callable[[], Optional[MenuState]]],
+                exit_choice: int,
+                invalid_choice: Callable[[int], None],
+                ask_continue: Callable[[], bool]):
+        self.show_menu = show_menu
+        self.read_choice = read_choice
+        self.actions = actions
+        self.exit_choice = exit_choice
+        self.invalid_choice = invalid_choice
+        self.ask_continue = ask_continue
+
+    def run(self) -> None:
+        state = MenuState.MAIN_MENU
+        choice = None
+        while state is not MenuState.EXIT:
+            if state is MenuState.MAIN_MENU:
+                self.show_menu()
+                choice = self.read_choice()
+                # Like a request boundary, drop the connection if it went stale while waiting for the choice
+                close_old_connections()
+                state = MenuState.EXIT if choice == self.exit_choice else MenuState.ACTION
+
+            elif state is MenuState.ACTION:
+                action = self.actions.get(choice)
+                if action is None:
+                    self.invalid_choice(choice)
+                    state = MenuState.MAIN_MENU
+                else:
+                    with operation("cli.menu_action", f"menu action {choice}"):
+                        state = action() or MenuState.ASK_CONTINUE
+
+            elif state is MenuState.ASK_CONTINUE:
+                state = MenuState.MAIN_MENU if self.ask_continue() else MenuState.EXIT
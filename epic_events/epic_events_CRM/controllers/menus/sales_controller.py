@@ -1,13 +1,14 @@
 from django.db import DatabaseError
 from django.core.exceptions import ValidationError
-from typing import List
+from typing import List, Optional
 from crm.models import Collaborator
 from crm.models import Contract
 from services.crm_functions import CRMFunctions
 from views.menus.sales_view import SalesView
 from views.menus.general_view import GeneralView
 from controllers.menus.general_controller import GeneralController
-from sentry_sdk import capture_exception
+from controllers.menus.menu_loop import MenuLoop, MenuState
+from services.reporting import capture_message, capture_exception
 
 
 class SalesController:
@@ -18,7 +19,8 @@ class SalesController:
     "4 - View the list of all clients.",
     "5 - View the list of all contracts.",
     "6 - View the list of all events.",
-    "7 - Exit the CRM."
+    "7 - Search clients, contracts and events.",
+    "8 - Exit the CRM."
     ]
 
     SUB_MENU_CLIENT_SALES = [
@@ -45,61 +47,59 @@ class SalesController:
     def start(self):
         """
         Start the main menu for sales role and redirect to another submenu
-        or a function according to his choice
+        or a function according to his choice, until he exits
         """
         print("Starting the sales role...")
+        MenuLoop(show_menu=self.show_main_menu,
+                 read_choice=self.view_cli.get_user_menu_choice,
+                 actions={
+                     1: self.manage_clients,
+                     2: self.filter_contracts,
+                     3: lambda: self.general_controller.instance_creation("events"),
+                     4: lambda: self.general_controller.show_all_objects("Clients"),
+                     5: lambda: self.general_controller.show_all_objects("Contracts"),
+                     6: lambda: self.general_controller.show_all_objects("Events"),
+                     7: self.general_controller.search,
+                 },
+                 exit_choice=8,
+                 invalid_choice=self.invalid_choice,
+                 ask_continue=self.view_cli.ask_user_if_continue).run()
+
+
+    def show_main_menu(self) -> None:
         name_to_display = self.collaborator.get_full_name() or self.collaborator.username
         self.view_cli.show_main_menu(name_to_display, self.MAIN_MENU_OPTIONS_SALES)
-        user_choice = self.view_cli.get_user_menu_choice()
-        match user_choice:
+
+
+    def manage_clients(self) -> Optional[MenuState]:
+        """
+        Show the clients submenu and run the chosen operation
+        """
+        name_to_display = self.collaborator.get_full_name() or self.collaborator.username
+        self.view_cli.show_main_menu(name_to_display, self.SUB_MENU_CLIENT_SALES)
+        user_sub_menu_choice = self.view_cli.get_user_menu_choice()
+        match user_sub_menu_choice:
             case 1:
-                self.view_cli.show_main_menu(name_to_display, self.SUB_MENU_CLIENT_SALES)
-                user_sub_menu_choice = self.view_cli.get_user_menu_choice()
-                match user_sub_menu_choice:
-                    case 1:
-                        # Create a client
-                        self.general_controller.instance_creation("clients")
-                    case 2:
-                        # Update client infos
-                        self.general_controller.instance_modification("clients")
-                    case 3:
-                        # Update client contract
-                        self.general_controller.instance_modification("contracts")
-                    case 4:
-                        # Return to main menu
-                        self.view_cli.show_main_menu(name_to_display, self.MAIN_MENU_OPTIONS_SALES)
-                    case _:
-                        print(
-                            f"Invalid menu option selected: {user_choice}. in start() - sales controller."
-                            f"Expected options were between 1 and 4",
-                            level='error')
-                        self.view_cli.display_error_message("Invalid option selected. Please try again.")
+                # Create a client
+                self.general_controller.instance_creation("clients")
             case 2:
-                self.filter_contracts()
+                # Update client infos
+                self.general_controller.instance_modification("clients")
             case 3:
-                self.general_controller.instance_creation("events")
+                # Update client contract
+                self.general_controller.instance_modification("contracts")
             case 4:
-                self.general_controller.show_all_objects("Clients")
-            case 5:
-                self.general_controller.show_all_objects("Contracts")
-            case 6:
-                self.general_controller.show_all_objects("Events")
-            case 7:
-                print("Exit the CRM system")
-                return
+                # Return to main menu
+                return MenuState.MAIN_MENU
             case _:
-                print(
-                    f"Invalid menu option selected: {user_choice}. in start() - sales controller."
-                    f"Expected options were between 1 and 7",
-                    level='error')
-                self.view_cli.display_error_message("Invalid option selected. Please try again.")
+                self.invalid_choice(user_sub_menu_choice, limit=len(self.SUB_MENU_CLIENT_SALES))
+        return None
 
-        continue_operation = self.view_cli.ask_user_if_continue()
 
-        if not continue_operation:
-            return
-        
-        self.start()
+    def invalid_choice(self, user_choice: int, limit: int = len(MAIN_MENU_OPTIONS_SALES)) -> None:
+        capture_message(f"Invalid menu option selected: {user_choice}. in start() - sales controller."
+                        f"Expected options were between 1 and {limit}", level='error')
+        self.view_cli.display_error_message("Invalid option selected. Please try again.")
 
 
     def process_event_creation(self) -> None:
@@ -110,7 +110,7 @@ class SalesController:
         self.view_cli.clear_screen()
         signed_contracts = self.general_controller.get_contracts_assigned_to(self.collaborator.id, filter_type="signed")
         print('signed contracts', signed_contracts)
-        if not signed_contracts:
+        if not self.services_crm.has_objects(signed_contracts):
             return
 
         selected_contract = self.general_controller.select_object_from(signed_contracts, "Events")
@@ -143,7 +143,7 @@ class SalesController:
 
         contracts_to_display = self.general_controller.get_contracts_assigned_to(self.collaborator.id, filter_type)
 
-        if not contracts_to_display:
+        if not self.services_crm.has_objects(contracts_to_display):
 
             print("no contracts to display")
             return
@@ -6,6 +6,11 @@ from services.crm_functions import CRMFunctions
 from views.menus.support_view import SupportView
 from views.menus.general_view import GeneralView
 from controllers.menus.general_controller import GeneralController
+from controllers.menus.menu_loop import MenuLoop
+from services.reporting import capture_message
+
+
+CALENDAR_DAYS = 7
 
 
 class SupportController:
@@ -28,44 +33,40 @@ class SupportController:
     def start(self) -> None:
         """
         Start the support menu by displaying the main menu
-        and getting the user's choice
+        and running the user's choices until he exits
         """
+        MenuLoop(show_menu=self.show_main_menu,
+                 read_choice=self.view_cli.get_user_menu_choice,
+                 actions={
+                     # Show all clients
+                     1: lambda: self.general_controller.show_all_objects("Clients"),
+                     # Show all contracts
+                     2: lambda: self.general_controller.show_all_objects("Contracts"),
+                     # Show all events
+                     3: lambda: self.general_controller.show_all_objects("Events"),
+                     # Show all events for the selected collaborator
+                     4: self.show_events_for_collaborator,
+                     # Modify an event
+                     5: lambda: self.general_controller.instance_modification("Events"),
+                     # Full-text search
+                     6: self.general_controller.search,
+                     # Calendar of the assigned events
+                     7: self.show_calendar,
+                 },
+                 exit_choice=8,
+                 invalid_choice=self.invalid_choice,
+                 ask_continue=self.view_cli.ask_user_if_continue).run()
+
+
+    def show_main_menu(self) -> None:
         self.view_cli.display_info_message(f"Hi! {self.collaborator.get_full_name()}")
         self.view_cli.show_main_menu(collaborator=self.collaborator)
 
-        choice = self.view_cli.get_user_menu_choice()
-
-        match choice:
-            case 1:
-                # Show all clients
-                self.general_controller.show_all_objects("Clients")
-            case 2:
-                # Show all contracts
-                self.general_controller.show_all_objects("Contracts")
-            case 3:
-                # Show all events
-                self.general_controller.show_all_objects("Events")
-            case 4:
-                # Show all events for the selectedcollaborator
-                self.show_events_for_collaborator()
-            case 5:
-                # Modify an event
-                self.general_controller.instance_modification("Events")
-            case 6:
-                # Return to main menu
-                return
-            case _:
-                print(
-                    f"Invalid menu option selected: {choice}. in start() at support controller"
-                    f"Expected options were between 1 and 6.",
-                    level='error')
-                self.view_cli.display_error_message("Invalid option selected. Please try again.")
-                self.start()
-
-        continue_operation = self.view_cli.ask_user_if_continue()
-        if not continue_operation:
-            return
-        self.start()
+
+    def invalid_choice(self, choice: int) -> None:
+        capture_message(f"Invalid menu option selected: {choice}. in start() at support controller"
+                        f"Expected options were between 1 and {self.view_cli.MENU_LIMIT}.", level='error')
+        self.view_cli.display_error_message("Invalid option selected. Please try again.")
 
 
     def show_events_for_collaborator(self) -> None:
@@ -73,7 +74,7 @@ class SupportController:
         Show all events for the selected collaborator after checking for permissions
         """
         self.view_cli.clear_screen()
-        if not self.collaborator.has_perm("crm.view_event"):
+        if not self.services_crm.has_permission(self.collaborator, "crm.view_event"):
 
             print(f"Unauthorized access attempt by collaborator: {self.collaborator.username}"
                             f" to the list of events for the collaborator.", level="info")
@@ -82,12 +83,33 @@ class SupportController:
 
         events_for_collaborator = self.get_events_for_collaborator(self.collaborator.id)
 
-        if not events_for_collaborator:
+        if not self.services_crm.has_objects(events_for_collaborator):
             return
 
         self.general_view.display_list(events_for_collaborator, "events")
 
 
+    def show_calendar(self) -> None:
+        """
+        Show the events assigned to the collaborator day by day, the current week by default
+        """
+        self.view_cli.clear_screen()
+        if not self.services_crm.has_permission(self.collaborator, "crm.view_event"):
+            capture_message(f"Unauthorized access attempt by collaborator: {self.collaborator.username}"
+                            f" to the calendar.", level="info")
+            self.view_cli.display_error_message("You do not have permission to view the calendar.")
+            return
+
+        start = self.general_view.get_calendar_start()
+        try:
+            events = list(self.services_crm.get_calendar(self.collaborator.id, start, CALENDAR_DAYS))
+        except DatabaseError:
+            self.view_cli.display_error_message("I encountered a problem with the database. Please again later.")
+            return
+        double_booked = {event_id for pair in self.services_crm.find_double_bookings(events) for event_id in pair}
+        self.general_view.display_calendar(events, start, CALENDAR_DAYS, double_booked)
+
+
     def get_events_for_collaborator(self, collaborator_id: int) -> List[Evenement]:
         """
         get_events_for_collaborator takes a collaborator_id as a parameter, and get
@@ -104,7 +126,7 @@ class SupportController:
             self.view_cli.display_error_message(str(e))
             return []
 
-        if not events:
+        if not self.services_crm.has_objects(events):
             self.view_cli.display_info_message("There is no events available to display.")
 
         return events
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CrmConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'crm'
+
+    def ready(self):
+        # Contract signals keeping the financial summaries up to date
+        import services.financial_summary  # noqa: F401
+        # Client and collaborator signals keeping the autocompletion indexes up to date
+        import services.prefix_index  # noqa: F401
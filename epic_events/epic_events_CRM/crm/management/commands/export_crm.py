@@ -0,0 +1,120 @@
+import csv
+import json
+import sys
+from datetime import date, datetime, time
+from typing import Iterator
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import QuerySet
+from django.utils.timezone import get_default_timezone, make_aware
+from crm.models import Collaborator, Client, Contract, Evenement
+
+
+# Exported columns of each table with the lookup giving their value,
+# named like the columns expected by the import_crm command
+EXPORTS = {
+    "clients": (Client, [("id", "id"), ("name", "name"), ("email", "email"), ("phone", "phone"),
+                         ("company_name", "company_name"), ("commercial_contact", "commercial_contact__username"),
+                         ("creation_date", "creation_date"), ("last_update", "last_update")]),
+    "contracts": (Contract, [("id", "id"), ("client", "client_infos__name"),
+                             ("commercial_contact", "commercial_contact__username"), ("value", "value"),
+                             ("due", "due"), ("status", "status"), ("creation_date", "creation_date")]),
+    "events": (Evenement, [("id", "id"), ("contract", "contract_id"), ("name", "name"),
+                           ("client_name", "client_name"), ("client_contact", "client_contact"),
+                           ("support_contact", "support_contact__username"), ("day_start", "day_start"),
+                           ("date_end", "date_end"), ("location", "location"), ("attendees", "attendees"),
+                           ("notes", "notes")]),
+    "collaborators": (Collaborator, [("id", "id"), ("username", "username"), ("first_name", "first_name"),
+                                     ("last_name", "last_name"), ("email", "email"),
+                                     ("employee_number", "employee_number"), ("role", "role__name"),
+                                     ("date_joined", "date_joined")]),
+}
+
+# Date column used by --since for each table
+SINCE_FIELDS = {
+    "clients": "last_update",
+    "contracts": "creation_date",
+    "collaborators": "date_joined",
+}
+
+
+def to_text(value):
+    """
+    Convert dates to ISO 8601 strings and leave the other values untouched
+    """
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+class Command(BaseCommand):
+    help = "Export clients, contracts, events or collaborators to CSV or JSONL with constant memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument("table", choices=list(EXPORTS))
+        parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+        parser.add_argument("--output", help="File to write to, the standard output by default")
+        parser.add_argument("--since", type=date.fromisoformat,
+                            help="Only export rows updated or created since this date (YYYY-MM-DD)")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Number of rows fetched at a time")
+
+    def handle(self, *args, **options):
+        table = options["table"]
+        model, columns = EXPORTS[table]
+        rows = model.objects.values(*[lookup for name, lookup in columns])
+
+        if options["since"]:
+            if table not in SINCE_FIELDS:
+                raise CommandError(f"--since is not available for {table}.")
+            since = make_aware(datetime.combine(options["since"], time.min), get_default_timezone())
+            rows = rows.filter(**{f"{SINCE_FIELDS[table]}__gte": since})
+
+        output = open(options["output"], "w", newline="", encoding="utf-8") if options["output"] else sys.stdout
+        try:
+            count = self.write_rows(self.stream(rows.order_by("id"), options["chunk_size"]), columns,
+                                    options["format"], output)
+        finally:
+            if options["output"]:
+                output.close()
+
+        if options["output"]:
+            self.stdout.write(self.style.SUCCESS(f"{count} {table} exported to {options['output']}."))
+
+    @staticmethod
+    def stream(rows: QuerySet, chunk_size: int) -> Iterator[dict]:
+        """
+        Yield the rows chunk by chunk. MySQLdb buffers every result client side,
+        so on MySQL each chunk is its own query starting after the last id read
+        """
+        if connection.vendor != "mysql":
+            yield from rows.iterator(chunk_size=chunk_size)
+            return
+
+        last_id = 0
+        while True:
+            chunk = list(rows.filter(id__gt=last_id)[:chunk_size])
+            yield from chunk
+            if len(chunk) < chunk_size:
+                return
+            last_id = chunk[-1]["id"]
+
+    @staticmethod
+    def write_rows(rows: Iterator[dict], columns: list, output_format: str, output) -> int:
+        """
+        Write the rows as CSV or JSONL under the exported column names
+        and return the number of rows written
+        """
+        count = 0
+        writer = None
+        if output_format == "csv":
+            writer = csv.DictWriter(output, fieldnames=[name for name, lookup in columns])
+            writer.writeheader()
+
+        for row in rows:
+            line = {name: to_text(row[lookup]) for name, lookup in columns}
+            if writer:
+                writer.writerow(line)
+            else:
+                output.write(json.dumps(line) + "\n")
+            count += 1
+        return count
@@ -0,0 +1,190 @@
+import random
+import time
+from itertools import accumulate
+from datetime import date, timedelta
+from typing import Iterator, List
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from crm.models import Collaborator, Client, Contract, Evenement, Role
+from services.financial_summary import bulk_changes
+from services.prefix_index import client_names, collaborator_usernames, support_usernames
+from services.reference_cache import reference_cache
+
+
+# Number of events of each scale, the other tables are sized from it
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+GENERATED_PREFIX = "gen_"
+CITIES = ["Paris", "Lyon", "Marseille", "Bordeaux", "Lille", "Nantes", "Toulouse", "Nice", "Strasbourg", "Rennes"]
+FIRST_DAY = date(2023, 1, 1)
+DAYS = 3 * 365
+
+
+def weights(rng: random.Random, count: int) -> List[float]:
+    """
+    Pareto distributed workloads, a few collaborators carry most of the clients or events
+    """
+    return [rng.paretovariate(1.5) for _ in range(count)]
+
+
+class Command(BaseCommand):
+    help = "Generate a deterministic CRM dataset of collaborators, clients, contracts and events"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", choices=list(SCALES), default="1k", help="Number of events to generate")
+        parser.add_argument("--events", type=int, help="Exact number of events, overrides --scale")
+        parser.add_argument("--seed", type=int, default=12, help="Same seed and size give the same data")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Number of rows inserted per query")
+        parser.add_argument("--clear", action="store_true",
+                            help="Delete the clients, contracts, events and generated collaborators first")
+
+    def handle(self, *args, **options):
+        # Contracts are deleted and inserted in bulk, the summaries are rebuilt at the end
+        with bulk_changes():
+            self.generate(options)
+
+    def generate(self, options: dict) -> None:
+        if options["clear"]:
+            with transaction.atomic():
+                Evenement.objects.all().delete()
+                Contract.objects.all().delete()
+                Client.objects.all().delete()
+                Collaborator.objects.filter(username__startswith=GENERATED_PREFIX).delete()
+        elif Client.objects.exists():
+            raise CommandError("The database already has clients, use --clear to replace them.")
+
+        events = options["events"] or SCALES[options["scale"]]
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        # A single hash for every generated collaborator, hashing each password would dominate the run
+        self.password = make_password("generated")
+        started = time.perf_counter()
+
+        sales_ids = self.create_collaborators("sales", max(2, events // 2000))
+        support_ids = self.create_collaborators("support", max(2, events // 5000))
+        management_ids = self.create_collaborators("management", max(1, events // 50000))
+        client_ids = self.create_clients(max(1, events // 4), sales_ids)
+        contracts = self.create_contracts(max(1, events * 2 // 3), client_ids, sales_ids)
+        self.create_events(events, contracts, client_ids, support_ids)
+        # Rows were bulk inserted, no signal told the caches about the new collaborators and clients
+        reference_cache.clear()
+        client_names.clear()
+        collaborator_usernames.clear()
+        support_usernames.clear()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(sales_ids) + len(support_ids) + len(management_ids)} collaborators, {len(client_ids)} clients, {len(contracts)} "
+            f"contracts and {events} events generated in {time.perf_counter() - started:.2f}s."))
+
+    def insert(self, model, objects: Iterator) -> None:
+        """
+        Insert the objects by batches, each batch in its own transaction
+        """
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                with transaction.atomic():
+                    model.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+
+    @staticmethod
+    def new_ids(model, first_id: int) -> List[int]:
+        """
+        Ids of the rows inserted since first_id, MySQL does not return them from bulk_create
+        """
+        return list(model.objects.filter(id__gte=first_id).order_by("id").values_list("id", flat=True))
+
+    @staticmethod
+    def next_id(model) -> int:
+        last = model.objects.order_by("-id").values_list("id", flat=True).first()
+        return (last or 0) + 1
+
+    def create_collaborators(self, role_name: str, count: int) -> List[int]:
+        role, created = Role.objects.get_or_create(name=role_name)
+        group, created = Group.objects.get_or_create(name=f"{role_name}_team")
+        first_id = self.next_id(Collaborator)
+        self.insert(Collaborator, (Collaborator(username=f"{GENERATED_PREFIX}{role_name}{number}",
+                                                first_name=role_name.capitalize(),
+                                                last_name=str(number),
+                                                email=f"{GENERATED_PREFIX}{role_name}{number}@epic-events.net",
+                                                employee_number=f"{GENERATED_PREFIX}{role_name}{number}",
+                                                password=self.password,
+                                                role=role)
+                                   for number in range(count)))
+        ids = self.new_ids(Collaborator, first_id)
+        Collaborator.groups.through.objects.bulk_create(
+            [Collaborator.groups.through(collaborator_id=collaborator_id, group_id=group.id)
+             for collaborator_id in ids], batch_size=self.batch_size)
+        return ids
+
+    def create_clients(self, count: int, sales_ids: List[int]) -> List[int]:
+        rng = self.rng
+        cum_weights = list(accumulate(weights(rng, len(sales_ids))))
+        # A few clients lost their commercial contact
+        self.client_sales = [rng.choices(sales_ids, cum_weights=cum_weights)[0] if rng.random() < 0.97 else None
+                             for _ in range(count)]
+        first_id = self.next_id(Client)
+        self.insert(Client, (Client(name=f"client {number}",
+                                    email=f"client{number}@example.com",
+                                    phone=f"0{rng.randint(100000000, 799999999)}",
+                                    company_name=f"company {number // 3}",
+                                    commercial_contact_id=sales_id)
+                             for number, sales_id in enumerate(self.client_sales)))
+        return self.new_ids(Client, first_id)
+
+    def create_contracts(self, count: int, client_ids: List[int], sales_ids: List[int]) -> List[tuple]:
+        """
+        Create the contracts and return their id, client number and status
+        """
+        rng = self.rng
+        # Older clients have more contracts than the recent ones
+        cum_weights = list(accumulate(1 / (index + 10) for index in range(len(client_ids))))
+        plan = []
+        for number in range(count):
+            client_number = rng.choices(range(len(client_ids)), cum_weights=cum_weights)[0]
+            value = round(rng.lognormvariate(8, 1), 2)
+            status = "signed" if rng.random() < 0.75 else "not_signed"
+            # About 40% of the signed contracts are fully paid
+            due = 0 if status == "signed" and rng.random() < 0.4 else round(value * rng.random(), 2)
+            # Contracts are signed through the commercial contact of the client
+            plan.append((client_number, self.client_sales[client_number] or rng.choice(sales_ids), value, due, status))
+
+        first_id = self.next_id(Contract)
+        self.insert(Contract, (Contract(client_infos_id=client_ids[client_number], commercial_contact_id=sales_id,
+                                        value=value, due=due, status=status)
+                               for client_number, sales_id, value, due, status in plan))
+        return [(contract_id, client_number, status)
+                for contract_id, (client_number, sales_id, value, due, status) in zip(
+                    self.new_ids(Contract, first_id), plan)]
+
+    def create_events(self, count: int, contracts: List[tuple], client_ids: List[int],
+                      support_ids: List[int]) -> None:
+        rng = self.rng
+        cum_weights = list(accumulate(weights(rng, len(support_ids))))
+        signed = [contract for contract in contracts if contract[2] == "signed"] or contracts
+
+        def build() -> Iterator[Evenement]:
+            for number in range(count):
+                contract_id, client_number, status = rng.choice(signed)
+                day_start = FIRST_DAY + timedelta(days=rng.randrange(DAYS))
+                yield Evenement(contract_id=contract_id if rng.random() < 0.95 else None,
+                                name=f"event {number}",
+                                client_id=client_ids[client_number],
+                                client_name=f"client {client_number}",
+                                client_contact=f"contact {client_number}",
+                                day_start=day_start,
+                                date_end=day_start + timedelta(days=rng.choice((0, 0, 1, 1, 2, 3))),
+                                # Some events are still waiting for a support contact
+                                support_contact_id=(rng.choices(support_ids, cum_weights=cum_weights)[0]
+                                                    if rng.random() < 0.85 else None),
+                                location=rng.choice(CITIES),
+                                attendees=int(rng.lognormvariate(4, 0.8)) + 1,
+                                notes=f"Generated event {number}")
+
+        self.insert(Evenement, build())
@@ -0,0 +1,180 @@
+import csv
+import json
+import time
+from datetime import date
+from typing import Callable, Dict, Iterator, Optional
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from crm.models import Collaborator, Client, Contract, Evenement
+from services.financial_summary import bulk_changes
+from services.prefix_index import client_names
+
+
+def read_rows(path: str) -> Iterator[dict]:
+    """
+    Stream the rows of a CSV or JSONL file one dict at a time
+    """
+    with open(path, newline="", encoding="utf-8") as file:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(file)
+        elif path.endswith(".jsonl"):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            raise CommandError(f"Unsupported file format for {path}. Expected a .csv or .jsonl file.")
+
+
+class DuplicateRow(Exception):
+    """
+    Row whose unique value is already in the CRM or earlier in the file
+    """
+
+
+class Command(BaseCommand):
+    help = "Import clients, contracts and events from CSV or JSONL files with batched inserts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", help="CSV/JSONL file with name, email, phone, company_name, "
+                                              "commercial_contact (username)")
+        parser.add_argument("--contracts", help="CSV/JSONL file with client (name), commercial_contact "
+                                                "(username), value, due, status")
+        parser.add_argument("--events", help="CSV/JSONL file with name, client_name, client_contact, "
+                                             "support_contact (username), day_start, date_end, location, "
+                                             "attendees, notes and an optional contract (id)")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Number of rows inserted per query")
+
+    def handle(self, *args, **options):
+        if not (options["clients"] or options["contracts"] or options["events"]):
+            raise CommandError("Please provide at least one of --clients, --contracts or --events.")
+
+        self.batch_size = options["batch_size"]
+        # Lookup maps built once, so that rows never query their foreign keys
+        self.collaborator_ids = dict(Collaborator.objects.values_list("username", "id"))
+
+        if options["clients"]:
+            # The emails are unique, one already in the CRM or seen earlier in the file skips the row
+            self.client_emails = set(Client.objects.values_list("email", flat=True))
+            self.import_rows(Client, options["clients"], self.build_client)
+            client_names.clear()
+        self.client_ids = dict(Client.objects.values_list("name", "id"))
+
+        if options["contracts"]:
+            # bulk_create skips the contract signals, the summaries are rebuilt once imported
+            with bulk_changes():
+                self.import_rows(Contract, options["contracts"], self.build_contract)
+        if options["events"]:
+            self.contract_ids = set(Contract.objects.values_list("id", flat=True))
+            self.import_rows(Evenement, options["events"], self.build_event)
+
+    def import_rows(self, model, path: str, build: Callable[[dict], Optional[object]]) -> None:
+        """
+        Build the objects of the file with the build function and insert them
+        by batches, each batch in its own transaction
+        """
+        started = time.perf_counter()
+        imported = skipped = 0
+        batch = []
+
+        for line_number, row in enumerate(read_rows(path), start=1):
+            try:
+                obj = build(row)
+            except KeyError as e:
+                skipped += 1
+                self.stderr.write(f"{path}:{line_number} skipped, missing column {e.args[0]}.")
+                continue
+            except DuplicateRow as e:
+                skipped += 1
+                self.stderr.write(f"{path}:{line_number} skipped, {e}")
+                continue
+            except (TypeError, ValueError) as e:
+                # bulk_create skips full_clean, the values are checked while the row is built
+                skipped += 1
+                self.stderr.write(f"{path}:{line_number} skipped, invalid value: {e}")
+                continue
+            if obj is None:
+                skipped += 1
+                self.stderr.write(f"{path}:{line_number} skipped, unknown client, contract or collaborator.")
+                continue
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                imported += self.insert_batch(model, batch)
+                batch = []
+        if batch:
+            imported += self.insert_batch(model, batch)
+
+        elapsed = time.perf_counter() - started
+        rate = imported / elapsed if elapsed else imported
+        self.stdout.write(self.style.SUCCESS(f"{imported} {model._meta.verbose_name_plural} imported in "
+                                             f"{elapsed:.2f}s ({rate:.0f} rows/s), {skipped} skipped."))
+
+    def insert_batch(self, model, batch: list) -> int:
+        """
+        Insert the batch in a single transaction and return the number of rows inserted
+        """
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(batch, batch_size=self.batch_size)
+        except IntegrityError as e:
+            # The duplicated emails are skipped while building, another import running at the same
+            # time could still insert one of them, the batches before are kept
+            raise CommandError(f"A batch of {model._meta.verbose_name_plural} was refused by the database: {e}") from e
+        return len(batch)
+
+    def build_client(self, row: dict) -> Optional[Client]:
+        commercial_contact_id = self.resolve(self.collaborator_ids, row.get("commercial_contact"))
+        if commercial_contact_id is False:
+            return None
+        if row["email"] in self.client_emails:
+            raise DuplicateRow(f"email {row['email']!r} already used by another client.")
+        self.client_emails.add(row["email"])
+        return Client(name=row["name"],
+                      email=row["email"],
+                      phone=row["phone"],
+                      company_name=row["company_name"],
+                      commercial_contact_id=commercial_contact_id)
+
+    def build_contract(self, row: dict) -> Optional[Contract]:
+        client_id = self.client_ids.get(row["client"])
+        commercial_contact_id = self.resolve(self.collaborator_ids, row.get("commercial_contact"))
+        if client_id is None or commercial_contact_id is False:
+            return None
+        if row["status"] not in dict(Contract.STATUS_CHOICES):
+            raise ValueError(f"unknown status {row['status']!r}")
+        return Contract(client_infos_id=client_id,
+                        commercial_contact_id=commercial_contact_id,
+                        value=float(row["value"]),
+                        due=float(row["due"]),
+                        status=row["status"])
+
+    def build_event(self, row: dict) -> Optional[Evenement]:
+        client_id = self.client_ids.get(row["client_name"])
+        support_contact_id = self.resolve(self.collaborator_ids, row.get("support_contact"))
+        contract_id = int(row["contract"]) if row.get("contract") else None
+        if client_id is None or support_contact_id is False or (
+                contract_id is not None and contract_id not in self.contract_ids):
+            return None
+        attendees = int(row["attendees"])
+        if attendees < 0:
+            raise ValueError(f"negative attendees {attendees}")
+        return Evenement(name=row.get("name") or None,
+                         client_id=client_id,
+                         client_name=row["client_name"],
+                         client_contact=row["client_contact"],
+                         support_contact_id=support_contact_id,
+                         contract_id=contract_id,
+                         day_start=date.fromisoformat(str(row["day_start"])),
+                         date_end=date.fromisoformat(str(row["date_end"])),
+                         location=row["location"],
+                         attendees=attendees,
+                         notes=row.get("notes") or "")
+
+    @staticmethod
+    def resolve(ids: Dict[str, int], key: Optional[str]):
+        """
+        Return the id matching the key, None when no key is given
+        (the relation is nullable) and False when the key is unknown
+        """
+        if not key:
+            return None
+        return ids.get(key, False)
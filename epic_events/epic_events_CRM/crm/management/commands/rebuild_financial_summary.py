@@ -0,0 +1,44 @@
+import math
+from django.core.management.base import BaseCommand, CommandError
+from services.financial_summary import SUMMARIES, aggregate, rebuild
+
+
+FIELDS = ["contract_count", "signed_count", "not_signed_count", "total_value", "total_due"]
+
+
+class Command(BaseCommand):
+    help = "Recompute the client and commercial contact financial summaries from the contracts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true",
+                            help="Only report the summaries that differ from the contracts, without rebuilding")
+
+    def handle(self, *args, **options):
+        if not options["check"]:
+            rebuild()
+            self.stdout.write(self.style.SUCCESS("Financial summaries rebuilt."))
+            return
+
+        differences = 0
+        for model, key, contract_field in SUMMARIES:
+            stored = {row.pop(key): row for row in model.objects.values(key, *FIELDS)}
+            for row in aggregate(contract_field):
+                expected_key = row.pop(contract_field)
+                if not self.matches(stored.pop(expected_key, None), row):
+                    differences += 1
+                    self.stderr.write(f"{model.__name__} {expected_key} differs from its contracts.")
+            # Summaries left have no contract anymore
+            for extra_key, row in stored.items():
+                if row["contract_count"]:
+                    differences += 1
+                    self.stderr.write(f"{model.__name__} {extra_key} has no contract.")
+
+        if differences:
+            raise CommandError(f"{differences} summaries differ, run the command without --check to rebuild them.")
+        self.stdout.write(self.style.SUCCESS("Financial summaries are consistent."))
+
+    @staticmethod
+    def matches(stored, expected) -> bool:
+        # Sums of floats updated one contract at a time may differ by rounding
+        return stored is not None and all(math.isclose(stored[field], expected[field], abs_tol=0.01)
+                                          for field in FIELDS)
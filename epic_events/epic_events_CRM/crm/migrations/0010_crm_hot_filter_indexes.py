@@ -0,0 +1,38 @@
+# Generated by Django 5.0.3 on 2026-10-18 08:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0009_alter_contract_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='role',
+            name='name',
+            field=models.CharField(choices=[('management', 'Management'), ('sales', 'Sales'), ('support', 'Support')], db_index=True, max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['name'], name='client_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['email'], name='client_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['client_infos', 'status'], name='contract_client_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['commercial_contact', 'status'], name='contract_contact_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evenement',
+            index=models.Index(fields=['support_contact', 'day_start'], name='event_support_day_idx'),
+        ),
+    ]
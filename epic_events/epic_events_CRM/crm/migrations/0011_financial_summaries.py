@@ -0,0 +1,65 @@
+# Generated by Django 5.0.3 on 2026-10-18 09:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def fill_summaries(apps, schema_editor):
+    """
+    Summaries of the contracts already there, from the same aggregate as services.financial_summary.rebuild
+    """
+    Contract = apps.get_model("crm", "Contract")
+    for model_name, key, contract_field in (("ClientFinancialSummary", "client_id", "client_infos_id"),
+                                            ("CommercialFinancialSummary", "commercial_contact_id",
+                                             "commercial_contact_id")):
+        model = apps.get_model("crm", model_name)
+        rows = (Contract.objects.filter(**{f"{contract_field}__isnull": False}).order_by()
+                .values(contract_field)
+                .annotate(contract_count=Count("id"),
+                          signed_count=Count("id", filter=Q(status="signed")),
+                          not_signed_count=Count("id", filter=Q(status="not_signed")),
+                          total_value=Sum("value"),
+                          total_due=Sum("due")))
+        model.objects.bulk_create([model(**{key: row.pop(contract_field)}, **row) for row in rows],
+                                  batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0010_crm_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientFinancialSummary',
+            fields=[
+                ('contract_count', models.PositiveIntegerField(default=0)),
+                ('signed_count', models.PositiveIntegerField(default=0)),
+                ('not_signed_count', models.PositiveIntegerField(default=0)),
+                ('total_value', models.FloatField(default=0)),
+                ('total_due', models.FloatField(default=0)),
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='financial_summary', serialize=False, to='crm.client')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='CommercialFinancialSummary',
+            fields=[
+                ('contract_count', models.PositiveIntegerField(default=0)),
+                ('signed_count', models.PositiveIntegerField(default=0)),
+                ('not_signed_count', models.PositiveIntegerField(default=0)),
+                ('total_value', models.FloatField(default=0)),
+                ('total_due', models.FloatField(default=0)),
+                ('commercial_contact', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='financial_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+    ]
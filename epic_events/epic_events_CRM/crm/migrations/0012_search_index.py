@@ -0,0 +1,73 @@
+from django.db import migrations
+
+
+# Indexed columns of each searched table, kept in step with services/search.py
+SEARCHED_COLUMNS = {
+    "crm_client": ["name", "company_name", "email"],
+    "crm_evenement": ["name", "location", "notes"],
+}
+
+
+def create_search_index(apps, schema_editor):
+    """
+    MySQL maintains FULLTEXT indexes itself, SQLite gets FTS5 tables over the rows
+    kept up to date by triggers
+    """
+    vendor = schema_editor.connection.vendor
+    for table, columns in SEARCHED_COLUMNS.items():
+        if vendor == "mysql":
+            schema_editor.execute(f"CREATE FULLTEXT INDEX {table}_search_idx ON {table} ({', '.join(columns)})")
+        elif vendor == "sqlite":
+            listed = ", ".join(columns)
+            new_values = ", ".join(f"new.{column}" for column in columns)
+            old_values = ", ".join(f"old.{column}" for column in columns)
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {table}_fts USING fts5({listed}, content='{table}', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2')")
+            schema_editor.execute(
+                f"CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {table}_fts(rowid, {listed}) VALUES (new.id, {new_values}); END")
+            schema_editor.execute(
+                f"CREATE TRIGGER {table}_fts_delete AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {table}_fts({table}_fts, rowid, {listed}) VALUES ('delete', old.id, {old_values}); END")
+            schema_editor.execute(
+                f"CREATE TRIGGER {table}_fts_update AFTER UPDATE ON {table} BEGIN "
+                f"INSERT INTO {table}_fts({table}_fts, rowid, {listed}) VALUES ('delete', old.id, {old_values}); "
+                f"INSERT INTO {table}_fts(rowid, {listed}) VALUES (new.id, {new_values}); END")
+            schema_editor.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table in SEARCHED_COLUMNS:
+        if vendor == "mysql":
+            schema_editor.execute(f"DROP INDEX {table}_search_idx ON {table}")
+        elif vendor == "sqlite":
+            for trigger in ("insert", "delete", "update"):
+                schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{trigger}")
+            schema_editor.execute(f"DROP TABLE IF EXISTS {table}_fts")
+
+
+def drop_sqlite_search_index(apps, schema_editor):
+    """
+    Before a later migration rebuilding a searched table, which SQLite does for most schema
+    changes and loses the triggers, MySQL keeps its FULLTEXT indexes through them
+    """
+    if schema_editor.connection.vendor == "sqlite":
+        drop_search_index(apps, schema_editor)
+
+
+def create_sqlite_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        create_search_index(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0011_financial_summaries'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
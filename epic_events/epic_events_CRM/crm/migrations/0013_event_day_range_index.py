@@ -0,0 +1,17 @@
+# Generated by Django 5.0.3 on 2026-10-18 09:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0012_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='evenement',
+            index=models.Index(fields=['day_start', 'date_end'], name='event_day_range_idx'),
+        ),
+    ]
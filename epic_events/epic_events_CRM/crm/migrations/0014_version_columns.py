@@ -0,0 +1,41 @@
+# Generated by Django 5.0.3 on 2026-10-18 09:31
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+
+# SQLite adds these columns by rebuilding the tables, which drops the search triggers
+search_index = import_module("crm.migrations.0012_search_index")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0013_event_day_range_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(search_index.drop_sqlite_search_index, search_index.create_sqlite_search_index),
+        migrations.AddField(
+            model_name='client',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='collaborator',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='evenement',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(search_index.create_sqlite_search_index, search_index.drop_sqlite_search_index),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.0.3 on 2026-10-18 09:39
+
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+# SQLite makes the emails unique by rebuilding the tables, which drops the search triggers
+search_index = import_module("crm.migrations.0012_search_index")
+
+
+def refuse_duplicate_emails(apps, schema_editor):
+    """
+    Name the duplicated emails to fix first, rather than the bare error of the unique index
+    """
+    for model_name in ("Client", "Collaborator"):
+        model = apps.get_model("crm", model_name)
+        duplicates = list(model.objects.order_by().values("email").annotate(count=Count("id"))
+                          .filter(count__gt=1).values_list("email", flat=True)[:10])
+        if duplicates:
+            raise ValueError(f"Emails used by several {model._meta.verbose_name_plural}, make them unique before "
+                             f"migrating: {', '.join(repr(email) for email in duplicates)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0014_version_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(refuse_duplicate_emails, migrations.RunPython.noop),
+        migrations.RunPython(search_index.drop_sqlite_search_index, search_index.create_sqlite_search_index),
+        migrations.RemoveIndex(
+            model_name='client',
+            name='client_email_idx',
+        ),
+        migrations.AlterField(
+            model_name='client',
+            name='email',
+            field=models.EmailField(max_length=254, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='collaborator',
+            name='email',
+            field=models.EmailField(max_length=254, unique=True, verbose_name='email address'),
+        ),
+        migrations.RunPython(search_index.create_sqlite_search_index, search_index.drop_sqlite_search_index),
+    ]
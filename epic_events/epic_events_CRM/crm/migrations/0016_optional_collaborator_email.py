@@ -0,0 +1,28 @@
+# Generated by Django 5.0.3 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+def blank_emails_to_null(apps, schema_editor):
+    apps.get_model("crm", "Collaborator").objects.filter(email="").update(email=None)
+
+
+def null_emails_to_blank(apps, schema_editor):
+    # Refused by the unique index when several collaborators have no email
+    apps.get_model("crm", "Collaborator").objects.filter(email__isnull=True).update(email="")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0015_unique_emails'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='collaborator',
+            name='email',
+            field=models.EmailField(blank=True, max_length=254, null=True, unique=True, verbose_name='email address'),
+        ),
+        migrations.RunPython(blank_emails_to_null, null_emails_to_blank),
+    ]
@@ -1,14 +1,138 @@
 from django.contrib.auth.models import AbstractUser, Group
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.conf import settings
+from typing import Any, Dict, List
 
 
-class Client(models.Model):
+class ConcurrentModificationError(ValidationError):
+    """
+    The row was saved by someone else since the instance was loaded
+    """
+    def __init__(self, instance: models.Model, changed_fields: list):
+        self.instance = instance
+        self.changed_fields = changed_fields
+        changed = f" ({', '.join(changed_fields)})" if changed_fields else ""
+        super().__init__(f"{instance._meta.verbose_name.capitalize()} {instance.pk} was modified by someone else"
+                         f" since you opened it{changed}. Reload it and apply your changes again.")
+
+
+class VersionedModel(models.Model):
+    """
+    Optimistic concurrency: every save of an existing row is an UPDATE ... WHERE version = n
+    that also increments the version, a save from a stale instance raises ConcurrentModificationError
+    instead of overwriting the changes saved meanwhile. Queryset updates changing the edited
+    columns increment the version with F("version") + 1.
+    The column values as loaded or last saved are remembered, save_changes writes only
+    the changed columns and nothing at all when none changed
+    """
+    version = models.PositiveIntegerField(default=0)
+    # Bookkeeping columns saved on their own without counting as an edit
+    unversioned_fields = frozenset()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_values = instance.column_values()
+        return instance
+
+    def column_values(self) -> Dict[str, Any]:
+        # Deferred columns are not in __dict__ and are left out
+        return {field.attname: self.__dict__[field.attname] for field in self._meta.concrete_fields
+                if field.attname in self.__dict__}
+
+    def get_changed_fields(self) -> List[str]:
+        """
+        Names of the fields set to another value since the instance was loaded or saved,
+        every field for an instance not saved yet
+        """
+        saved = getattr(self, "_saved_values", None)
+        if saved is None or self._state.adding:
+            return [field.name for field in self._meta.concrete_fields if not field.primary_key]
+        return [field.name for field in self._meta.concrete_fields
+                if field.attname in self.__dict__ and
+                (field.attname not in saved or saved[field.attname] != self.__dict__[field.attname])]
+
+    def save_changes(self, validate: bool = True) -> List[str]:
+        """
+        Validate and save only the changed fields, the others are neither cleaned nor written.
+        Uniqueness is left to the database constraints, the callers turn their IntegrityError
+        into a message. Return the names of the changed fields, empty when there was nothing to save
+        """
+        changed = self.get_changed_fields()
+        if not changed:
+            return []
+        if self._state.adding:
+            if validate:
+                self.full_clean(validate_unique=False)
+            self.save()
+            return changed
+
+        if validate:
+            self.full_clean(exclude=[field.name for field in self._meta.concrete_fields if field.name not in changed],
+                            validate_unique=False)
+        timestamps = [field.name for field in self._meta.concrete_fields
+                      if getattr(field, "auto_now", False) and field.name not in changed]
+        self.save(update_fields=changed + timestamps)
+        return changed
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        values = self.column_values()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or getattr(self, "_saved_values", None) is None:
+            self._saved_values = values
+        else:
+            saved = {self._meta.get_field(name).attname for name in update_fields} | {"version"}
+            self._saved_values = {**self._saved_values,
+                                  **{attname: values[attname] for attname in saved if attname in values}}
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using, fields, **kwargs)
+        values = self.column_values()
+        if fields is None or getattr(self, "_saved_values", None) is None:
+            self._saved_values = values
+        else:
+            refreshed = {self._meta.get_field(name).attname for name in fields}
+            self._saved_values = {**self._saved_values,
+                                  **{attname: values[attname] for attname in refreshed if attname in values}}
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        if update_fields and {field.name for field, model, value in values} <= self.unversioned_fields:
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+        version_field = self._meta.get_field("version")
+        expected = self.version
+        values = [value for value in values if value[0] is not version_field] + [(version_field, None, expected + 1)]
+        updated = super()._do_update(base_qs.filter(version=expected), using, pk_val, values, update_fields,
+                                     forced_update)
+        if updated:
+            self.version = expected + 1
+            return True
+
+        current = base_qs.filter(pk=pk_val).values().first()
+        if current is None:
+            # Deleted meanwhile, Django goes on with an INSERT as for any missing row
+            return False
+        # The columns the other save changed, compared with the values this instance was loaded with.
+        # auto_now timestamps always differ, they say nothing about the conflict
+        loaded = getattr(self, "_saved_values", None) or self.column_values()
+        changed = [field.name for field in self._meta.concrete_fields
+                   if field is not version_field and not getattr(field, "auto_now", False) and
+                   field.name not in self.unversioned_fields and
+                   field.attname in current and field.attname in loaded and
+                   current[field.attname] != loaded[field.attname]]
+        raise ConcurrentModificationError(self, changed)
+
+
+class Client(VersionedModel):
     """
     Model for a client with a link to a commercial contact
     """
     name = models.CharField(max_length=100)
-    email = models.EmailField()
+    email = models.EmailField(unique=True)
     phone = models.CharField(max_length=20)
     company_name = models.CharField(max_length=100)
     creation_date = models.DateTimeField(auto_now_add=True)
@@ -18,8 +142,13 @@ class Client(models.Model):
     def __str__(self):
         return self.name
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["name"], name="client_name_idx"),
+        ]
 
-class Contract(models.Model):
+
+class Contract(VersionedModel):
     """
     Model for a contract with a link to a client and a commercial_contact
     """
@@ -43,9 +172,13 @@ class Contract(models.Model):
         permissions = [
             ("manage_contracts_creation_modification", "Can create and modify contracts"),
         ]
+        indexes = [
+            models.Index(fields=["client_infos", "status"], name="contract_client_status_idx"),
+            models.Index(fields=["commercial_contact", "status"], name="contract_contact_status_idx"),
+        ]
 
 
-class Evenement(models.Model):
+class Evenement(VersionedModel):
     """
     Model for an event with a link to a contract, a client,
     a commercial_contact and a support_contact
@@ -65,6 +198,13 @@ class Evenement(models.Model):
     def __str__(self):
         return f"Evenement {self.id} - {self.client_name}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["support_contact", "day_start"], name="event_support_day_idx"),
+            # Calendar windows: day_start bounds the range scan, date_end is filtered from the index
+            models.Index(fields=["day_start", "date_end"], name="event_day_range_idx"),
+        ]
+
 
 class Role(models.Model):
     """
@@ -77,21 +217,68 @@ class Role(models.Model):
         ('support', 'Support')
     ]
 
-    name = models.CharField(max_length=10, choices=ROLES)
+    name = models.CharField(max_length=10, choices=ROLES, db_index=True)
 
     def __str__(self):
         return self.name
 
 
-class Collaborator(AbstractUser):
+class Collaborator(VersionedModel, AbstractUser):
     """
     Model for a collaborator with a link to a role
     """
+    # Optional as for any Django user, the blank emails are stored as NULL that the unique index does not compare
+    email = models.EmailField("email address", unique=True, blank=True, null=True)
     role = models.ForeignKey(Role, on_delete=models.SET_NULL, null=True)
     employee_number = models.CharField(max_length=50, unique=True)
     is_superuser = models.BooleanField(default=False)
 
+    # Saved by update_last_login at each login, which must not fail the edits in progress
+    unversioned_fields = frozenset({"last_login"})
+
     class Meta:
         permissions = [
             ("manage_collaborators", "Can create, update and delete collaborators")
         ]
+
+    def save(self, *args, **kwargs):
+        if not self.email:
+            self.email = None
+        super().save(*args, **kwargs)
+
+
+class FinancialSummary(models.Model):
+    """
+    Contract figures aggregated for a client or a commercial contact, kept up to date
+    when contracts are saved or deleted and rebuilt by the rebuild_financial_summary command
+    """
+    contract_count = models.PositiveIntegerField(default=0)
+    signed_count = models.PositiveIntegerField(default=0)
+    not_signed_count = models.PositiveIntegerField(default=0)
+    total_value = models.FloatField(default=0)
+    total_due = models.FloatField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class ClientFinancialSummary(FinancialSummary):
+    """
+    Contract figures of a client
+    """
+    client = models.OneToOneField(Client, on_delete=models.CASCADE, primary_key=True,
+                                  related_name="financial_summary")
+
+    def __str__(self):
+        return f"Summary - {self.client_id}"
+
+
+class CommercialFinancialSummary(FinancialSummary):
+    """
+    Contract figures of a commercial contact
+    """
+    commercial_contact = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                                              primary_key=True, related_name="financial_summary")
+
+    def __str__(self):
+        return f"Summary - {self.commercial_contact_id}"
@@ -1,3 +1,1321 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+from datetime import date, datetime
+from unittest.mock import MagicMock, patch
+from click.testing import CliRunner
+from django.contrib.auth.models import Group, Permission, update_last_login
+from django.contrib.contenttypes.models import ContentType
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, QuerySet
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from cli import crm as crm_cli
+from controllers.crm_controllers import CRMController
+from controllers.menus.general_controller import GeneralController
+from controllers.menus.management_controller import ManagementController
+from controllers.menus.menu_loop import MenuLoop
+from controllers.menus.support_controller import SupportController
+from crm.models import (Collaborator, Client, ClientFinancialSummary, CommercialFinancialSummary,
+                        ConcurrentModificationError, Contract, Evenement, Role)
+from services.crm_functions import CRMFunctions
+from services.profiling import ActionProfiler
+from services.reporting import (BufferedReporter, get_operation, init_sentry, init_sentry_in_background,
+                                reporter)
+from services.calendar import find_overlaps
+from services.scheduler import Bookings
+from services.dashboard import dashboard_cache, get_management_dashboard
+from services.financial_summary import bulk_changes, summaries_paused
+from services.prefix_index import PrefixIndex, client_names, collaborator_usernames, support_usernames
+from services.reference_cache import ReferenceCache, get_group, get_role, reference_cache
+from views.crm_base_view import BaseView
+from views.menus.general_view import GeneralView
 
-# Create your tests here.
+
+class CRMTestData:
+    """
+    Helpers creating the collaborators, clients, contracts and events used by the tests
+    """
+    @staticmethod
+    def create_collaborator(username: str, role_name: str) -> Collaborator:
+        role, created = Role.objects.get_or_create(name=role_name)
+        return Collaborator.objects.create(username=username,
+                                           first_name=username.capitalize(),
+                                           last_name="Test",
+                                           email=f"{username}@example.net",
+                                           role=role,
+                                           employee_number=f"emp-{username}")
+
+    @staticmethod
+    def create_rows(count: int, sales: Collaborator, support: Collaborator) -> None:
+        start = Client.objects.count()
+        for index in range(start, start + count):
+            client = Client.objects.create(name=f"client {index}",
+                                           email=f"client{index}@client.com",
+                                           phone="0600000000",
+                                           company_name=f"company {index}",
+                                           commercial_contact=sales)
+            contract = Contract.objects.create(client_infos=client, commercial_contact=sales,
+                                               value=1000, due=100 * (index % 2), status="signed")
+            Evenement.objects.create(contract=contract, name=f"event {index}", client=client,
+                                     client_name=client.name, client_contact="John Doe",
+                                     day_start=date(2024, 5, 10), date_end=date(2024, 5, 11),
+                                     support_contact=support if index % 2 else None,
+                                     location="Paris", attendees=50, notes="Meeting")
+
+
+class CRMTestCase(TestCase):
+    """
+    Test case emptying the in-process caches, whose entries would outlive
+    the rows rolled back at the end of each test, and spooling the reports
+    in a temporary directory
+    """
+    def setUp(self):
+        reference_cache.clear()
+        dashboard_cache.clear()
+        client_names.clear()
+        collaborator_usernames.clear()
+        support_usernames.clear()
+        spool_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(spool_directory.cleanup)
+        self.addCleanup(setattr, reporter, "spool_path", reporter.spool_path)
+        self.addCleanup(reporter.flush)
+        reporter.spool_path = os.path.join(spool_directory.name, "spool.jsonl")
+
+
+class ListQueriesTest(CRMTestCase):
+    """
+    Rendering a list must cost the same number of queries whatever the number of rows
+    """
+    def count_queries(self, get_objects, object_type: str, sales: Collaborator, support: Collaborator) -> int:
+        with CaptureQueriesContext(connection) as context:
+            with redirect_stdout(io.StringIO()), patch("click.prompt", return_value="q"):
+                BaseView().display_list(get_objects(sales, support), object_type)
+        return len(context.captured_queries)
+
+    def assert_constant_queries(self, get_objects, object_type: str) -> None:
+        sales = CRMTestData.create_collaborator("sales", "sales")
+        support = CRMTestData.create_collaborator("support", "support")
+        CRMTestData.create_rows(2, sales, support)
+        small_count = self.count_queries(get_objects, object_type, sales, support)
+        CRMTestData.create_rows(20, sales, support)
+        self.assertEqual(self.count_queries(get_objects, object_type, sales, support), small_count)
+
+    def test_all_contracts(self):
+        self.assert_constant_queries(lambda sales, support: CRMFunctions.get_all_objects("contracts"), "contracts")
+
+    def test_all_events(self):
+        self.assert_constant_queries(lambda sales, support: CRMFunctions.get_all_objects("events"), "events")
+
+    def test_all_clients(self):
+        self.assert_constant_queries(lambda sales, support: CRMFunctions.get_all_objects("clients"), "clients")
+
+    def test_events_with_optional_filter(self):
+        self.assert_constant_queries(
+            lambda sales, support: CRMFunctions.get_all_events_with_optional_filter(True), "events")
+
+    def test_events_for_collaborator(self):
+        self.assert_constant_queries(
+            lambda sales, support: CRMFunctions.get_events_for_collaborator(support.id), "events")
+
+    def test_filtered_contracts_for_collaborator(self):
+        self.assert_constant_queries(
+            lambda sales, support: CRMFunctions().get_filtered_contracts_for_collaborator(sales.id, "signed"),
+            "contracts")
+
+
+class KeysetPaginationTest(CRMTestCase):
+    """
+    Pages are fetched by id cursor and only hold the requested rows
+    """
+    def setUp(self):
+        super().setUp()
+        CRMTestData.create_rows(7, CRMTestData.create_collaborator("sales", "sales"),
+                                CRMTestData.create_collaborator("support", "support"))
+        self.clients = Client.objects.all()
+        self.ids = list(self.clients.order_by("id").values_list("id", flat=True))
+
+    def test_next_and_previous_pages(self):
+        first = CRMFunctions.get_page(self.clients, page_size=3)
+        self.assertEqual([client.id for client in first.objects], self.ids[:3])
+        self.assertFalse(first.has_previous)
+        self.assertTrue(first.has_next)
+
+        second = CRMFunctions.get_page(self.clients, after_id=first.last_id, page_size=3)
+        self.assertEqual([client.id for client in second.objects], self.ids[3:6])
+
+        last = CRMFunctions.get_page(self.clients, after_id=second.last_id, page_size=3)
+        self.assertEqual([client.id for client in last.objects], self.ids[6:])
+        self.assertFalse(last.has_next)
+
+        previous = CRMFunctions.get_page(self.clients, before_id=last.first_id, page_size=3)
+        self.assertEqual([client.id for client in previous.objects], self.ids[3:6])
+        self.assertTrue(previous.has_previous)
+
+    def test_jump_to_id(self):
+        page = CRMFunctions.get_page(self.clients, from_id=self.ids[2], page_size=3)
+        self.assertEqual([client.id for client in page.objects], self.ids[2:5])
+        self.assertTrue(page.has_previous)
+
+    def test_one_query_per_page(self):
+        with self.assertNumQueries(1):
+            CRMFunctions.get_page(CRMFunctions.get_all_objects("contracts"), after_id=self.ids[0], page_size=3)
+
+
+class IndexUsageTest(CRMTestCase):
+    """
+    EXPLAIN every filtered CRMFunctions query and check it is served by an index
+    instead of a full table scan
+    """
+    def setUp(self):
+        super().setUp()
+        self.sales = CRMTestData.create_collaborator("sales", "sales")
+        self.support = CRMTestData.create_collaborator("support", "support")
+        CRMTestData.create_rows(5, self.sales, self.support)
+
+    def assert_uses_index(self, queryset: QuerySet) -> None:
+        plan = queryset.explain()
+        if connection.vendor == "mysql":
+            self.assertNotIn("\tALL\t", plan, plan)
+        else:
+            full_scans = re.findall(r"SCAN (crm_\w+)(?! USING)", plan)
+            self.assertEqual(full_scans, [], plan)
+
+    def test_clients_for_collaborator(self):
+        self.assert_uses_index(CRMFunctions.get_clients_for_collaborator(self.sales.id))
+
+    def test_client_lookups(self):
+        self.assert_uses_index(Client.objects.filter(name="client 1"))
+        self.assert_uses_index(Client.objects.filter(email="client1@client.com"))
+
+    def test_filtered_contracts_for_collaborator(self):
+        self.assert_uses_index(CRMFunctions().get_filtered_contracts_for_collaborator(self.sales.id, "signed"))
+
+    def test_events_without_support_contact(self):
+        self.assert_uses_index(CRMFunctions.get_all_events_with_optional_filter(False))
+
+    def test_events_for_collaborator(self):
+        with redirect_stdout(io.StringIO()):
+            self.assert_uses_index(CRMFunctions.get_events_for_collaborator(self.support.id))
+
+    def test_support_collaborators(self):
+        self.assert_uses_index(Collaborator.objects.filter(role__name="support"))
+
+
+class ContractFilterTest(CRMTestCase):
+    """
+    The contracts of a collaborator are filtered in one query on the clients they own
+    """
+    def setUp(self):
+        super().setUp()
+        self.sales = CRMTestData.create_collaborator("sales", "sales")
+        support = CRMTestData.create_collaborator("support", "support")
+        CRMTestData.create_rows(4, self.sales, support)
+        CRMTestData.create_rows(3, CRMTestData.create_collaborator("sales2", "sales"), support)
+        Contract.objects.filter(id=Contract.objects.filter(commercial_contact=self.sales).first().id).update(
+            status="not_signed")
+
+    def get_contracts(self, filter_type):
+        with self.assertNumQueries(1):
+            return list(CRMFunctions().get_filtered_contracts_for_collaborator(self.sales.id, filter_type))
+
+    def test_filters(self):
+        self.assertEqual(len(self.get_contracts(None)), 4)
+        self.assertEqual(len(self.get_contracts("signed")), 3)
+        self.assertEqual(len(self.get_contracts("not_signed")), 1)
+        self.assertTrue(all(contract.due > 0 for contract in self.get_contracts("no_fully_paid")))
+        self.assertEqual(len(self.get_contracts("no_fully_paid")), 2)
+
+    def test_unsupported_filter(self):
+        with self.assertRaises(ValueError):
+            CRMFunctions().get_filtered_contracts_for_collaborator(self.sales.id, "open")
+
+
+class ImportCRMTest(CRMTestCase):
+    """
+    The import command resolves the foreign keys from lookup maps and inserts by batches
+    """
+    def write_file(self, name: str, content: str) -> str:
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content)
+        return path
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        CRMTestData.create_collaborator("sales", "sales")
+        CRMTestData.create_collaborator("support", "support")
+
+    def test_import_files(self):
+        clients = self.write_file("clients.csv", "name,email,phone,company_name,commercial_contact\n"
+                                                 "first client,first@client.com,0600000000,first company,sales\n"
+                                                 "second client,second@client.com,0600000001,second company,\n"
+                                                 "lost client,lost@client.com,0600000002,lost company,nobody\n")
+        contracts = self.write_file("contracts.jsonl",
+                                    '{"client": "first client", "commercial_contact": "sales", "value": 1000, '
+                                    '"due": 200, "status": "signed"}\n'
+                                    '{"client": "unknown client", "commercial_contact": "sales", "value": 1, '
+                                    '"due": 0, "status": "signed"}\n')
+        events = self.write_file("events.csv", "name,client_name,client_contact,support_contact,day_start,"
+                                               "date_end,location,attendees,notes\n"
+                                               "first event,first client,John Doe,support,2024-05-10,2024-05-11,"
+                                               "Paris,50,Meeting\n"
+                                               "second event,second client,Jane Doe,,2024-06-10,2024-06-11,"
+                                               "Lyon,20,\n")
+
+        with redirect_stdout(io.StringIO()) as output:
+            call_command("import_crm", clients=clients, contracts=contracts, events=events, batch_size=1,
+                         stdout=sys.stdout, stderr=io.StringIO())
+
+        self.assertIn("rows/s", output.getvalue())
+        self.assertEqual(Client.objects.count(), 2)
+        self.assertIsNone(Client.objects.get(name="second client").commercial_contact)
+        self.assertEqual(Contract.objects.get().client_infos.name, "first client")
+        self.assertEqual(Evenement.objects.get(name="first event").support_contact.username, "support")
+        self.assertEqual(Evenement.objects.count(), 2)
+
+    def test_malformed_rows_are_skipped(self):
+        clients = self.write_file("clients.csv", "name,email,phone,company_name,commercial_contact\n"
+                                                 "first client,first@client.com,0600000000,first company,sales\n")
+        contracts = self.write_file("contracts.jsonl",
+                                    '{"client": "first client", "commercial_contact": "sales", "value": 1000, '
+                                    '"due": 200, "status": "signed"}\n'
+                                    '{"client": "first client", "value": "a lot", "due": 0, "status": "signed"}\n'
+                                    '{"client": "first client", "value": 10, "due": 0, "status": "paid"}\n'
+                                    '{"client": "first client", "value": 10, "status": "signed"}\n')
+        events = self.write_file("events.csv", "name,client_name,client_contact,support_contact,day_start,"
+                                               "date_end,location,attendees,notes\n"
+                                               "first event,first client,John Doe,support,2024-05-10,2024-05-11,"
+                                               "Paris,50,Meeting\n"
+                                               "second event,first client,Jane Doe,,10/06/2024,2024-06-11,"
+                                               "Lyon,20,\n"
+                                               "third event,first client,Jane Doe\n")
+
+        errors = io.StringIO()
+        with redirect_stdout(io.StringIO()):
+            call_command("import_crm", clients=clients, contracts=contracts, events=events,
+                         stdout=sys.stdout, stderr=errors)
+
+        self.assertEqual((Contract.objects.count(), Evenement.objects.count()), (1, 1))
+        report = errors.getvalue()
+        self.assertIn("contracts.jsonl:2 skipped, invalid value: could not convert string to float", report)
+        self.assertIn("contracts.jsonl:3 skipped, invalid value: unknown status 'paid'", report)
+        self.assertIn("contracts.jsonl:4 skipped, missing column due.", report)
+        self.assertIn("events.csv:2 skipped, invalid value", report)
+        self.assertIn("events.csv:3 skipped, invalid value", report)
+
+    def test_duplicate_emails_are_skipped(self):
+        Client.objects.create(name="known client", email="known@client.com", phone="0600000000",
+                              company_name="known company")
+        clients = self.write_file("clients.csv", "name,email,phone,company_name,commercial_contact\n"
+                                                 "first client,first@client.com,0600000000,first company,sales\n"
+                                                 "copy client,first@client.com,0600000001,copy company,sales\n"
+                                                 "other client,known@client.com,0600000002,other company,\n"
+                                                 "second client,second@client.com,0600000003,second company,\n")
+
+        errors = io.StringIO()
+        with redirect_stdout(io.StringIO()) as output:
+            call_command("import_crm", clients=clients, batch_size=2, stdout=sys.stdout, stderr=errors)
+
+        self.assertIn("2 clients imported", output.getvalue())
+        self.assertEqual(sorted(Client.objects.values_list("name", flat=True)),
+                         ["first client", "known client", "second client"])
+        report = errors.getvalue()
+        self.assertIn("clients.csv:2 skipped, email 'first@client.com' already used by another client.", report)
+        self.assertIn("clients.csv:3 skipped, email 'known@client.com' already used by another client.", report)
+
+
+class ExportCRMTest(CRMTestCase):
+    """
+    The export command streams the tables in the format read back by import_crm
+    """
+    def setUp(self):
+        super().setUp()
+        CRMTestData.create_rows(3, CRMTestData.create_collaborator("sales", "sales"),
+                                CRMTestData.create_collaborator("support", "support"))
+
+    def export(self, *args, **options) -> str:
+        output = io.StringIO()
+        with redirect_stdout(output):
+            call_command("export_crm", *args, stdout=sys.stdout, **options)
+        return output.getvalue()
+
+    def test_export_jsonl(self):
+        lines = self.export("contracts", format="jsonl", chunk_size=2).splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(json.loads(lines[0])["commercial_contact"], "sales")
+
+    def test_export_csv(self):
+        rows = list(csv.DictReader(io.StringIO(self.export("events"))))
+        self.assertEqual([row["day_start"] for row in rows], ["2024-05-10"] * 3)
+        self.assertNotIn("password", self.export("collaborators"))
+
+    def test_export_since(self):
+        self.assertEqual(self.export("clients", format="jsonl", since=date(2100, 1, 1)), "")
+
+
+class PermissionSnapshotTest(CRMTestCase):
+    """
+    Permissions are loaded once per collaborator and reloaded after a role change
+    """
+    def setUp(self):
+        super().setUp()
+        add_client = Permission.objects.get(codename="add_client")
+        Group.objects.create(name="sales_team").permissions.add(add_client)
+        Group.objects.create(name="support_team")
+        self.collaborator = CRMTestData.create_collaborator("sales", "sales")
+        self.collaborator.groups.add(Group.objects.get(name="sales_team"))
+        self.addCleanup(CRMFunctions.invalidate_permissions, self.collaborator.id)
+
+    def test_checks_after_login_do_not_query(self):
+        with self.assertNumQueries(1):
+            CRMFunctions.load_permissions(self.collaborator)
+        with self.assertNumQueries(0):
+            self.assertTrue(CRMFunctions.has_permission(self.collaborator, "crm.add_client"))
+            self.assertFalse(CRMFunctions.has_permission(self.collaborator, "crm.manage_collaborators"))
+
+    def test_role_change_invalidates_snapshot(self):
+        CRMFunctions.load_permissions(self.collaborator)
+        CRMFunctions.modify_collaborator(Collaborator.objects.get(id=self.collaborator.id), {"role_name": "support"})
+        self.assertFalse(CRMFunctions.has_permission(self.collaborator, "crm.add_client"))
+
+
+class ReferenceCacheTest(CRMTestCase):
+    """
+    Reference data is read once and reloaded after a change
+    """
+    def test_support_roster_cached_until_change(self):
+        CRMTestData.create_collaborator("support", "support")
+        self.assertEqual(len(CRMFunctions.get_support_collaborators()), 1)
+        with self.assertNumQueries(0):
+            CRMFunctions.get_support_collaborators()
+        CRMTestData.create_collaborator("support2", "support")
+        self.assertEqual(len(CRMFunctions.get_support_collaborators()), 2)
+
+    def test_role_and_group_cached(self):
+        CRMFunctions.register_collaborator("Emma", "Stone", "emma", "Password1", "emma@example.net",
+                                           "support", "9475")
+        with self.assertNumQueries(0):
+            get_role("support")
+            get_group("support_team")
+
+    def test_eviction(self):
+        cache = ReferenceCache(ttl=60, max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.get(key, lambda: key)
+        self.assertEqual(list(cache.entries), ["b", "c"])
+        expired = ReferenceCache(ttl=0)
+        expired.get("a", lambda: 1)
+        self.assertEqual(expired.get("a", lambda: 2), 2)
+
+
+class ReportingTest(CRMTestCase):
+    """
+    Without a Sentry DSN the reports are written to the local spool file
+    """
+    def test_spool_without_dsn(self):
+        spool_path = os.path.join(os.path.dirname(reporter.spool_path), "reports.jsonl")
+        buffered_reporter = BufferedReporter(spool_path=spool_path, flush_interval=0.01)
+        buffered_reporter.submit({"level": "info", "message": "Collaborator emma has been registered."})
+        try:
+            raise ValueError("Client 'unknown' not found")
+        except ValueError as e:
+            buffered_reporter.submit({"level": "error", "error": e})
+        buffered_reporter.flush()
+
+        with open(spool_path, encoding="utf-8") as spool_file:
+            records = [json.loads(line) for line in spool_file]
+        self.assertEqual(records[0]["message"], "Collaborator emma has been registered.")
+        self.assertEqual(records[1]["exception"], "ValueError")
+        self.assertIn("raise ValueError", records[1]["traceback"])
+
+    def test_send_waits_for_sentry_init(self):
+        ready_when_sent = []
+
+        def slow_init(**options):
+            time.sleep(0.2)
+
+        with patch("services.reporting.sentry_init_started", threading.Event()), \
+                patch("services.reporting.sentry_ready", threading.Event()) as sentry_ready, \
+                patch("sentry_sdk.init", slow_init), \
+                patch("services.reporting.sentry_client", lambda: ready_when_sent.append(sentry_ready.is_set())):
+            init_sentry_in_background()
+            spool_path = os.path.join(os.path.dirname(reporter.spool_path), "early.jsonl")
+            BufferedReporter(spool_path=spool_path).send([{"level": "info", "message": "Sent during init"}])
+        self.assertEqual(ready_when_sent, [True])
+
+    def test_thread_survives_a_failed_spool(self):
+        directory = os.path.dirname(reporter.spool_path)
+        buffered_reporter = BufferedReporter(spool_path=os.path.join(directory, "missing", "reports.jsonl"),
+                                             flush_interval=0.01)
+        with patch("sys.stderr", io.StringIO()) as errors:
+            buffered_reporter.submit({"level": "info", "message": "Lost"})
+            buffered_reporter.flush()
+        self.assertIn("Could not send or spool 1 reported events: FileNotFoundError", errors.getvalue())
+
+        buffered_reporter.spool_path = os.path.join(directory, "reports.jsonl")
+        buffered_reporter.submit({"level": "info", "message": "Kept"})
+        buffered_reporter.flush()
+        self.assertTrue(buffered_reporter.thread.is_alive())
+        with open(buffered_reporter.spool_path, encoding="utf-8") as spool_file:
+            self.assertEqual([json.loads(line)["message"] for line in spool_file], ["Kept"])
+
+
+class OperationSamplingTest(CRMTestCase):
+    """
+    The login, the menu actions and the commands run in Sentry transactions of their operation type
+    """
+    def setUp(self):
+        super().setUp()
+        self.operations = []
+
+        def sampler(sampling_context):
+            self.operations.append(get_operation(sampling_context))
+            return 0.0
+
+        import sentry_sdk
+        # Cleanups run last first, Sentry is initialized again once SENTRY_DSN is unset
+        self.addCleanup(sentry_sdk.init, dsn=None)
+        for patcher in (patch.dict(os.environ, {"SENTRY_DSN": "https://public@sentry.invalid/1"}),
+                        patch("services.reporting.traces_sampler", sampler)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        init_sentry()
+        self.sales = CRMTestData.create_collaborator("sales", "sales")
+        self.sales.set_password("Mdp12345")
+        self.sales.save()
+        self.addCleanup(CRMFunctions.invalidate_permissions, self.sales.id)
+
+    def test_sampler_gets_the_operations(self):
+        choices = iter([1, 2])
+        MenuLoop(lambda: None, lambda: next(choices), {1: lambda: None}, 2, MagicMock(), lambda: True).run()
+        self.assertEqual(self.operations, ["cli.menu_action"])
+
+        controller = CRMController()
+        controller.view_cli = MagicMock()
+        controller.view_cli.prompt_login.return_value = {"username": "sales", "password": "Mdp12345"}
+        self.assertEqual(controller.authenticate_collaborator(), self.sales)
+        self.assertEqual(self.operations[-1], "cli.login")
+
+        result = CliRunner().invoke(crm_cli, ["token", "create"],
+                                    env={"CRM_TOKEN": "", "CRM_USERNAME": "sales", "CRM_PASSWORD": "Mdp12345"})
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(self.operations[2:], ["cli.command", "cli.login"])
+
+
+class SQLiteProfileTest(CRMTestCase):
+    """
+    The app runs on the SQLite profile selected from the environment, each check
+    runs in a fresh interpreter since the settings are read once at startup
+    """
+    def run_script(self, script: str, **env: str) -> str:
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": "epic_events_CRM.settings", "DB_ENGINE": "sqlite", **env}
+        completed = subprocess.run([sys.executable, "-c", script], cwd=settings.BASE_DIR, env=env,
+                                   capture_output=True, text=True, timeout=60)
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+        return completed.stdout.split()
+
+    def test_in_memory_database_is_prepared(self):
+        output = self.run_script(
+            "import main\n"
+            "main.prepare_in_memory_database()\n"
+            "from crm.models import Collaborator\n"
+            "print(Collaborator.objects.count(), Collaborator.objects.get(username='sales').has_perm('crm.add_event'))",
+            DB_NAME=":memory:")
+        self.assertEqual(output, ["3", "True"])
+
+    def test_connection_is_kept_between_actions(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = self.run_script(
+                "import main\n"
+                "from django.core.management import call_command\n"
+                "from django.db import close_old_connections, connection\n"
+                "call_command('migrate', verbosity=0)\n"
+                "first = connection.connection\n"
+                "close_old_connections()\n"
+                "connection.ensure_connection()\n"
+                "print(connection.settings_dict['CONN_MAX_AGE'], connection.connection is first)",
+                DB_NAME=os.path.join(directory, "db.sqlite3"), DB_CONN_MAX_AGE="none")
+        self.assertEqual(output, ["None", "True"])
+
+
+class GenerateCRMDataTest(CRMTestCase):
+    """
+    The generated data only depends on the seed and the number of events
+    """
+    def generate(self, seed: int) -> list:
+        call_command("generate_crm_data", events=200, seed=seed, clear=True, stdout=io.StringIO())
+        return list(Evenement.objects.order_by("id").values_list(
+            "name", "client_name", "client__commercial_contact__username", "contract__status",
+            "support_contact__username", "day_start", "date_end", "attendees", "location"))
+
+    def test_same_seed_same_data(self):
+        events = self.generate(seed=3)
+        self.assertEqual(self.generate(seed=3), events)
+        self.assertNotEqual(self.generate(seed=4), events)
+
+    def test_sizes_and_relations(self):
+        self.generate(seed=3)
+        self.assertEqual(Evenement.objects.count(), 200)
+        self.assertEqual(Client.objects.count(), 50)
+        self.assertEqual(Contract.objects.count(), 133)
+        self.assertFalse(Evenement.objects.exclude(contract__isnull=True).exclude(
+            contract__client_infos=F("client")).exists())
+        self.assertFalse(Evenement.objects.exclude(contract__isnull=True).exclude(contract__status="signed").exists())
+        self.assertTrue(Evenement.objects.filter(support_contact__isnull=True).exists())
+
+    def test_refuses_to_mix_with_existing_clients(self):
+        self.generate(seed=3)
+        with self.assertRaises(CommandError):
+            call_command("generate_crm_data", events=200, stdout=io.StringIO())
+
+
+class ActionProfilerTest(CRMTestCase):
+    """
+    The profiler summarizes each menu action with its queries and call times
+    """
+    def test_action_summary(self):
+        output = io.StringIO()
+        profiler = ActionProfiler(output)
+
+        class MenuView:
+            def get_user_menu_choice(self):
+                return 4
+
+            def display_clients(self, clients):
+                return [client.name for client in clients]
+
+        class ClientService:
+            @staticmethod
+            def get_client(client_id):
+                return Client.objects.filter(id=client_id).first()
+
+        profiler.instrument_view(MenuView)
+        profiler.instrument(ClientService, "service")
+        with connection.execute_wrapper(profiler.record_query):
+            MenuView().get_user_menu_choice()
+            clients = [ClientService.get_client(client_id) for client_id in range(3)]
+            MenuView().display_clients([client for client in clients if client])
+            profiler.end_action()
+
+        summary = output.getvalue()
+        self.assertIn("[profile] MenuView -> 4", summary)
+        self.assertIn("sql: 3 queries", summary)
+        self.assertIn("3x", summary)
+        self.assertIn("N+1 pattern", summary)
+        self.assertIn("ClientService.get_client (3x, service)", summary)
+        self.assertIn("MenuView.display_clients (1x, render)", summary)
+
+
+class CLITest(CRMTestCase):
+    """
+    The commands authenticate from the environment and check the same permissions as the menus
+    """
+    def setUp(self):
+        super().setUp()
+        view_event, created = Permission.objects.get_or_create(
+            codename="view_event", content_type=ContentType.objects.get_for_model(Evenement))
+        self.sales = CRMTestData.create_collaborator("sales", "sales")
+        self.support = CRMTestData.create_collaborator("support", "support")
+        self.manager = CRMTestData.create_collaborator("manager", "management")
+        self.sales.user_permissions.add(Permission.objects.get(codename="view_contract"), view_event)
+        self.manager.user_permissions.add(view_event)
+        for collaborator in (self.sales, self.manager):
+            collaborator.set_password("Mdp12345")
+            collaborator.save()
+            self.addCleanup(CRMFunctions.invalidate_permissions, collaborator.id)
+        CRMTestData.create_rows(4, self.sales, self.support)
+        self.runner = CliRunner()
+
+    def run_cli(self, args: list, **env: str):
+        env = {"CRM_TOKEN": "", "CRM_USERNAME": "", "CRM_PASSWORD": "", **env}
+        return self.runner.invoke(crm_cli, args, env=env)
+
+    def test_contracts_list(self):
+        result = self.run_cli(["contracts", "list", "--owner", "me", "--unpaid", "--format", "jsonl"],
+                              CRM_USERNAME="sales", CRM_PASSWORD="Mdp12345")
+        self.assertEqual(result.exit_code, 0, result.output)
+        rows = [json.loads(line) for line in result.output.splitlines()]
+        self.assertEqual([row["client"] for row in rows], ["client 1", "client 3"])
+
+    def test_token(self):
+        result = self.run_cli(["token", "create"], CRM_USERNAME="manager", CRM_PASSWORD="Mdp12345")
+        token = result.output.strip()
+        event = Evenement.objects.filter(support_contact__isnull=True).first()
+        # The other rows book the support contact on the same days
+        Evenement.objects.filter(id=event.id).update(day_start=date(2024, 6, 3), date_end=date(2024, 6, 4))
+
+        result = self.run_cli(["events", "assign", "--event", str(event.id), "--support", "support"],
+                              CRM_TOKEN=token)
+        self.assertEqual(result.exit_code, 0, result.output)
+        event.refresh_from_db()
+        self.assertEqual(event.support_contact, self.support)
+
+        self.manager.set_password("Changed123")
+        self.manager.save()
+        result = self.run_cli(["events", "list"], CRM_TOKEN=token)
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("Invalid token", result.output)
+
+    def test_sentry_only_started_with_a_dsn(self):
+        with patch("cli.init_sentry_in_background") as init:
+            self.run_cli(["token", "create"], CRM_USERNAME="sales", CRM_PASSWORD="Mdp12345", SENTRY_DSN="")
+            init.assert_not_called()
+            self.run_cli(["token", "create"], CRM_USERNAME="sales", CRM_PASSWORD="Mdp12345",
+                         SENTRY_DSN="https://public@sentry.invalid/1")
+            init.assert_called_once_with()
+
+    def test_assign_needs_management(self):
+        event = Evenement.objects.first()
+        result = self.run_cli(["events", "assign", "--event", str(event.id), "--support", "support"],
+                              CRM_USERNAME="sales", CRM_PASSWORD="Mdp12345")
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("You do not have permission", result.output)
+
+
+class MenuLoopTest(CRMTestCase):
+    """
+    The menus loop instead of recursing, the stack stays flat over long sessions
+    """
+    def test_long_session(self):
+        depths = []
+
+        def record_depth(object_type):
+            frame, depth = sys._getframe(), 0
+            while frame:
+                frame, depth = frame.f_back, depth + 1
+            depths.append(depth)
+
+        view, general_controller = MagicMock(), MagicMock()
+        view.get_user_menu_choice.side_effect = [3] * (sys.getrecursionlimit() + 500) + [8]
+        view.ask_user_if_continue.return_value = True
+        general_controller.show_all_objects.side_effect = record_depth
+        SupportController(CRMTestData.create_collaborator("support", "support"), MagicMock(), view,
+                          general_controller, MagicMock()).start()
+
+        self.assertEqual(len(depths), sys.getrecursionlimit() + 500)
+        self.assertEqual(len(set(depths)), 1)
+
+    def test_return_to_main_menu(self):
+        view = MagicMock()
+        # Contracts submenu, return to the main menu, then exit
+        view.get_collaborator_choice.side_effect = [2, 3, 10]
+        ManagementController(CRMTestData.create_collaborator("manager", "management"), MagicMock(), view,
+                             MagicMock(), MagicMock()).start()
+        self.assertEqual(view.show_menu.call_count, 3)
+        view.ask_user_if_continue.assert_not_called()
+
+
+class FinancialSummaryTest(CRMTestCase):
+    """
+    The summaries follow the contracts saved and deleted through the services
+    and match a rebuild from scratch
+    """
+    def setUp(self):
+        super().setUp()
+        self.sales = CRMTestData.create_collaborator("sales", "sales")
+        self.other_sales = CRMTestData.create_collaborator("other", "sales")
+        self.client_a, self.client_b = [
+            CRMFunctions.create_client(name, f"{name}@client.com", "0600000000", "company", self.sales)
+            for name in ("client_a", "client_b")]
+
+    def summary(self, model, key):
+        return model.objects.filter(pk=key).values(
+            "contract_count", "signed_count", "not_signed_count", "total_value", "total_due").first()
+
+    def assert_consistent(self):
+        # Summaries emptied by deletions are kept until a rebuild drops them
+        stored = [list(model.objects.filter(contract_count__gt=0).order_by("pk").values()) for model in
+                  (ClientFinancialSummary, CommercialFinancialSummary)]
+        call_command("rebuild_financial_summary", stdout=io.StringIO())
+        rebuilt = [list(model.objects.order_by("pk").values()) for model in
+                   (ClientFinancialSummary, CommercialFinancialSummary)]
+        self.assertEqual(stored, rebuilt)
+
+    def test_incremental_updates(self):
+        contract = CRMFunctions.create_contract(self.client_a, self.sales, 1000, 400, "not_signed")
+        CRMFunctions.create_contract(self.client_a, self.sales, 500, 0, "signed")
+        CRMFunctions.create_contract(self.client_b, self.other_sales, 300, 300, "signed")
+        self.assertEqual(self.summary(ClientFinancialSummary, self.client_a.id),
+                         {"contract_count": 2, "signed_count": 1, "not_signed_count": 1,
+                          "total_value": 1500, "total_due": 400})
+
+        CRMFunctions.modify_contract(contract, {"status": "signed", "due": 100,
+                                                "commercial_contact": self.other_sales})
+        self.assertEqual(self.summary(CommercialFinancialSummary, self.other_sales.id),
+                         {"contract_count": 2, "signed_count": 2, "not_signed_count": 0,
+                          "total_value": 1300, "total_due": 400})
+        self.assert_consistent()
+
+        contract.delete()
+        self.client_b.delete()
+        self.assertEqual(self.summary(CommercialFinancialSummary, self.other_sales.id)["contract_count"], 0)
+        self.assert_consistent()
+
+    def test_previous_values_from_the_loaded_instance(self):
+        contract = CRMFunctions.create_contract(self.client_a, self.sales, 1000, 400, "not_signed")
+        contract = Contract.objects.get(id=contract.id)
+        with CaptureQueriesContext(connection) as queries:
+            CRMFunctions.modify_contract(contract, {"due": 100})
+        self.assertFalse([query["sql"] for query in queries.captured_queries
+                          if query["sql"].startswith("SELECT") and "crm_contract" in query["sql"]])
+        self.assertEqual(self.summary(ClientFinancialSummary, self.client_a.id)["total_due"], 100)
+
+        # Without the loaded values, they are read
+        contract._saved_values = None
+        contract.due = 50
+        contract.save()
+        self.assertEqual(self.summary(ClientFinancialSummary, self.client_a.id)["total_due"], 50)
+        self.assert_consistent()
+
+    def test_bulk_changes_pause_the_current_thread_only(self):
+        other_thread = []
+        with bulk_changes():
+            CRMFunctions.create_contract(self.client_a, self.sales, 1000, 400, "signed")
+            self.assertIsNone(self.summary(ClientFinancialSummary, self.client_a.id))
+            thread = threading.Thread(target=lambda: other_thread.append(summaries_paused()))
+            thread.start()
+            thread.join()
+        self.assertEqual(other_thread, [False])
+        self.assertFalse(summaries_paused())
+        self.assertEqual(self.summary(ClientFinancialSummary, self.client_a.id)["total_due"], 400)
+
+    def test_check_and_rebuild(self):
+        CRMFunctions.create_contract(self.client_a, self.sales, 1000, 400, "signed")
+        Contract.objects.bulk_create([Contract(client_infos=self.client_b, commercial_contact=self.sales,
+                                               value=200, due=0, status="signed")])
+        with self.assertRaises(CommandError):
+            call_command("rebuild_financial_summary", check=True, stdout=io.StringIO(), stderr=io.StringIO())
+
+        call_command("rebuild_financial_summary", stdout=io.StringIO())
+        call_command("rebuild_financial_summary", check=True, stdout=io.StringIO())
+        with self.assertNumQueries(1):
+            summaries = list(CRMFunctions.get_commercial_summaries())
+        self.assertEqual([(summary.commercial_contact.username, summary.total_value) for summary in summaries],
+                         [("sales", 1200)])
+
+
+class SummaryMigrationTest(TransactionTestCase):
+    """
+    The migration creating the summaries fills them from the contracts already there
+    """
+    def test_migration_fills_existing_contracts(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate([("crm", "0010_crm_hot_filter_indexes")])
+        self.addCleanup(lambda: MigrationExecutor(connection).migrate(
+            MigrationExecutor(connection).loader.graph.leaf_nodes()))
+        apps = executor.loader.project_state([("crm", "0010_crm_hot_filter_indexes")]).apps
+        sales = apps.get_model("crm", "Collaborator").objects.create(username="sales", email="sales@example.net",
+                                                                     employee_number="emp-sales")
+        client = apps.get_model("crm", "Client").objects.create(name="client", email="client@client.com",
+                                                                phone="0600000000", company_name="company",
+                                                                commercial_contact=sales)
+        Contract = apps.get_model("crm", "Contract")
+        for value, due, status in ((1000, 200, "signed"), (500, 500, "not_signed")):
+            Contract.objects.create(client_infos=client, commercial_contact=sales, value=value, due=due,
+                                    status=status)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate([("crm", "0011_financial_summaries")])
+        apps = executor.loader.project_state([("crm", "0011_financial_summaries")]).apps
+        figures = ("contract_count", "signed_count", "not_signed_count", "total_value", "total_due")
+        self.assertEqual(apps.get_model("crm", "ClientFinancialSummary").objects.values_list(*figures).get(
+            client_id=client.id), (2, 1, 1, 1500, 700))
+        self.assertEqual(apps.get_model("crm", "CommercialFinancialSummary").objects.values_list(*figures).get(
+            commercial_contact_id=sales.id), (2, 1, 1, 1500, 700))
+
+
+class DashboardTest(CRMTestCase):
+    """
+    The dashboard is a fixed number of aggregate queries, then served from the cache
+    """
+    def setUp(self):
+        super().setUp()
+        self.sales = CRMTestData.create_collaborator("sales", "sales")
+        self.support = CRMTestData.create_collaborator("support", "support")
+        CRMTestData.create_rows(4, self.sales, self.support)
+        Contract.objects.create(client_infos=Client.objects.first(), commercial_contact=self.sales,
+                                value=500, due=500, status="not_signed")
+
+    def test_figures_and_queries(self):
+        with self.assertNumQueries(6):
+            dashboard = get_management_dashboard(days=15, months=3, today=date(2024, 5, 1))
+        with self.assertNumQueries(0):
+            get_management_dashboard(days=15, months=3, today=date(2024, 5, 1))
+
+        self.assertEqual([(row["contract_count"], row["revenue"]) for row in dashboard["signed_revenue"]],
+                         [(4, 4000)])
+        self.assertEqual(dashboard["outstanding"], {"due": 700, "value": 4500, "clients_with_due": 3})
+        self.assertEqual(dashboard["events"], {"total": 4, "unassigned": 2, "upcoming": 4, "upcoming_unassigned": 2})
+        self.assertEqual([(row["username"], row["event_count"], row["upcoming_count"])
+                          for row in dashboard["support_load"]], [("support", 2, 2)])
+        self.assertEqual(len(dashboard["upcoming_events"]), 4)
+
+        later = get_management_dashboard(days=15, months=3, today=date(2024, 6, 1))
+        self.assertEqual(later["events"]["upcoming"], 0)
+
+    def test_cli_json(self):
+        manager = CRMTestData.create_collaborator("manager", "management")
+        manager.user_permissions.add(Permission.objects.get_or_create(
+            codename="view_event", content_type=ContentType.objects.get_for_model(Evenement))[0])
+        manager.set_password("Mdp12345")
+        manager.save()
+        self.addCleanup(CRMFunctions.invalidate_permissions, manager.id)
+
+        result = CliRunner().invoke(crm_cli, ["dashboard", "--format", "json"],
+                                    env={"CRM_TOKEN": "", "CRM_USERNAME": "manager", "CRM_PASSWORD": "Mdp12345"})
+        self.assertEqual(result.exit_code, 0, result.output)
+        dashboard = json.loads(result.output)
+        self.assertEqual(dashboard["top_debtors"][0]["total_due"], 500)
+        self.assertEqual(dashboard["events"]["unassigned"], 2)
+
+
+class SearchTest(CRMTestCase):
+    """
+    The full-text index follows the saved rows and ranks the results
+    """
+    def setUp(self):
+        super().setUp()
+        self.sales = CRMTestData.create_collaborator("sales", "sales")
+        self.support = CRMTestData.create_collaborator("support", "support")
+        CRMTestData.create_rows(3, self.sales, self.support)
+        self.acme = CRMFunctions.create_client("Acme Corp", "contact@acme.com", "0600000000", "Acme", self.sales)
+        event = Evenement.objects.get(name="event 1")
+        event.location, event.notes = "Lyon Acme warehouse", "Acme yearly party, bring the Acme banners"
+        event.save()
+
+    def test_search_updates_and_ranks(self):
+        results = CRMFunctions.search("acme")
+        self.assertEqual(results["clients"], [self.acme])
+        self.assertEqual([event.name for event in results["events"]], ["event 1"])
+
+        # Prefixes of every word must match
+        self.assertEqual(CRMFunctions.search("acm ware")["events"][0].name, "event 1")
+        self.assertEqual(CRMFunctions.search("acme paris")["events"], [])
+
+        # More occurrences rank first
+        Evenement.objects.filter(name="event 2").update(notes="Acme")
+        self.assertEqual([event.name for event in CRMFunctions.search("acme")["events"]], ["event 1", "event 2"])
+
+        self.acme.name = "Globex"
+        self.acme.company_name = "Globex"
+        self.acme.email = "contact@globex.com"
+        self.acme.save()
+        self.assertEqual(CRMFunctions.search("acme")["clients"], [])
+        self.acme.delete()
+        self.assertEqual(CRMFunctions.search("globex")["clients"], [])
+
+    def test_contracts_of_matching_clients(self):
+        contract = CRMFunctions.create_contract(self.acme, self.sales, 1000, 0, "signed")
+        self.assertEqual(CRMFunctions.search("acme")["contracts"], [contract])
+        self.assertEqual(CRMFunctions.search('"*+-')["clients"], [])
+
+    def test_menu_hides_results_without_permission(self):
+        view, services = MagicMock(), MagicMock()
+        view.get_search_text.return_value = "acme"
+        services.search.return_value = {"clients": [self.acme], "contracts": [], "events": []}
+        services.has_permission.side_effect = lambda collaborator, permission: permission != "crm.view_client"
+        GeneralController(self.support, services, view).search()
+        view.display_search_results.assert_not_called()
+        view.display_info_message.assert_called_once()
+
+
+class PrefixIndexTest(CRMTestCase):
+    """
+    The autocompletion indexes are loaded once and then follow the saved rows without querying
+    """
+    def setUp(self):
+        super().setUp()
+        self.sales = CRMTestData.create_collaborator("sales", "sales")
+        for number, name in enumerate(("Acme", "acme labs", "Globex", "Initech")):
+            Client.objects.create(name=name, email=f"contact{number}@client.com", phone="0600000000",
+                                  company_name=name, commercial_contact=self.sales)
+
+    def test_complete_and_follow_changes(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(client_names.complete("ac"), ["Acme", "acme labs"])
+        with self.assertNumQueries(0):
+            self.assertEqual(client_names.find("GLOBEX"), "Globex")
+            self.assertIsNone(client_names.find("Glob"))
+            self.assertEqual(client_names.complete("z"), [])
+
+        client = Client.objects.get(name="Globex")
+        client.name = "Acme Globex"
+        client.save()
+        Client.objects.get(name="Initech").delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(client_names.complete("acme"), ["Acme", "Acme Globex", "acme labs"])
+            self.assertEqual(client_names.complete("g"), [])
+            self.assertEqual(client_names.complete("i"), [])
+
+        CRMTestData.create_collaborator("support_emma", "support")
+        self.assertEqual(collaborator_usernames.complete("su"), ["support_emma"])
+
+    def test_prompt_suggests_instead_of_failing(self):
+        view = GeneralView()
+        with patch.object(GeneralView, "prompt_with_completion", side_effect=["acme l", "acm", "acme"]), \
+                patch.object(GeneralView, "get_user_confirmation", return_value=False), \
+                patch.object(GeneralView, "display_info_message") as info:
+            self.assertEqual(view.get_indexed_name("Client Name", client_names), "Acme")
+        # The single completion was declined, the ambiguous prefix listed its completions
+        info.assert_called_once_with("Matching names: Acme, acme labs")
+
+        index = PrefixIndex(lambda: [(1, "b"), (2, "a"), (3, "a")])
+        self.assertEqual(index.complete(""), ["a", "b"])
+
+    def test_other_sessions_and_cancel(self):
+        view = GeneralView()
+        self.assertEqual(client_names.complete("u"), [])
+        # Created by another session, no signal reached this index
+        Client.objects.bulk_create([Client(name="Umbrella", email="contact@umbrella.com", phone="0600000000",
+                                           company_name="Umbrella", commercial_contact=self.sales)])
+        with patch.object(GeneralView, "prompt_with_completion", side_effect=["umbrella", ""]):
+            self.assertEqual(view.get_indexed_name("Client Name", client_names), "Umbrella")
+            self.assertIsNone(view.get_indexed_name("Client Name", client_names))
+        self.assertEqual(client_names.complete("u"), ["Umbrella"])
+
+    def test_support_contacts_only(self):
+        CRMTestData.create_collaborator("support_emma", "support")
+        self.assertEqual(support_usernames.complete("s"), ["support_emma"])
+        CRMTestData.create_collaborator("sales_sam", "sales")
+        support = CRMTestData.create_collaborator("support_tom", "support")
+        self.assertEqual(support_usernames.complete("s"), ["support_emma", "support_tom"])
+        self.assertIsNone(support_usernames.lookup("sales"))
+
+        support.role = get_role("sales")
+        support.save()
+        self.assertEqual(support_usernames.complete("s"), ["support_emma"])
+
+
+class CalendarTest(CRMTestCase):
+    """
+    Window queries and booking conflicts of the support contacts
+    """
+    def setUp(self):
+        super().setUp()
+        self.sales = CRMTestData.create_collaborator("sales", "sales")
+        self.support = CRMTestData.create_collaborator("support", "support")
+        CRMTestData.create_rows(2, self.sales, self.support)
+        # event 1 is booked from 2024-05-10 to 2024-05-11, event 0 is unassigned
+        self.free_event = Evenement.objects.get(name="event 0")
+
+    def test_window(self):
+        calendar = CRMFunctions.get_calendar(self.support.id, date(2024, 5, 6))
+        self.assertEqual([event.name for event in calendar], ["event 1"])
+        self.assertFalse(CRMFunctions.get_calendar(self.support.id, date(2024, 5, 12)).exists())
+        self.assertTrue(CRMFunctions.get_calendar(self.support.id, date(2024, 5, 4), days=7).exists())
+        self.assertFalse(CRMFunctions.get_calendar(self.support.id, date(2024, 5, 3), days=7).exists())
+
+    def test_overlaps(self):
+        day = lambda number: date(2024, 5, number)
+        self.assertEqual(find_overlaps([(day(1), day(3), 1), (day(3), day(4), 2), (day(5), day(6), 3),
+                                        (day(2), day(10), 4)]),
+                         [(1, 4), (1, 2), (4, 2), (4, 3)])
+        self.assertEqual(find_overlaps([(day(1), day(2), 1), (day(3), day(4), 2)]), [])
+
+    def test_double_booking_refused(self):
+        with self.assertRaises(ValidationError):
+            CRMFunctions.add_support_contact_to_event(self.free_event, self.support)
+        self.free_event.refresh_from_db()
+        self.assertIsNone(self.free_event.support_contact)
+
+        with self.assertRaises(ValidationError):
+            CRMFunctions.create_event(self.free_event.contract, "client 0", "overlapping", "John Doe", "support",
+                                      datetime(2024, 5, 11, 9), datetime(2024, 5, 12, 18), "Paris", 10, "")
+
+        self.free_event.day_start, self.free_event.date_end = date(2024, 5, 12), date(2024, 5, 13)
+        CRMFunctions.add_support_contact_to_event(self.free_event, self.support)
+        # Reassigning an event to its own contact does not conflict with itself
+        CRMFunctions.add_support_contact_to_event(self.free_event, self.support)
+
+        Evenement.objects.filter(name="event 1").update(date_end=date(2024, 5, 12))
+        events = list(CRMFunctions.get_calendar(self.support.id, date(2024, 5, 6)))
+        self.assertEqual(CRMFunctions.find_double_bookings(events), [(events[0].id, events[1].id)])
+
+    def test_check_and_booking_in_one_transaction(self):
+        depth = len(connection.atomic_blocks)
+        check = CRMFunctions.check_support_availability
+        checked_in = []
+
+        def record_block(*args):
+            checked_in.append(len(connection.atomic_blocks))
+            check(*args)
+
+        self.free_event.day_start, self.free_event.date_end = date(2024, 5, 12), date(2024, 5, 13)
+        with patch.object(CRMFunctions, "check_support_availability", side_effect=record_block):
+            CRMFunctions.add_support_contact_to_event(self.free_event, self.support)
+            CRMFunctions.create_event(self.free_event.contract, "client 0", "later", "John Doe", "support",
+                                      datetime(2024, 6, 1, 9), datetime(2024, 6, 1, 18), "Paris", 10, "")
+        # The support contact stays locked until the booking is saved
+        self.assertEqual(checked_in, [depth + 1, depth + 1])
+
+
+class AutoAssignTest(CRMTestCase):
+    """
+    The scheduler balances the attendees, never double books and applies the plan at once
+    """
+    def setUp(self):
+        super().setUp()
+        self.sales = CRMTestData.create_collaborator("sales", "sales")
+        self.first = CRMTestData.create_collaborator("first", "support")
+        self.second = CRMTestData.create_collaborator("second", "support")
+        client = Client.objects.create(name="client", email="client@client.com", phone="0600000000",
+                                       company_name="company", commercial_contact=self.sales)
+        self.events = {}
+        for name, start, end, attendees, support in [
+                ("booked", 10, 12, 300, self.first), ("big", 10, 10, 200, None), ("small", 11, 11, 50, None),
+                ("overlapping", 11, 12, 80, None), ("later", 20, 20, 500, None), ("huge", 21, 21, 5000, None)]:
+            self.events[name] = Evenement.objects.create(
+                name=name, client=client, client_name=client.name, client_contact="John Doe",
+                day_start=date(2030, 5, start), date_end=date(2030, 5, end), support_contact=support,
+                location="Paris", attendees=attendees, notes="")
+
+    def test_plan_and_apply(self):
+        plan = CRMFunctions.plan_support_assignments(max_attendees=1000, since=date(2030, 5, 1))
+        planned = {event.name: contact.username for event, contact in plan.assignments}
+        # The larger of the events starting the same day is placed first
+        self.assertEqual(planned, {"big": "second", "overlapping": "second", "later": "second"})
+        self.assertEqual({event.name: reason for event, reason in plan.unassigned},
+                         {"small": "every support contact is booked on these days",
+                          "huge": "more than 1000 attendees"})
+        self.assertEqual(plan.loads, {self.first.id: 300, self.second.id: 780})
+
+        # Assigned by hand in the meantime, the plan leaves it alone
+        Evenement.objects.filter(id=self.events["later"].id).update(support_contact=self.first)
+        # One update for the single support contact, inside a savepoint in the test transaction
+        with self.assertNumQueries(3):
+            self.assertEqual(CRMFunctions.apply_support_assignments(plan), 2)
+        self.assertEqual(Evenement.objects.get(name="later").support_contact, self.first)
+        self.assertEqual(Evenement.objects.get(name="big").support_contact, self.second)
+
+    def test_bookings_merge(self):
+        bookings = Bookings()
+        for start, end in [(10, 12), (11, 15), (20, 21), (1, 2)]:
+            bookings.book(date(2030, 5, start), date(2030, 5, end))
+        self.assertEqual([(start.day, end.day) for start, end in bookings.intervals], [(1, 2), (10, 15), (20, 21)])
+        self.assertTrue(bookings.is_free(date(2030, 5, 16), date(2030, 5, 19)))
+        self.assertFalse(bookings.is_free(date(2030, 5, 3), date(2030, 5, 10)))
+
+
+class CollaboratorDeletionTest(CRMTestCase):
+    """
+    Deleting a collaborator can move everything they are the contact of in one transaction
+    """
+    def setUp(self):
+        super().setUp()
+        self.sales = CRMTestData.create_collaborator("sales", "sales")
+        self.other_sales = CRMTestData.create_collaborator("other_sales", "sales")
+        self.support = CRMTestData.create_collaborator("support", "support")
+        self.other_support = CRMTestData.create_collaborator("other_support", "support")
+        CRMTestData.create_rows(6, self.sales, self.support)
+        CRMTestData.create_rows(2, self.other_sales, self.other_support)
+
+    def test_reassign_sales(self):
+        moved = CRMFunctions.delete_collaborator(self.sales, reassign_to=self.other_sales)
+        self.assertEqual(moved, {"clients": 6, "contracts": 6, "events": 0, "double_booked": 0})
+        self.assertEqual(Client.objects.filter(commercial_contact=self.other_sales).count(), 8)
+        self.assertFalse(Contract.objects.filter(commercial_contact__isnull=True).exists())
+        self.assertEqual(self.other_sales.financial_summary.contract_count, 8)
+        call_command("rebuild_financial_summary", check=True, stdout=io.StringIO())
+
+    def test_reassign_support_reports_double_bookings(self):
+        moved = CRMFunctions.delete_collaborator(self.support, reassign_to=self.other_support)
+        self.assertEqual(moved["events"], 3)
+        # Every row is on the same days, the three moved events and the one of other_support overlap
+        self.assertEqual(moved["double_booked"], 4)
+        self.assertEqual(Evenement.objects.filter(support_contact=self.other_support).count(), 4)
+
+    def test_existing_double_bookings_are_not_reported(self):
+        # other_support already has two overlapping events, on other days than the moved ones
+        event = Evenement.objects.get(support_contact=self.other_support)
+        Evenement.objects.filter(id=event.id).update(day_start=date(2024, 6, 1), date_end=date(2024, 6, 2))
+        Evenement.objects.create(contract=event.contract, name="other event", client=event.client,
+                                 client_name=event.client_name, client_contact="John Doe",
+                                 day_start=date(2024, 6, 2), date_end=date(2024, 6, 3),
+                                 support_contact=self.other_support, location="Paris", attendees=50, notes="")
+        moved = CRMFunctions.delete_collaborator(self.support, reassign_to=self.other_support)
+        self.assertEqual((moved["events"], moved["double_booked"]), (3, 0))
+
+    def test_without_reassignment_and_role_mismatch(self):
+        with self.assertRaises(ValidationError):
+            CRMFunctions.delete_collaborator(self.sales, reassign_to=self.support)
+        self.assertTrue(Collaborator.objects.filter(id=self.sales.id).exists())
+
+        self.assertEqual(CRMFunctions.delete_collaborator(self.sales)["clients"], 0)
+        self.assertEqual(Client.objects.filter(commercial_contact__isnull=True).count(), 6)
+        call_command("rebuild_financial_summary", check=True, stdout=io.StringIO())
+
+
+class ConcurrencyTest(CRMTestCase):
+    """
+    A save from an instance loaded before someone else's save is refused instead of overwriting it
+    """
+    def setUp(self):
+        super().setUp()
+        self.sales = CRMTestData.create_collaborator("sales", "sales")
+        self.support = CRMTestData.create_collaborator("support", "support")
+        CRMTestData.create_rows(2, self.sales, self.support)
+
+    def test_stale_client_is_refused(self):
+        client = Client.objects.order_by("id").first()
+        first, second = Client.objects.get(id=client.id), Client.objects.get(id=client.id)
+        CRMFunctions.modify_client(first, {"phone": "0611111111", "company_name": "First Company"})
+        self.assertEqual(first.version, 1)
+
+        # The refused save marks the enclosing transaction for rollback, as any failed query would
+        with self.assertRaises(ConcurrentModificationError) as raised, transaction.atomic():
+            CRMFunctions.modify_client(second, {"company_name": "Second Company"})
+        self.assertEqual(raised.exception.changed_fields, ["phone", "company_name"])
+        self.assertIn("modified by someone else", raised.exception.message)
+        client.refresh_from_db()
+        self.assertEqual((client.phone, client.company_name, client.version), ("0611111111", "First Company", 1))
+
+        # Once reloaded the second editor can save
+        second.refresh_from_db()
+        CRMFunctions.modify_client(second, {"company_name": "Second Company"})
+        self.assertEqual(Client.objects.get(id=client.id).version, 2)
+
+    def test_login_does_not_conflict_with_edits(self):
+        edited = Collaborator.objects.get(id=self.support.id)
+        update_last_login(None, Collaborator.objects.get(id=self.support.id))
+        self.assertEqual(Collaborator.objects.get(id=self.support.id).version, 0)
+
+        CRMFunctions.modify_collaborator(edited, {"first_name": "Emma"})
+        saved = Collaborator.objects.get(id=self.support.id)
+        self.assertEqual((saved.first_name, saved.version), ("Emma", 1))
+        self.assertIsNotNone(saved.last_login)
+
+        # A real conflict does not report the last login as a changed field
+        stale = Collaborator.objects.get(id=self.support.id)
+        update_last_login(None, Collaborator.objects.get(id=self.support.id))
+        CRMFunctions.modify_collaborator(Collaborator.objects.get(id=self.support.id), {"last_name": "Stone"})
+        with self.assertRaises(ConcurrentModificationError) as raised, transaction.atomic():
+            CRMFunctions.modify_collaborator(stale, {"first_name": "Jane"})
+        self.assertEqual(raised.exception.changed_fields, ["last_name"])
+
+    def test_bulk_updates_bump_the_version(self):
+        event = Evenement.objects.filter(support_contact=self.support).first()
+        other_support = CRMTestData.create_collaborator("other_support", "support")
+        CRMFunctions.delete_collaborator(self.support, reassign_to=other_support)
+        event.notes = "Stale notes"
+        with self.assertRaises(ConcurrentModificationError) as raised, transaction.atomic():
+            event.save()
+        self.assertEqual(raised.exception.changed_fields, ["support_contact"])
+        self.assertEqual(Evenement.objects.get(id=event.id).support_contact_id, other_support.id)
+
+    def test_single_conditional_update(self):
+        contract = Contract.objects.order_by("id").first()
+        with CaptureQueriesContext(connection) as queries:
+            contract.save()
+        updates = [query["sql"] for query in queries.captured_queries if query["sql"].startswith('UPDATE "crm_contract"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"version" = 0', updates[0])
+        self.assertEqual(contract.version, 1)
+
+
+class ChangedFieldsTest(CRMTestCase):
+    """
+    Modifications write only the columns they change, and nothing when they change none
+    """
+    def setUp(self):
+        super().setUp()
+        self.sales = CRMTestData.create_collaborator("sales", "sales")
+        self.support = CRMTestData.create_collaborator("support", "support")
+        CRMTestData.create_rows(2, self.sales, self.support)
+
+    def test_no_op_modification_writes_nothing(self):
+        client = Client.objects.order_by("id").first()
+        with CaptureQueriesContext(connection) as queries:
+            CRMFunctions.modify_client(client, {"phone": client.phone, "company_name": client.company_name})
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(Client.objects.get(id=client.id).last_update, client.last_update)
+        self.assertEqual(client.version, 0)
+
+    def test_only_changed_columns_are_written(self):
+        event = Evenement.objects.filter(support_contact=self.support).first()
+        with CaptureQueriesContext(connection) as queries:
+            GeneralView.modify_event(event, {"notes": "New notes", "location": event.location})
+        updates = [query["sql"] for query in queries.captured_queries if query["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertRegex(updates[0], r'^UPDATE "crm_evenement" SET "notes" = .*, "version" = .* WHERE')
+        self.assertNotIn('"location"', updates[0])
+        self.assertEqual(event.get_changed_fields(), [])
+
+        # The other columns stay as another editor saved them
+        Evenement.objects.filter(id=event.id).update(location="Lyon")
+        event.refresh_from_db()
+        self.assertEqual((event.location, event.notes), ("Lyon", "New notes"))
+
+    def test_client_timestamp_follows_real_changes(self):
+        client = Client.objects.order_by("id").first()
+        last_update = client.last_update
+        with CaptureQueriesContext(connection) as queries:
+            CRMFunctions.modify_client(client, {"phone": "0611111111"})
+        self.assertIn('"last_update"', queries.captured_queries[-1]["sql"])
+        saved = Client.objects.get(id=client.id)
+        self.assertEqual(saved.phone, "0611111111")
+        self.assertGreater(saved.last_update, last_update)
+
+
+class UniqueEmailTest(CRMTestCase):
+    """
+    The unique constraints refuse the emails already in use, without a query checking them first
+    """
+    def setUp(self):
+        super().setUp()
+        self.sales = CRMTestData.create_collaborator("sales", "sales")
+        self.client_a = CRMFunctions.create_client("client a", "a@client.com", "0600000000", "company", self.sales)
+
+    def test_create_client_single_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            CRMFunctions.create_client("client b", "b@client.com", "0600000000", "company", self.sales)
+        self.assertEqual([query["sql"].split()[0] for query in queries.captured_queries], ["INSERT"])
+
+        with self.assertRaisesMessage(ValidationError, "The a@client.com is already in use."), transaction.atomic():
+            CRMFunctions.create_client("client c", "a@client.com", "0600000000", "company", self.sales)
+
+    def test_register_and_modify_collaborator(self):
+        with self.assertRaisesMessage(ValidationError, "The email: sales@example.net is already in use."), \
+                transaction.atomic():
+            CRMFunctions.register_collaborator("Emma", "Stone", "emma", "Password1", "sales@example.net",
+                                               "sales", "emp-emma")
+        self.assertFalse(Collaborator.objects.filter(username="emma").exists())
+
+        support = CRMTestData.create_collaborator("support", "support")
+        with self.assertRaisesMessage(ValidationError, "The employee number: emp-sales is already in use by "
+                                                       "another collaborator."), transaction.atomic():
+            CRMFunctions.modify_collaborator(support, {"employee_number": "emp-sales"})
+
+    def test_modify_client_email(self):
+        client_b = CRMFunctions.create_client("client b", "b@client.com", "0600000000", "company", self.sales)
+        with self.assertRaisesMessage(ValidationError, "The a@client.com is already in use."), transaction.atomic():
+            CRMFunctions.modify_client(client_b, {"email": "a@client.com"})
+        self.assertEqual(Client.objects.get(id=client_b.id).email, "b@client.com")
+
+    def test_duplicated_field(self):
+        self.assertEqual(CRMFunctions.duplicated_field(
+            IntegrityError("UNIQUE constraint failed: crm_collaborator.username"), ["username", "email"]), "username")
+        self.assertEqual(CRMFunctions.duplicated_field(
+            IntegrityError("(1062, \"Duplicate entry 'a@b.c' for key 'crm_client.crm_client_email_4f5c3d0e_uniq'\")"),
+            ["email"]), "email")
+        self.assertIsNone(CRMFunctions.duplicated_field(IntegrityError("FOREIGN KEY constraint failed"), ["email"]))
+
+    def test_collaborators_without_email(self):
+        first = Collaborator.objects.create_user("first", password="Password1", employee_number="emp-first")
+        second = Collaborator.objects.create_user("second", email="", password="Password1",
+                                                  employee_number="emp-second")
+        self.assertEqual(Collaborator.objects.filter(id__in=[first.id, second.id], email__isnull=True).count(), 2)
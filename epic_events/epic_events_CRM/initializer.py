@@ -6,17 +6,22 @@ django.setup()
 
 from django.contrib.auth.models import Group, Permission
 from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
 from crm.models import Collaborator, Client, Role, Contract, Evenement
 from datetime import date
 
 # Réinitialiser la base de données avant de relancer la création des groupes et utilisateurs
-django.db.connections['default'].cursor().execute('SET FOREIGN_KEY_CHECKS=0')
+# SET FOREIGN_KEY_CHECKS only exists on MySQL
+mysql = django.db.connections['default'].vendor == 'mysql'
+if mysql:
+    django.db.connections['default'].cursor().execute('SET FOREIGN_KEY_CHECKS=0')
 Collaborator.objects.all().delete()
 Client.objects.all().delete()
 Group.objects.all().delete()
 Contract.objects.all().delete()
 Evenement.objects.all().delete()
-django.db.connections['default'].cursor().execute('SET FOREIGN_KEY_CHECKS=1')
+if mysql:
+    django.db.connections['default'].cursor().execute('SET FOREIGN_KEY_CHECKS=1')
 
 group_names = ['management_team', 'sales_team', 'support_team']
 groups = {}
@@ -38,7 +43,10 @@ permissions = {
 for group_name, perm_codenames in permissions.items():
     group = groups[group_name]
     for codename in perm_codenames:
-        perm, created = Permission.objects.get_or_create(codename=codename)
+        # add_event and view_event are not generated from a model, they are created on the event model
+        perm, created = Permission.objects.get_or_create(
+            codename=codename, content_type__app_label='crm',
+            defaults={'name': codename, 'content_type': ContentType.objects.get_for_model(Evenement)})
         group.permissions.add(perm)
     print(f"Permissions successfully assigned to the group '{group_name}'.")
 
@@ -1,3 +1,6 @@
+import argparse
+import contextlib
+import io
 import os
 import django
 from dotenv import load_dotenv
@@ -10,20 +13,58 @@ def setup_django():
 
 setup_django()
 
-import sentry_sdk
 from controllers.crm_controllers import CRMController
 
-sentry_dsn = os.getenv('SENTRY_DSN')
 
-sentry_sdk.init(
-    dsn=sentry_dsn,
-    traces_sample_rate=1.0,
-    profiles_sample_rate=1.0,
-)
+def prepare_in_memory_database():
+    """
+    Create the tables and the initial data when running on an in-memory
+    SQLite database, which starts empty at each launch
+    """
+    from django.db import connection
+    if connection.vendor != "sqlite" or not connection.is_in_memory_db():
+        return
+
+    from django.core.management import call_command
+    call_command("migrate", verbosity=0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import initializer  # noqa: F401, the module creates the data when imported
 
 def main():
+    parser = argparse.ArgumentParser(description="Epic Events CRM")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print the SQL, service, controller and rendering times of each menu action")
+    parser.add_argument("--profile-output", help="File the profile summaries are appended to, stderr by default")
+    args = parser.parse_args()
+
+    prepare_in_memory_database()
+    # The login prompt does not wait for Sentry, the reports sent before it is ready wait for it
+    from services.reporting import init_sentry_in_background
+    init_sentry_in_background()
+    if args.profile:
+        run_profiled(args.profile_output)
+        return
     main_controller = CRMController()
     main_controller.start()
 
+def run_profiled(output_path=None):
+    """
+    Run the CLI with the profiler installed and write a summary after each menu action
+    """
+    from django.db import connection
+    from services.profiling import install_profiler
+
+    output = open(output_path, "a", encoding="utf-8") if output_path else None
+    try:
+        profiler = install_profiler(output)
+        with connection.execute_wrapper(profiler.record_query):
+            try:
+                CRMController().start()
+            finally:
+                profiler.end_action()
+    finally:
+        if output:
+            output.close()
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,70 @@
+import heapq
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+from django.db.models import QuerySet
+from crm.models import Evenement
+
+
+# (start, end, key) with both days included, as the event day_start and date_end
+Interval = Tuple[date, date, int]
+
+
+def as_day(value: date) -> date:
+    # The views build the event days as datetimes, the model stores dates
+    return value.date() if isinstance(value, datetime) else value
+
+
+def events_between(start: date, end: date, support_contact_id: Optional[int] = None) -> QuerySet[Evenement]:
+    """
+    Events overlapping the days from start to end included, optionally only those of a support contact.
+    day_start is bounded by the window end, so the query is a range scan of the day indexes
+    """
+    events = Evenement.objects.filter(day_start__lte=end, date_end__gte=start)
+    if support_contact_id is not None:
+        events = events.filter(support_contact_id=support_contact_id)
+    return events.select_related("support_contact").order_by("day_start", "date_end", "id")
+
+
+def find_overlaps(intervals: Iterable[Interval]) -> List[Tuple[int, int]]:
+    """
+    Pairs of keys of the intervals sharing at least one day, found with a sweep over
+    the intervals sorted by start keeping the ones still running in a heap by end
+    """
+    overlaps = []
+    running: List[Interval] = []
+    for start, end, key in sorted(intervals):
+        # The intervals ended before this one starts no longer overlap anything
+        while running and running[0][0] < start:
+            heapq.heappop(running)
+        overlaps.extend((other_key, key) for other_end, other_start, other_key in running)
+        heapq.heappush(running, (end, start, key))
+    return overlaps
+
+
+def conflicting_events(support_contact_id: int, day_start: date, date_end: date,
+                       exclude_event_id: Optional[int] = None) -> List[Evenement]:
+    """
+    Events of the support contact that an event on these days would overlap
+    """
+    return list(events_between(as_day(day_start), as_day(date_end), support_contact_id)
+                .exclude(id=exclude_event_id))
+
+
+def double_bookings(events: Iterable[Evenement]) -> List[Tuple[int, int]]:
+    """
+    Pairs of ids of the events overlapping another event of the same support contact
+    """
+    by_contact = {}
+    for event in events:
+        if event.support_contact_id is not None:
+            by_contact.setdefault(event.support_contact_id, []).append(
+                (as_day(event.day_start), as_day(event.date_end), event.id))
+    return [pair for intervals in by_contact.values() for pair in find_overlaps(intervals)]
+
+
+def week_of(day: date) -> Tuple[date, date]:
+    """
+    Monday and Sunday of the week of the day
+    """
+    monday = day - timedelta(days=day.weekday())
+    return monday, monday + timedelta(days=6)
@@ -2,16 +2,66 @@ from crm.models import Collaborator
 from crm.models import Evenement
 from crm.models import Contract
 from crm.models import Client
-from crm.models import Role
+from crm.models import ConcurrentModificationError
+from crm.models import ClientFinancialSummary, CommercialFinancialSummary
+from django.core import signing
 from django.core.exceptions import ValidationError
 from django.contrib.auth import authenticate
-from django.db import DatabaseError
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.db import DatabaseError, IntegrityError, transaction
 from django.db.models import Model
-from typing import List, Optional, Any
-from django.contrib.auth.models import Group
+from typing import Dict, FrozenSet, List, Optional, Any, Union
+from django.contrib.auth.models import Permission
 from django.db.models import QuerySet
-from datetime import datetime
-from sentry_sdk import capture_message, capture_exception
+from django.db.models import F, Q
+from contextlib import nullcontext
+import os
+import re
+from datetime import date, datetime, timedelta
+from services.reporting import capture_message, capture_exception
+from services.reference_cache import get_group, get_role, get_support_roster
+from services.calendar import conflicting_events, double_bookings, events_between, find_overlaps, week_of
+from services.dashboard import get_management_dashboard
+from services.financial_summary import move_commercial_summary
+from services.scheduler import AssignmentPlan, plan_assignments
+from services.search import search
+
+
+PAGE_SIZE = 20
+
+# Access tokens of the command line, valid CRM_TOKEN_MAX_AGE seconds (30 days by default)
+TOKEN_SALT = "crm.cli.token"
+TOKEN_MAX_AGE = int(os.getenv("CRM_TOKEN_MAX_AGE", str(30 * 24 * 3600)))
+
+# Permissions of the collaborators logged in this process, by collaborator id
+_permission_snapshots: Dict[int, FrozenSet[str]] = {}
+
+# Conditions applied to the contracts of a collaborator for each filter type
+CONTRACT_FILTERS = {
+    None: Q(),
+    "signed": Q(status="signed"),
+    "not_signed": Q(status="not_signed"),
+    "no_fully_paid": Q(due__gt=0),
+}
+
+
+class Page:
+    """
+    One page of objects fetched by keyset pagination on the id,
+    with the information needed to move to the neighbouring pages
+    """
+    def __init__(self, objects: List[Any], has_previous: bool, has_next: bool):
+        self.objects = objects
+        self.has_previous = has_previous
+        self.has_next = has_next
+
+    @property
+    def first_id(self) -> Optional[int]:
+        return self.objects[0].id if self.objects else None
+
+    @property
+    def last_id(self) -> Optional[int]:
+        return self.objects[-1].id if self.objects else None
 
 
 class CRMFunctions:
@@ -30,22 +80,88 @@ class CRMFunctions:
 
 
     @staticmethod
-    def register_collaborator(first_name: str, last_name: str, username: str, password: str, email: str, role_name: str, 
-                            employee_number: str) -> Collaborator:
+    def create_token(collaborator: Collaborator) -> str:
+        """
+        Create a signed access token for the collaborator, which stops
+        being valid when it expires or the password changes
+        """
+        return signing.dumps({"id": collaborator.id, "key": CRMFunctions.password_key(collaborator)}, salt=TOKEN_SALT)
+
+
+    @staticmethod
+    def authenticate_token(token: str) -> Collaborator:
+        """
+        Authenticate the collaborator from an access token
+        """
+        try:
+            data = signing.loads(token, salt=TOKEN_SALT, max_age=TOKEN_MAX_AGE)
+        except signing.SignatureExpired:
+            raise ValidationError("The token has expired")
+        except signing.BadSignature:
+            raise ValidationError("Invalid token")
+
+        collaborator = Collaborator.objects.select_related("role").filter(id=data["id"], is_active=True).first()
+        if collaborator is None or not constant_time_compare(data["key"], CRMFunctions.password_key(collaborator)):
+            raise ValidationError("Invalid token")
+        return collaborator
+
+
+    @staticmethod
+    def password_key(collaborator: Collaborator) -> str:
+        return salted_hmac(TOKEN_SALT, collaborator.password).hexdigest()[:20]
+
+
+    @staticmethod
+    def load_permissions(collaborator: Collaborator) -> FrozenSet[str]:
         """
-        Register the collaborator by checking if the username, email and employee number are already in use
-        and then creating the collaborator if they are not
+        Load in a single query the permissions the collaborator gets directly
+        or through the groups of its role, and keep them for the session
         """
         try:
-            if Collaborator.objects.filter(username=username).exists():
+            permissions = Permission.objects.values_list("content_type__app_label", "codename")
+            if not collaborator.is_active:
+                permissions = permissions.none()
+            elif not collaborator.is_superuser:
+                permissions = permissions.filter(Q(group__user=collaborator) | Q(user=collaborator)).distinct()
+
+            snapshot = frozenset(f"{app_label}.{codename}" for app_label, codename in permissions)
+            _permission_snapshots[collaborator.id] = snapshot
+            return snapshot
+        except DatabaseError as e:
+            capture_exception(e)
+            raise DatabaseError("Problem with database access") from e
+
+
+    @staticmethod
+    def has_permission(collaborator: Collaborator, permission: str) -> bool:
+        """
+        Check the permission against the snapshot of the collaborator,
+        loading the snapshot first if it is missing or was invalidated
+        """
+        snapshot = _permission_snapshots.get(collaborator.id)
+        if snapshot is None:
+            snapshot = CRMFunctions.load_permissions(collaborator)
+        return permission in snapshot
 
-                raise ValidationError(f"The username: {username} is already in use.")
-            if Collaborator.objects.filter(email=email).exists():
-                raise ValidationError(f"The email: {email} is already in use.")
-            if Collaborator.objects.filter(employee_number=employee_number).exists():
-                raise ValidationError(f"The employee number: {employee_number} is already in use.")
 
-            role, created = Role.objects.get_or_create(name=role_name)
+    @staticmethod
+    def invalidate_permissions(collaborator_id: int) -> None:
+        """
+        Drop the permission snapshot of the collaborator so that it is
+        loaded again on the next check
+        """
+        _permission_snapshots.pop(collaborator_id, None)
+
+
+    @staticmethod
+    def register_collaborator(first_name: str, last_name: str, username: str, password: str, email: str, role_name: str, 
+                            employee_number: str) -> Collaborator:
+        """
+        Register the collaborator, the unique constraints on the username, email and employee number
+        refuse the values already in use within the insert itself
+        """
+        try:
+            role = get_role(role_name)
 
             collaborator = Collaborator(first_name=first_name,
                                         last_name=last_name,
@@ -55,10 +171,7 @@ class CRMFunctions:
                                         employee_number=employee_number)
 
             collaborator.set_password(password)
-            collaborator.full_clean()
-            collaborator.save()
-
-            capture_message(f"Collaborator {username} has been registered.")
+            collaborator.full_clean(validate_unique=False)
 
             # Add the collaborator to the corresponding group.
             role_to_group = {
@@ -67,12 +180,25 @@ class CRMFunctions:
                 'support': 'support_team',
             }
             group_name = role_to_group.get(role_name)
-            if group_name:
-                group, group_created = Group.objects.get_or_create(name=group_name)
-                collaborator.groups.add(group)
+            with transaction.atomic():
                 collaborator.save()
+                if group_name:
+                    group = get_group(group_name)
+                    collaborator.groups.add(group)
 
+            capture_message(f"Collaborator {username} has been registered.")
             return collaborator
+        except IntegrityError as e:
+            in_use = {
+                "username": f"The username: {username} is already in use.",
+                "email": f"The email: {email} is already in use.",
+                "employee_number": f"The employee number: {employee_number} is already in use.",
+            }
+            duplicated = CRMFunctions.duplicated_field(e, list(in_use))
+            capture_exception(e)
+            if duplicated is None:
+                raise DatabaseError("Problem with database access") from e
+            raise ValidationError(f"Validation error: {in_use[duplicated]}") from e
         except ValidationError as e:
             capture_exception(e)
             raise ValidationError(f"Validation error: {e}") from e
@@ -84,21 +210,39 @@ class CRMFunctions:
             raise Exception("Unexpected error creating collaborator") from e
 
 
+    @staticmethod
+    def duplicated_field(error: IntegrityError, fields: List[str]) -> Optional[str]:
+        """
+        The field among fields whose unique constraint the insert or update broke, read from the
+        constraint named in the database message, None for any other integrity error
+        """
+        # SQLite: UNIQUE constraint failed: crm_client.email
+        # MySQL: Duplicate entry 'a@b.c' for key 'crm_client.crm_client_email_..._uniq'
+        match = re.search(r"UNIQUE constraint failed: \w+\.(\w+)|for key '([\w.]+)'", str(error))
+        if match is None:
+            return None
+        constraint = (match.group(1) or match.group(2)).split(".")[-1]
+        if constraint in fields:
+            return constraint
+        return next((field for field in fields if field in constraint), None)
+
+
     @staticmethod
     def get_all_objects(object_type: str) -> Optional[List[Any]]:
         """
         Get all the objects of the specified type by checking the object
-        type passed as parameter of this function
+        type passed as parameter of this function, with the relations
+        displayed by the views loaded in the same query
         """
         try:
             if object_type.lower() == "collaborators":
-                return Collaborator.objects.all()
+                return Collaborator.objects.select_related("role")
             elif object_type.lower() == "contracts2" or object_type.lower() == "clients":
-                return Client.objects.all()
+                return Client.objects.select_related("commercial_contact")
             elif object_type.lower() == "contracts":
-                return Contract.objects.all()
+                return Contract.objects.select_related("client_infos", "commercial_contact")
             elif object_type.lower() == "events":
-                return Evenement.objects.all()
+                return Evenement.objects.select_related("contract", "client", "support_contact")
             else:
                 print("Invalid object type specified.")
                 return []
@@ -107,6 +251,48 @@ class CRMFunctions:
             return []
 
 
+    @staticmethod
+    def has_objects(objects: Union[QuerySet, List[Any]]) -> bool:
+        """
+        Check if there is at least one object, without loading
+        the whole queryset when a queryset is passed
+        """
+        if isinstance(objects, QuerySet):
+            return objects.exists()
+        return bool(objects)
+
+
+    @staticmethod
+    def get_page(objects: QuerySet, after_id: Optional[int] = None, before_id: Optional[int] = None,
+                from_id: Optional[int] = None, page_size: int = PAGE_SIZE) -> Page:
+        """
+        Get one page of the queryset ordered by id, starting after after_id,
+        ending before before_id or starting at from_id, and fetching only
+        the rows of this page plus one to know if another page follows
+        """
+        try:
+            if before_id is not None:
+                rows = list(objects.filter(id__lt=before_id).order_by("-id")[:page_size + 1])
+                if len(rows) <= page_size:
+                    # Back on the first page, fill it from the start
+                    return CRMFunctions.get_page(objects, page_size=page_size)
+                return Page(rows[:page_size][::-1], has_previous=True, has_next=True)
+
+            if after_id is not None:
+                rows = list(objects.filter(id__gt=after_id).order_by("id")[:page_size + 1])
+                has_previous = True
+            elif from_id is not None:
+                rows = list(objects.filter(id__gte=from_id).order_by("id")[:page_size + 1])
+                has_previous = objects.filter(id__lt=from_id).exists()
+            else:
+                rows = list(objects.order_by("id")[:page_size + 1])
+                has_previous = False
+            return Page(rows[:page_size], has_previous=has_previous, has_next=len(rows) > page_size)
+        except DatabaseError as e:
+            capture_exception(e)
+            raise DatabaseError("Problem with database access") from e
+
+
     @staticmethod
     def select_collaborator_from(self, list_of_collaborators: List[Collaborator],
                                 message: Optional[str] = None) -> Optional[Collaborator]:
@@ -140,10 +326,18 @@ class CRMFunctions:
         try:
             for key, value in modifications.items():
                 setattr(selected_item, key, value)
-            selected_item.full_clean()
-            selected_item.save()
+            selected_item.save_changes()
             return selected_item
 
+        except ConcurrentModificationError:
+            raise
+        except IntegrityError as e:
+            capture_exception(e)
+            duplicated = CRMFunctions.duplicated_field(
+                e, [field.name for field in selected_item._meta.concrete_fields if field.unique])
+            if duplicated is None:
+                raise DatabaseError("Problem with database access") from e
+            raise ValidationError(f"The {duplicated}: {getattr(selected_item, duplicated)} is already in use.") from e
         except ValidationError as e:
             error_message = f"Validation error while modifying the {selected_item.__class__.__name__}: {e}"
             print(error_message)
@@ -163,50 +357,54 @@ class CRMFunctions:
         modify_collaborator takes the collaborator and the modifications to apply
         the modifications to the collaborator, and also check for role changes
         """
-        if 'username' in modifications and Collaborator.objects.exclude(id=collaborator.id).filter(
-                username=modifications['username']).exists():
-
-            raise ValidationError(
-                f"The username: {modifications['username']} is already in use by another collaborator.")
-
-        if 'email' in modifications and Collaborator.objects.exclude(id=collaborator.id).filter(
-                email=modifications['email']).exists():
-            raise ValidationError(f"The email: {modifications['email']} is already in use by another collaborator.")
-
-        if 'employee_number' in modifications and Collaborator.objects.exclude(id=collaborator.id).filter(
-                employee_number=modifications['employee_number']).exists():
-            raise ValidationError(
-                f"The employee number: {modifications['employee_number']} is already in use by another collaborator.")
-
         role_modified = False
 
         if 'role_name' in modifications:
             new_role_name = modifications.pop('role_name')
             if collaborator.role.name != new_role_name:
                 role_modified = True
-                role, created = Role.objects.get_or_create(name=new_role_name)
+                role = get_role(new_role_name)
                 collaborator.role = role
 
         for field, value in modifications.items():
             setattr(collaborator, field, value)
 
         try:
-            if role_modified:
-                collaborator.groups.clear()
-                role_to_group = {
-                    'management': 'management_team',
-                    'sales': 'sales_team',
-                    'support': 'support_team',
-                }
-                new_group_name = role_to_group.get(collaborator.role.name)
-                if new_group_name:
-                    new_group, _ = Group.objects.get_or_create(name=new_group_name)
-                    collaborator.groups.add(new_group)
-
-            collaborator.save()
-            capture_message(f"Collaborator {collaborator.username} has been modified.")
-
-
+            # The group change is undone when the save is refused, a plain edit is the update alone
+            with transaction.atomic() if role_modified else nullcontext():
+                if role_modified:
+                    collaborator.groups.clear()
+                    role_to_group = {
+                        'management': 'management_team',
+                        'sales': 'sales_team',
+                        'support': 'support_team',
+                    }
+                    new_group_name = role_to_group.get(collaborator.role.name)
+                    if new_group_name:
+                        new_group = get_group(new_group_name)
+                        collaborator.groups.add(new_group)
+                    CRMFunctions.invalidate_permissions(collaborator.id)
+
+                changed = collaborator.save_changes(validate=False)
+            if changed:
+                capture_message(f"Collaborator {collaborator.username} has been modified.")
+
+
+        except ConcurrentModificationError as e:
+            capture_message(e.message)
+            raise
+        except IntegrityError as e:
+            in_use = {
+                "username": f"The username: {collaborator.username} is already in use by another collaborator.",
+                "email": f"The email: {collaborator.email} is already in use by another collaborator.",
+                "employee_number": f"The employee number: {collaborator.employee_number} is already in use by "
+                                   f"another collaborator.",
+            }
+            duplicated = CRMFunctions.duplicated_field(e, list(in_use))
+            capture_exception(e)
+            if duplicated is None:
+                raise DatabaseError("Problem with database access") from e
+            raise ValidationError(in_use[duplicated]) from e
         except ValidationError as e:
             capture_exception(e)
             raise ValidationError(f"Validation error: {e}") from e
@@ -220,13 +418,38 @@ class CRMFunctions:
 
 
     @staticmethod
-    def delete_collaborator(collaborator: Collaborator) -> None:
+    def delete_collaborator(collaborator: Collaborator, reassign_to: Optional[Collaborator] = None) -> Dict[str, int]:
         """
-        Delete the collaborator by checking if the collaborator is in use
-        and then deleting the collaborator if it is
+        Delete the collaborator, first moving their clients, contracts and events to reassign_to
+        with one update per table in the same transaction. Without reassign_to they are left
+        without contact. Return the number of rows moved per table
         """
+        if reassign_to is not None and (reassign_to.id == collaborator.id or
+                                        reassign_to.role_id != collaborator.role_id):
+            raise ValidationError("The clients, contracts and events can only be moved to another collaborator"
+                                  " with the same role.")
         try:
-            collaborator.delete()
+            with transaction.atomic():
+                moved = {"clients": 0, "contracts": 0, "events": 0, "double_booked": 0}
+                if reassign_to is not None:
+                    # Moved events overlapping an event reassign_to already had, the move still happens but
+                    # the double bookings it creates are reported, not the ones reassign_to had before
+                    moved["double_booked"] = len({event_id for pair in find_overlaps(
+                        (day_start, date_end, (support_contact_id, event_id))
+                        for event_id, support_contact_id, day_start, date_end in
+                        Evenement.objects.filter(support_contact_id__in=[collaborator.id, reassign_to.id])
+                        .values_list("id", "support_contact_id", "day_start", "date_end"))
+                        if pair[0][0] != pair[1][0] for contact_id, event_id in pair})
+                    moved["clients"] = Client.objects.filter(commercial_contact=collaborator).update(
+                        commercial_contact=reassign_to, version=F("version") + 1)
+                    moved["contracts"] = Contract.objects.filter(commercial_contact=collaborator).update(
+                        commercial_contact=reassign_to, version=F("version") + 1)
+                    moved["events"] = Evenement.objects.filter(support_contact=collaborator).update(
+                        support_contact=reassign_to, version=F("version") + 1)
+                    move_commercial_summary(collaborator.id, reassign_to.id)
+                CRMFunctions.invalidate_permissions(collaborator.id)
+                collaborator.delete()
+                return moved
 
         except DatabaseError as e:
             capture_exception(e)
@@ -234,7 +457,31 @@ class CRMFunctions:
         except Exception as e:
             capture_exception(e)
             raise Exception("Unexpected error deleting collaborator") from e
-        
+
+
+    @staticmethod
+    def count_assignments(collaborator: Collaborator) -> Dict[str, int]:
+        """
+        Number of clients, contracts and events the collaborator is the contact of
+        """
+        try:
+            return {"clients": Client.objects.filter(commercial_contact=collaborator).count(),
+                    "contracts": Contract.objects.filter(commercial_contact=collaborator).count(),
+                    "events": Evenement.objects.filter(support_contact=collaborator).count()}
+        except DatabaseError as e:
+            capture_exception(e)
+            raise DatabaseError("Problem with database access") from e
+
+
+    @staticmethod
+    def get_reassignment_candidates(collaborator: Collaborator) -> QuerySet[Collaborator]:
+        """
+        Collaborators with the same role, who can take over the clients, contracts and events
+        """
+        return Collaborator.objects.filter(role_id=collaborator.role_id).exclude(id=collaborator.id).select_related(
+            "role").order_by("id")
+
+
     @staticmethod
     def create_contract(client_infos: Client, commercial_contact: Collaborator, value: float,
                         due: float, status: str) -> Contract:
@@ -280,11 +527,13 @@ class CRMFunctions:
 
                 setattr(contract, key, value)
 
-            contract.full_clean()
-            contract.save()
+            contract.save_changes()
             print('heres the contract', contract)
             return contract
 
+        except ConcurrentModificationError as e:
+            capture_message(e.message)
+            raise
         except ValidationError as e:
             capture_exception(e)
             raise ValidationError(f"Validation error while modifying the contract: {e}")
@@ -297,14 +546,14 @@ class CRMFunctions:
 
 
     @staticmethod
-    def get_support_collaborators() -> QuerySet[Collaborator]:
+    def get_support_collaborators() -> List[Collaborator]:
         """
         Get all the support collaborators by filtering the collaborators by their role
-        which must be support and then returning the support collaborators
+        which must be support and then returning the support collaborators,
+        from the reference cache when the roster was already loaded
         """
         try:
-            support_collaborators = Collaborator.objects.filter(role__name="support")
-            return support_collaborators
+            return get_support_roster()
         except DatabaseError as e:
             capture_exception(e)
             raise DatabaseError("Problem with database access") from e
@@ -321,7 +570,7 @@ class CRMFunctions:
         """
         try:
 
-            events = Evenement.objects.all()
+            events = Evenement.objects.select_related("contract", "client", "support_contact")
             match support_contact_required:
                 case None:
                     return events
@@ -340,27 +589,93 @@ class CRMFunctions:
 
 
     @staticmethod
-    def add_support_contact_to_event(event: Evenement, support_contact: Collaborator) -> Evenement:
+    def check_support_availability(support_contact: Collaborator, day_start: datetime, date_end: datetime,
+                                   exclude_event_id: Optional[int] = None) -> None:
         """
-        Add the support contact to the event by checking if the support contact is already assigned
-        and then assigning the support contact to the event if it is not
+        Refuse to book the support contact on days overlapping one of their other events. To be run in
+        the transaction saving the booking, the row of the support contact stays locked until it ends
+        so that the concurrent bookings of the same contact are checked one after the other
         """
-        print('support vcontact final ', support_contact)
-        print('event ', event)
+        list(Collaborator.objects.select_for_update().filter(id=support_contact.id).values_list("id", flat=True))
+        conflicts = conflicting_events(support_contact.id, day_start, date_end, exclude_event_id)
+        if conflicts:
+            raise ValidationError(
+                f"{support_contact.username} is already booked on these days for "
+                f"{', '.join(f'{event} ({event.day_start} - {event.date_end})' for event in conflicts)}.")
 
-        print(event.support_contact, 'event support contact')
+
+    @staticmethod
+    def get_calendar(support_contact_id: Optional[int], start: Optional[date] = None,
+                     days: int = 7) -> QuerySet[Evenement]:
+        """
+        Events of the support contact overlapping the days from start, by default the current week
+        """
         try:
-            event.support_contact = support_contact
-            event.full_clean()
-            event.save()
-            return event
+            start = start or week_of(date.today())[0]
+            return events_between(start, start + timedelta(days=days - 1), support_contact_id)
+        except DatabaseError as e:
+            capture_exception(e)
+            raise DatabaseError("Problem with the database access") from e
+
 
+    @staticmethod
+    def find_double_bookings(events: List[Evenement]) -> List[tuple]:
+        """
+        Pairs of ids of the events whose support contact is booked on overlapping days
+        """
+        return double_bookings(events)
+
+
+    @staticmethod
+    def plan_support_assignments(max_attendees: Optional[int] = None,
+                                 since: Optional[date] = None) -> AssignmentPlan:
+        """
+        Plan support contacts for the events without one starting from since, by default today,
+        balancing the attendees handled by each support contact without double booking them
+        """
+        try:
+            events = list(CRMFunctions.get_all_events_with_optional_filter(support_contact_required=False)
+                          .filter(day_start__gte=since or date.today()))
+            return plan_assignments(events, CRMFunctions.get_support_collaborators(), max_attendees)
         except DatabaseError as e:
             capture_exception(e)
-            raise DatabaseError("Problem with the database access during the support contact assignment") from e
-        except Exception as e:
+            raise DatabaseError("Problem with the database access while planning the assignments") from e
+
+
+    @staticmethod
+    def apply_support_assignments(plan: AssignmentPlan) -> int:
+        """
+        Apply the planned assignments in one transaction and return the number of events assigned
+        """
+        try:
+            return plan.apply()
+        except DatabaseError as e:
             capture_exception(e)
-            raise Exception("Unexpected error occurred during the support contact assignment") from e
+            raise DatabaseError("Problem with the database access while applying the assignments") from e
+
+
+    @staticmethod
+    def add_support_contact_to_event(event: Evenement, support_contact: Collaborator) -> Evenement:
+        """
+        Add the support contact to the event by checking if the support contact is already assigned
+        and then assigning the support contact to the event if it is not
+        """
+        with transaction.atomic():
+            CRMFunctions.check_support_availability(support_contact, event.day_start, event.date_end, event.id)
+            try:
+                event.support_contact = support_contact
+                event.save_changes()
+                return event
+
+            except ConcurrentModificationError as e:
+                capture_message(e.message)
+                raise
+            except DatabaseError as e:
+                capture_exception(e)
+                raise DatabaseError("Problem with the database access during the support contact assignment") from e
+            except Exception as e:
+                capture_exception(e)
+                raise Exception("Unexpected error occurred during the support contact assignment") from e
 
 
     @staticmethod
@@ -370,13 +685,9 @@ class CRMFunctions:
                         company_name: str,
                         commercial_contact: Collaborator) -> Client:
         """
-        Create a client by checking if the email is already in use
-        and then creating the client if it is not
+        Create the client, the unique constraint on the email refuses
+        an email already in use within the insert itself
         """
-        if Client.objects.filter(email=email).exists():
-            raise ValidationError(f"The {email} is already in use.")
-
-
         try:
             new_client = Client(
                 name=name,
@@ -386,10 +697,16 @@ class CRMFunctions:
                 commercial_contact=commercial_contact
             )
 
-            new_client.full_clean()
+            # The commercial contact is a loaded collaborator, the foreign key constraint checks it as well
+            new_client.full_clean(exclude=["commercial_contact"], validate_unique=False)
             new_client.save()
 
             return new_client
+        except IntegrityError as e:
+            capture_exception(e)
+            if CRMFunctions.duplicated_field(e, ["email"]) is None:
+                raise DatabaseError("Problem with database access") from e
+            raise ValidationError(f"The {email} is already in use.") from e
         except ValidationError as e:
             capture_exception(e)
             raise ValidationError(f"Validation error: {e}") from e
@@ -409,12 +726,19 @@ class CRMFunctions:
         """
         try:
             for key, value in modifications.items():
-
                 setattr(client, key, value)
-                client.full_clean()
-                client.save()
-                return client
 
+            client.save_changes()
+            return client
+
+        except ConcurrentModificationError as e:
+            capture_message(e.message)
+            raise
+        except IntegrityError as e:
+            capture_exception(e)
+            if CRMFunctions.duplicated_field(e, ["email"]) is None:
+                raise DatabaseError("Problem with database access") from e
+            raise ValidationError(f"The {client.email} is already in use.") from e
         except ValidationError as e:
             capture_exception(e)
             raise ValidationError(f"Validation error while modifying the client: {e}") from e
@@ -428,57 +752,16 @@ class CRMFunctions:
 
     def get_filtered_contracts_for_collaborator(self, collaborator_id: int, filter_type: str = None) -> QuerySet[Contract]:
         """
-        Get the filtered contracts for the collaborator by checking if the filter type is None
-        and then returning all the contracts if it is
+        Get the contracts of the clients of the collaborator matching the filter type,
+        in a single query joining the clients, or all of them if the filter type is None
         """
-        try:
-            # Récupérer les clients associés au collaborateur
-
-            clients = self.get_clients_for_collaborator(collaborator_id)
-            print('clients', clients)
-            
-            # Filtrer les contrats en utilisant la clé étrangère 'client_infos'
-            contracts = Contract.objects.filter(client_infos__in=clients)
-            print('contracts', contracts)
-
-            # Afficher le type de filtre et les statuts distincts dans la base de données
-            print('filter_type:', filter_type)
-            distinct_statuses = Contract.objects.values_list('status', flat=True).distinct()
-            print('Distinct statuses in the database:', distinct_statuses)
-            
-            # Afficher tous les contrats avec leur statut avant d'appliquer le filtre
-            for contract in contracts:
-                print(f'Contract ID: {contract.id}, Status: {contract.status}')
-            
-            # Appliquer les filtres supplémentaires en fonction du type de filtre
-            match filter_type:
-                case "signed":
-                    print('heres the contracts SIGNED 1', contracts)
-                    contracts = contracts.filter(status="signed")
-                    print('heres the contracts SIGNED', contracts)
-                case "not_signed":
-                    contracts = contracts.filter(status="not_signed")
-                    print('heres the contracts NOT SIGNED', contracts)
-                case "no_fully_paid":
-                    contracts = contracts.filter(status="open")
-                    print('heres the contracts OPEN', contracts)
-                case None:
-                    print('no additional filter applied')
-                    pass  # Pas de filtrage supplémentaire si filter_type est None
-                case _:
-                    raise ValueError(f"Unsupported filter type: {filter_type}")
-            
-            # Afficher tous les contrats avec leur statut après avoir appliqué le filtre
-            for contract in contracts:
-                print(f'Filtered Contract ID: {contract.id}, Status: {contract.status}')
-            
-            # Vérifier si des contrats existent après les filtres
-            if not contracts.exists():
-                print('There are no contracts to display')
-            else:
-                print('Filtered contracts:', contracts)
+        if filter_type not in CONTRACT_FILTERS:
+            raise ValueError(f"Unsupported filter type: {filter_type}")
 
-            return contracts
+        try:
+            return (Contract.objects
+                    .filter(CONTRACT_FILTERS[filter_type], client_infos__commercial_contact_id=collaborator_id)
+                    .select_related("client_infos", "commercial_contact"))
         except DatabaseError as e:
             capture_exception(e)
             raise DatabaseError("Problem with database access") from e
@@ -530,48 +813,94 @@ class CRMFunctions:
             support_contact_obj = Collaborator.objects.get(username=support_contact)
         except Collaborator.DoesNotExist:
             raise ValueError(f"Support contact '{support_contact}' not found")
+        with transaction.atomic():
+            CRMFunctions.check_support_availability(support_contact_obj, day_start, date_end)
+
+            try:
+                event = Evenement.objects.create(
+                    contract=contract,
+                    client=client,
+                    client_name=client_name,
+                    name=name,
+                    client_contact=client_contact,
+                    support_contact=support_contact_obj,
+                    day_start=day_start,
+                    date_end=date_end,
+                    location=location,
+                    attendees=attendees,
+                    notes=notes
+                )
+                print(f"Event '{event}' created successfully.")
+                return event
+            except ValidationError as e:
+                capture_exception(e)
+                raise ValidationError(f"ValidationError: {e}") from e
+            except DatabaseError as e:
+                capture_exception(e)
+                raise DatabaseError(f"DatabaseError: {e}") from e
+            except Exception as e:
+                capture_exception(e)
+                raise Exception(f"An unexpected error occurred while creating the event: {e}") from e
 
+
+    @staticmethod
+    def get_events_for_collaborator(collaborator_id: int) -> QuerySet[Evenement]:
+        """
+        Get all the events for the collaborator by checking if the support contact
+        is already assigned and then returning the events accordingly
+        """
         try:
-            event = Evenement.objects.create(
-                contract=contract,
-                client=client,
-                client_name=client_name,
-                name=name,
-                client_contact=client_contact,
-                support_contact=support_contact_obj,
-                day_start=day_start,
-                date_end=date_end,
-                location=location,
-                attendees=attendees,
-                notes=notes
-            )
-            print(f"Event '{event}' created successfully.")
-            return event
-        except ValidationError as e:
-            capture_exception(e)
-            raise ValidationError(f"ValidationError: {e}") from e
+            return Evenement.objects.filter(support_contact_id=collaborator_id).select_related("contract", "client",
+                                                                                              "support_contact")
         except DatabaseError as e:
             capture_exception(e)
-            raise DatabaseError(f"DatabaseError: {e}") from e
+            raise DatabaseError("Problem with the database access") from e
         except Exception as e:
             capture_exception(e)
-            raise Exception(f"An unexpected error occurred while creating the event: {e}") from e
+            print(f"Error retrieving events for collaborator {collaborator_id}: {e}")
 
 
     @staticmethod
-    def get_events_for_collaborator(collaborator_id: int) -> QuerySet[Evenement]:
+    def get_commercial_summaries() -> QuerySet[CommercialFinancialSummary]:
         """
-        Get all the events for the collaborator by checking if the support contact
-        is already assigned and then returning the events accordingly
+        Get the contract figures of each commercial contact from the maintained summaries,
+        one row per commercial contact whatever the number of contracts
         """
-        print("Collaborator ID:", collaborator_id)
         try:
-
-            print("Dans le try")
-            return Evenement.objects.filter(support_contact_id=collaborator_id)
+            return CommercialFinancialSummary.objects.select_related("commercial_contact").order_by(
+                "-total_value")
         except DatabaseError as e:
             capture_exception(e)
             raise DatabaseError("Problem with the database access") from e
-        except Exception as e:
+
+
+    @staticmethod
+    def search(text: str, limit: int = 20) -> Dict[str, list]:
+        """
+        Full-text search over the clients, their contracts and the events, best matches first
+        """
+        return search(text, limit)
+
+
+    @staticmethod
+    def get_management_dashboard(days: int = 30, months: int = 12) -> dict:
+        """
+        Get the management KPIs: signed revenue per month, outstanding balances,
+        events per support contact, upcoming and unassigned events
+        """
+        return get_management_dashboard(days, months)
+
+
+    @staticmethod
+    def get_client_summaries(collaborator_id: Optional[int] = None) -> QuerySet[ClientFinancialSummary]:
+        """
+        Get the contract figures of each client, optionally only the clients of a commercial contact
+        """
+        try:
+            summaries = ClientFinancialSummary.objects.select_related("client").order_by("-total_due")
+            if collaborator_id is not None:
+                summaries = summaries.filter(client__commercial_contact_id=collaborator_id)
+            return summaries
+        except DatabaseError as e:
             capture_exception(e)
-            print(f"Error retrieving events for collaborator {collaborator_id}: {e}")
+            raise DatabaseError("Problem with the database access") from e
@@ -0,0 +1,81 @@
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Optional
+from django.db import DatabaseError
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from crm.models import ClientFinancialSummary, Collaborator, Contract, Evenement
+from services.reference_cache import ReferenceCache
+from services.reporting import capture_exception
+
+
+# The figures may lag the database by this many seconds, repeated views within it cost no query
+DASHBOARD_TTL = 60
+TOP_CLIENTS = 5
+UPCOMING_EVENTS = 10
+
+dashboard_cache = ReferenceCache(ttl=DASHBOARD_TTL, max_entries=16)
+
+
+def get_management_dashboard(days: int = 30, months: int = 12, today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Get the management KPIs, each computed by a single aggregate query in the database
+    and cached for DASHBOARD_TTL seconds
+    """
+    today = today or date.today()
+    return dashboard_cache.get(("dashboard", days, months, today), lambda: compute_dashboard(days, months, today))
+
+
+def compute_dashboard(days: int, months: int, today: date) -> Dict[str, Any]:
+    try:
+        horizon = today + timedelta(days=days)
+        upcoming = Q(day_start__gte=today, day_start__lte=horizon)
+        return {
+            "today": today,
+            "days": days,
+            "months": months,
+            "signed_revenue": signed_revenue_per_month(months, today),
+            "outstanding": outstanding_balances(),
+            "top_debtors": list(ClientFinancialSummary.objects.filter(total_due__gt=0).select_related("client")
+                                .order_by("-total_due")[:TOP_CLIENTS]),
+            "events": Evenement.objects.aggregate(
+                total=Count("id"),
+                unassigned=Count("id", filter=Q(support_contact__isnull=True)),
+                upcoming=Count("id", filter=upcoming),
+                upcoming_unassigned=Count("id", filter=upcoming & Q(support_contact__isnull=True))),
+            "support_load": list(Collaborator.objects.filter(role__name="support")
+                                 .annotate(event_count=Count("evenement"),
+                                           upcoming_count=Count("evenement", filter=Q(
+                                               evenement__day_start__gte=today,
+                                               evenement__day_start__lte=horizon)))
+                                 .order_by("-upcoming_count", "-event_count", "username")
+                                 .values("username", "first_name", "last_name", "event_count", "upcoming_count")),
+            "upcoming_events": list(Evenement.objects.filter(upcoming).select_related("support_contact")
+                                    .order_by("day_start", "id")[:UPCOMING_EVENTS]),
+        }
+    except DatabaseError as e:
+        capture_exception(e)
+        raise DatabaseError("Problem with the database access") from e
+
+
+def signed_revenue_per_month(months: int, today: date):
+    """
+    Value of the contracts signed per creation month, over the last months including the current one
+    """
+    first_month = today.replace(day=1)
+    for _ in range(months - 1):
+        first_month = (first_month - timedelta(days=1)).replace(day=1)
+    since = datetime.combine(first_month, time.min, tzinfo=timezone.utc)
+    return list(Contract.objects.filter(status="signed", creation_date__gte=since).order_by()
+                .annotate(month=TruncMonth("creation_date")).values("month")
+                .annotate(contract_count=Count("id"), revenue=Sum("value"))
+                .order_by("month"))
+
+
+def outstanding_balances() -> Dict[str, float]:
+    """
+    Amount still due over all the clients, from the maintained client summaries
+    """
+    return ClientFinancialSummary.objects.aggregate(
+        due=Sum("total_due", default=0),
+        value=Sum("total_value", default=0),
+        clients_with_due=Count("client", filter=Q(total_due__gt=0)))
@@ -0,0 +1,169 @@
+import threading
+from contextlib import contextmanager
+from typing import Dict, FrozenSet, Iterator, Optional
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from crm.models import ClientFinancialSummary, CommercialFinancialSummary, Contract
+
+
+# Summary models with the contract field they aggregate on
+SUMMARIES = [
+    (ClientFinancialSummary, "client_id", "client_infos_id"),
+    (CommercialFinancialSummary, "commercial_contact_id", "commercial_contact_id"),
+]
+CONTRACT_FIELDS = ["client_infos_id", "commercial_contact_id", "value", "due", "status"]
+
+# Set in the threads running bulk_changes, whose contract saves and deletions leave the summaries alone
+paused = threading.local()
+
+
+def figures(contract: Dict) -> Dict[str, float]:
+    """
+    What a single contract adds to the summaries it belongs to
+    """
+    return {
+        "contract_count": 1,
+        "signed_count": int(contract["status"] == "signed"),
+        "not_signed_count": int(contract["status"] == "not_signed"),
+        "total_value": contract["value"],
+        "total_due": contract["due"],
+    }
+
+
+def apply_change(old: Optional[Dict], new: Optional[Dict]) -> None:
+    """
+    Move the figures of a contract from the summaries of its old values to those of its new ones,
+    with one relative update per summary row so that concurrent changes add up
+    """
+    if old == new:
+        return
+    with transaction.atomic():
+        for model, key, contract_field in SUMMARIES:
+            if old and new and old[contract_field] == new[contract_field]:
+                # Same summary row, a single update with the difference
+                if old[contract_field] is not None:
+                    shift(model, key, old[contract_field], figures(old), figures(new))
+                continue
+            if old and old[contract_field] is not None:
+                subtract(model, key, old[contract_field], figures(old))
+            if new and new[contract_field] is not None:
+                add(model, key, new[contract_field], figures(new))
+
+
+def shift(model, key: str, key_value: int, old: Dict[str, float], new: Dict[str, float]) -> None:
+    deltas = {name: new[name] - old[name] for name in new if new[name] != old[name]}
+    if deltas:
+        model.objects.filter(**{key: key_value}, **{f"{name}__gte": -delta for name, delta in deltas.items()
+                                                    if name.endswith("_count") and delta < 0}).update(
+            **{name: F(name) + delta for name, delta in deltas.items()})
+
+
+def subtract(model, key: str, key_value: int, values: Dict[str, float]) -> None:
+    # A summary out of date (counts lower than the contract) is left for the rebuild
+    # rather than made negative
+    model.objects.filter(**{key: key_value}, **{f"{name}__gte": value for name, value in values.items()
+                                                if name.endswith("_count")}).update(
+        **{name: F(name) - value for name, value in values.items()})
+
+
+def add(model, key: str, key_value: int, values: Dict[str, float]) -> None:
+    increments = {name: F(name) + value for name, value in values.items()}
+    if model.objects.filter(**{key: key_value}).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**{key: key_value}, **values)
+    except IntegrityError:
+        # Created meanwhile by another session
+        model.objects.filter(**{key: key_value}).update(**increments)
+
+
+def move_commercial_summary(from_id: int, to_id: int) -> None:
+    """
+    Add the summary of a commercial contact to another one, after their contracts
+    were moved with a queryset update that sent no signal
+    """
+    summary = CommercialFinancialSummary.objects.filter(commercial_contact_id=from_id).values(
+        "contract_count", "signed_count", "not_signed_count", "total_value", "total_due").first()
+    if summary and summary["contract_count"]:
+        add(CommercialFinancialSummary, "commercial_contact_id", to_id, summary)
+    CommercialFinancialSummary.objects.filter(commercial_contact_id=from_id).delete()
+
+
+def rebuild() -> None:
+    """
+    Recompute every summary from the contracts, in a single aggregate query per summary
+    """
+    with transaction.atomic():
+        for model, key, contract_field in SUMMARIES:
+            model.objects.all().delete()
+            model.objects.bulk_create([model(**{key: row.pop(contract_field)}, **row)
+                                       for row in aggregate(contract_field)], batch_size=1000)
+
+
+@contextmanager
+def bulk_changes() -> Iterator[None]:
+    """
+    Stop maintaining the summaries contract by contract during bulk imports and
+    deletions, which then stay fast and set-based, and rebuild them at the end.
+    Only for the current thread, the contracts saved meanwhile by others still update them
+    """
+    was_paused = getattr(paused, "active", False)
+    paused.active = True
+    try:
+        yield
+    finally:
+        paused.active = was_paused
+    if not was_paused:
+        rebuild()
+
+
+def summaries_paused() -> bool:
+    return getattr(paused, "active", False)
+
+
+def aggregate(contract_field: str):
+    return (Contract.objects.filter(**{f"{contract_field}__isnull": False}).order_by()
+            .values(contract_field)
+            .annotate(contract_count=Count("id"),
+                      signed_count=Count("id", filter=Q(status="signed")),
+                      not_signed_count=Count("id", filter=Q(status="not_signed")),
+                      total_value=Sum("value"),
+                      total_due=Sum("due")))
+
+
+def changes_summaries(update_fields: Optional[FrozenSet[str]]) -> bool:
+    # A save limited to other columns leaves the summaries as they are
+    return update_fields is None or any(Contract._meta.get_field(name).attname in CONTRACT_FIELDS
+                                        for name in update_fields)
+
+
+@receiver(pre_save, sender=Contract)
+def remember_saved_values(sender, instance: Contract, update_fields=None, **kwargs):
+    instance._summary_values = None
+    if instance.pk is None or kwargs.get("raw") or summaries_paused() or not changes_summaries(update_fields):
+        return
+    # The values the instance was loaded with, the version check refuses the save if the row changed since.
+    # An instance not loaded from the database has none and they are read
+    saved = getattr(instance, "_saved_values", None)
+    if saved is not None and not instance._state.adding and all(field in saved for field in CONTRACT_FIELDS):
+        instance._summary_values = {field: saved[field] for field in CONTRACT_FIELDS}
+    else:
+        instance._summary_values = Contract.objects.filter(pk=instance.pk).values(*CONTRACT_FIELDS).first()
+
+
+@receiver(post_save, sender=Contract)
+def update_summaries_on_save(sender, instance: Contract, raw: bool = False, update_fields=None, **kwargs):
+    if raw or summaries_paused() or not changes_summaries(update_fields):
+        return
+    apply_change(getattr(instance, "_summary_values", None),
+                 {field: getattr(instance, field) for field in CONTRACT_FIELDS})
+
+
+@receiver(post_delete, sender=Contract)
+def update_summaries_on_delete(sender, instance: Contract, **kwargs):
+    if summaries_paused():
+        return
+    apply_change({field: getattr(instance, field) for field in CONTRACT_FIELDS}, None)
@@ -0,0 +1,126 @@
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from crm.models import Client, Collaborator
+
+
+class PrefixIndex:
+    """
+    Case-insensitive prefix index over the names of a table, a sorted array of
+    (lowercase name, name, id) searched with bisect. It is loaded on first use
+    and then kept up to date one row at a time. The rows saved by other sessions
+    are found with fetch, a case-insensitive query of one name
+    """
+    def __init__(self, load: Callable[[], Iterable[Tuple[int, str]]],
+                 fetch: Optional[Callable[[str], Optional[Tuple[int, str]]]] = None):
+        self.load = load
+        self.fetch = fetch
+        self.entries: Optional[List[Tuple[str, str, int]]] = None
+        self.names: Dict[int, str] = {}
+
+    def ensure_loaded(self) -> List[Tuple[str, str, int]]:
+        if self.entries is None:
+            self.names = {object_id: name for object_id, name in self.load()}
+            self.entries = sorted((name.lower(), name, object_id) for object_id, name in self.names.items())
+        return self.entries
+
+    def complete(self, prefix: str, limit: int = 10) -> List[str]:
+        """
+        Names starting with the prefix, whatever their case, in alphabetical order
+        """
+        entries = self.ensure_loaded()
+        prefix = prefix.lower()
+        completions = []
+        for position in range(bisect_left(entries, (prefix,)), len(entries)):
+            key, name, object_id = entries[position]
+            if not key.startswith(prefix) or len(completions) >= limit:
+                break
+            if name not in completions:
+                completions.append(name)
+        return completions
+
+    def find(self, name: str) -> Optional[str]:
+        """
+        The indexed name equal to this one regardless of case
+        """
+        entries = self.ensure_loaded()
+        position = bisect_left(entries, (name.lower(),))
+        if position < len(entries) and entries[position][0] == name.lower():
+            return entries[position][1]
+        return None
+
+    def lookup(self, name: str) -> Optional[str]:
+        """
+        The name equal to this one regardless of case, from the index or else from the
+        database, where another session may have created it after the index was loaded
+        """
+        found = self.find(name)
+        if found is not None or self.fetch is None:
+            return found
+        row = self.fetch(name)
+        if row is None:
+            return None
+        self.update(*row)
+        return row[1]
+
+    def update(self, object_id: int, name: str) -> None:
+        if self.entries is None:
+            return
+        self.remove(object_id)
+        self.names[object_id] = name
+        insort(self.entries, (name.lower(), name, object_id))
+
+    def remove(self, object_id: int) -> None:
+        if self.entries is None or object_id not in self.names:
+            return
+        name = self.names.pop(object_id)
+        position = bisect_left(self.entries, (name.lower(), name, object_id))
+        if position < len(self.entries) and self.entries[position][2] == object_id:
+            del self.entries[position]
+
+    def clear(self) -> None:
+        """
+        Forget the names, the next use loads them again
+        """
+        self.entries = None
+        self.names = {}
+
+
+client_names = PrefixIndex(
+    lambda: Client.objects.values_list("id", "name").iterator(chunk_size=5000),
+    lambda name: Client.objects.filter(name__iexact=name).values_list("id", "name").first())
+collaborator_usernames = PrefixIndex(
+    lambda: Collaborator.objects.values_list("id", "username").iterator(chunk_size=5000),
+    lambda name: Collaborator.objects.filter(username__iexact=name).values_list("id", "username").first())
+support_usernames = PrefixIndex(
+    lambda: Collaborator.objects.filter(role__name="support").values_list("id", "username").iterator(chunk_size=5000),
+    lambda name: Collaborator.objects.filter(role__name="support", username__iexact=name)
+    .values_list("id", "username").first())
+
+
+@receiver(post_save, sender=Client)
+def index_client(sender, instance: Client, **kwargs):
+    client_names.update(instance.id, instance.name)
+
+
+@receiver(post_delete, sender=Client)
+def unindex_client(sender, instance: Client, **kwargs):
+    client_names.remove(instance.id)
+
+
+@receiver(post_save, sender=Collaborator)
+def index_collaborator(sender, instance: Collaborator, **kwargs):
+    collaborator_usernames.update(instance.id, instance.username)
+    # The role is only looked at once the support index is loaded
+    if support_usernames.entries is not None:
+        if instance.role_id is not None and instance.role.name == "support":
+            support_usernames.update(instance.id, instance.username)
+        else:
+            support_usernames.remove(instance.id)
+
+
+@receiver(post_delete, sender=Collaborator)
+def unindex_collaborator(sender, instance: Collaborator, **kwargs):
+    collaborator_usernames.remove(instance.id)
+    support_usernames.remove(instance.id)
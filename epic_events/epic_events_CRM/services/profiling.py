@@ -0,0 +1,183 @@
+import functools
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List, Optional, TextIO
+import click
+
+
+# View methods asking for the next menu choice, each choice starts a new action
+MENU_CHOICE_METHODS = ("get_user_menu_choice", "get_collaborator_choice")
+# View methods counted as rendering
+RENDER_PREFIXES = ("display_", "show_", "clear_screen")
+
+
+class ActionProfiler:
+    """
+    Profile the CLI one menu action at a time: SQL statements through a connection
+    execute wrapper, service, controller and rendering calls through wrappers
+    installed on their classes, and the time spent waiting for the user's input.
+    A summary is written at the end of each action
+    """
+    def __init__(self, output: Optional[TextIO] = None, slowest: int = 5):
+        self.output = output or sys.stderr
+        self.slowest = slowest
+        self.action = None
+        self.depths = defaultdict(int)
+        self.reset()
+
+    def reset(self) -> None:
+        self.started = time.perf_counter()
+        self.queries = []
+        self.totals = defaultdict(float)
+        self.calls = defaultdict(lambda: [0, 0.0])
+
+    def record_query(self, execute: Callable, sql: str, params, many: bool, context: dict):
+        """
+        Execute wrapper timing each statement, installed with connection.execute_wrapper
+        """
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, repr(params), time.perf_counter() - started))
+
+    def timed(self, category: str, name: str, function: Callable) -> Callable:
+        """
+        Wrap the function to add its duration to the category. Nested calls of
+        the same category are only counted once, in their outermost call
+        """
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            self.depths[category] += 1
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.depths[category] -= 1
+                if not self.depths[category]:
+                    elapsed = time.perf_counter() - started
+                    self.totals[category] += elapsed
+                    self.calls[(category, name)][0] += 1
+                    self.calls[(category, name)][1] += elapsed
+        return wrapper
+
+    def menu_choice(self, name: str, function: Callable) -> Callable:
+        """
+        Wrap a menu choice prompt: the current action ends before the prompt
+        and the chosen option starts the next one
+        """
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            self.end_action()
+            choice = function(*args, **kwargs)
+            self.action = f"{name} -> {choice}"
+            self.reset()
+            return choice
+        return wrapper
+
+    def instrument(self, cls: type, category: str, methods: Optional[Callable[[str], bool]] = None) -> None:
+        """
+        Replace the public methods defined by the class, or those accepted by methods,
+        with timed wrappers
+        """
+        for name, attribute in list(vars(cls).items()):
+            if name.startswith("_") or (methods and not methods(name)):
+                continue
+            label = f"{cls.__name__}.{name}"
+            if isinstance(attribute, staticmethod):
+                setattr(cls, name, staticmethod(self.timed(category, label, attribute.__func__)))
+            elif callable(attribute) and not isinstance(attribute, type):
+                setattr(cls, name, self.timed(category, label, attribute))
+
+    def instrument_view(self, cls: type) -> None:
+        for name in MENU_CHOICE_METHODS:
+            if name in vars(cls):
+                function = vars(cls)[name]
+                if isinstance(function, staticmethod):
+                    setattr(cls, name, staticmethod(self.menu_choice(f"{cls.__name__}", function.__func__)))
+                else:
+                    setattr(cls, name, self.menu_choice(f"{cls.__name__}", function))
+        self.instrument(cls, "render", lambda name: name.startswith(RENDER_PREFIXES))
+
+    def instrument_input(self) -> None:
+        # The views call click.prompt through the module, patching it covers every prompt
+        click.prompt = self.timed("input", "click.prompt", click.prompt)
+
+    def end_action(self) -> None:
+        if self.action is not None:
+            self.write_summary()
+        self.action = None
+
+    def write_summary(self) -> None:
+        wall = time.perf_counter() - self.started
+        sql_time = sum(duration for sql, params, duration in self.queries)
+        lines = [f"[profile] {self.action}: {wall * 1000:.1f}ms, of which {self.totals['input'] * 1000:.1f}ms "
+                 f"waiting for input",
+                 f"  sql: {len(self.queries)} queries in {sql_time * 1000:.1f}ms | services: "
+                 f"{self.totals['service'] * 1000:.1f}ms | controllers: {self.totals['controller'] * 1000:.1f}ms "
+                 f"| render: {self.totals['render'] * 1000:.1f}ms"]
+
+        if self.queries:
+            lines.append("  slowest statements:")
+            for sql, params, duration in sorted(self.queries, key=lambda query: query[2], reverse=True)[
+                    :self.slowest]:
+                lines.append(f"    {duration * 1000:8.2f}ms  {shorten(sql)}")
+
+        duplicates = self.duplicates()
+        if duplicates:
+            lines.append("  duplicated statements:")
+            for sql, count, identical in duplicates:
+                kind = "same parameters" if identical else "different parameters, N+1 pattern"
+                lines.append(f"    {count:>4}x  {shorten(sql)} ({kind})")
+
+        calls = sorted(((category, name, count, elapsed) for (category, name), (count, elapsed)
+                        in self.calls.items() if category in ("service", "render")),
+                       key=lambda call: call[3], reverse=True)[:self.slowest]
+        if calls:
+            lines.append("  slowest calls:")
+            for category, name, count, elapsed in calls:
+                lines.append(f"    {elapsed * 1000:8.2f}ms  {name} ({count}x, {category})")
+
+        self.output.write("\n".join(lines) + "\n")
+        self.output.flush()
+
+    def duplicates(self) -> List[tuple]:
+        """
+        Statements run more than once in the action, with whether they always
+        had the same parameters
+        """
+        counts = Counter(sql for sql, params, duration in self.queries)
+        parameters: Dict[str, set] = defaultdict(set)
+        for sql, params, duration in self.queries:
+            parameters[sql].add(params)
+        return [(sql, count, len(parameters[sql]) == 1) for sql, count in counts.most_common() if count > 1]
+
+
+def shorten(sql: str, length: int = 150) -> str:
+    sql = " ".join(sql.split())
+    return sql if len(sql) <= length else sql[:length - 3] + "..."
+
+
+def install_profiler(output: Optional[TextIO] = None) -> ActionProfiler:
+    """
+    Create the profiler and instrument the services, controllers and views.
+    The role modules are imported here, in profile mode startup time does not matter
+    """
+    from controllers.crm_controllers import CRMController, ROLE_MENUS, import_class
+    from controllers.menus.general_controller import GeneralController
+    from services.crm_functions import CRMFunctions
+    from views.crm_base_view import BaseView
+    from views.crm_views import CRMView
+    from views.menus.general_view import GeneralView
+
+    profiler = ActionProfiler(output)
+    profiler.instrument(CRMFunctions, "service")
+    # start is the menu loop itself, timing it would hold every action in a single call
+    for controller in [CRMController, GeneralController] + [import_class(path) for path, view in ROLE_MENUS.values()]:
+        profiler.instrument(controller, "controller", lambda name: name != "start")
+    for view in [BaseView, CRMView, GeneralView] + [import_class(view) for path, view in ROLE_MENUS.values()]:
+        profiler.instrument_view(view)
+    profiler.instrument_input()
+    profiler.action = "login"
+    return profiler
@@ -0,0 +1,90 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List
+from django.contrib.auth.models import Group
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from crm.models import Collaborator, Role
+
+
+SUPPORT_ROSTER_KEY = "support_roster"
+
+
+class ReferenceCache:
+    """
+    In-process cache for rarely changing reference data, whose entries expire
+    after ttl seconds and are evicted least recently used first beyond max_entries
+    """
+    def __init__(self, ttl: float = 300, max_entries: int = 128):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def get(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        """
+        Return the cached value of the key, or load it and cache it
+        if it is missing or expired
+        """
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.entries.move_to_end(key)
+            return entry[1]
+
+        value = load()
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return value
+
+    def invalidate(self, *keys: Hashable) -> None:
+        for key in keys:
+            self.entries.pop(key, None)
+
+    def invalidate_prefix(self, prefix: str) -> None:
+        for key in [key for key in self.entries if isinstance(key, str) and key.startswith(prefix)]:
+            del self.entries[key]
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+reference_cache = ReferenceCache()
+
+
+def get_role(role_name: str) -> Role:
+    """
+    Get the role with this name, creating it the first time it is needed
+    """
+    return reference_cache.get(f"role:{role_name}", lambda: Role.objects.get_or_create(name=role_name)[0])
+
+
+def get_group(group_name: str) -> Group:
+    """
+    Get the group with this name, creating it the first time it is needed
+    """
+    return reference_cache.get(f"group:{group_name}", lambda: Group.objects.get_or_create(name=group_name)[0])
+
+
+def get_support_roster() -> List[Collaborator]:
+    """
+    Get the collaborators with the support role
+    """
+    return reference_cache.get(SUPPORT_ROSTER_KEY, lambda: list(
+        Collaborator.objects.filter(role__name="support").select_related("role")))
+
+
+@receiver([post_save, post_delete], sender=Role)
+def invalidate_roles(sender, **kwargs):
+    reference_cache.invalidate_prefix("role:")
+    reference_cache.invalidate(SUPPORT_ROSTER_KEY)
+
+
+@receiver([post_save, post_delete], sender=Group)
+def invalidate_groups(sender, **kwargs):
+    reference_cache.invalidate_prefix("group:")
+
+
+@receiver([post_save, post_delete], sender=Collaborator)
+def invalidate_support_roster(sender, **kwargs):
+    reference_cache.invalidate(SUPPORT_ROSTER_KEY)
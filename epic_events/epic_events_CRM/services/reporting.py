@@ -0,0 +1,224 @@
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional
+
+
+SPOOL_PATH = os.getenv("SENTRY_SPOOL_PATH", "sentry_spool.jsonl")
+
+# Share of the transactions traced and profiled for each operation type,
+# the other operations use the default rates
+TRACES_SAMPLE_RATES = {
+    "cli.login": 1.0,
+    "cli.menu_action": 0.05,
+    "cli.command": 0.01,
+}
+DEFAULT_TRACES_SAMPLE_RATE = float(os.getenv("SENTRY_TRACES_SAMPLE_RATE", "0.0"))
+PROFILES_SAMPLE_RATES = {
+    "cli.menu_action": 0.01,
+}
+DEFAULT_PROFILES_SAMPLE_RATE = float(os.getenv("SENTRY_PROFILES_SAMPLE_RATE", "0.0"))
+
+
+def get_operation(sampling_context: dict) -> Optional[str]:
+    return (sampling_context.get("transaction_context") or {}).get("op")
+
+
+def traces_sampler(sampling_context: dict) -> float:
+    """
+    Sample rate of a transaction according to its operation type
+    """
+    return TRACES_SAMPLE_RATES.get(get_operation(sampling_context), DEFAULT_TRACES_SAMPLE_RATE)
+
+
+def profiles_sampler(sampling_context: dict) -> float:
+    """
+    Profiling rate of a transaction according to its operation type
+    """
+    return PROFILES_SAMPLE_RATES.get(get_operation(sampling_context), DEFAULT_PROFILES_SAMPLE_RATE)
+
+
+# Set once Sentry initialization has started and once it is over, the reports sent
+# meanwhile wait for it rather than being spooled
+sentry_init_started = threading.Event()
+sentry_ready = threading.Event()
+SENTRY_INIT_TIMEOUT = 3.0
+
+
+def init_sentry() -> None:
+    """
+    Import and initialize Sentry with the sample rates chosen per operation type
+    """
+    sentry_init_started.set()
+    try:
+        import sentry_sdk
+        sentry_sdk.init(
+            dsn=os.getenv("SENTRY_DSN"),
+            traces_sampler=traces_sampler,
+            profiles_sampler=profiles_sampler,
+        )
+    finally:
+        sentry_ready.set()
+
+
+def init_sentry_in_background() -> None:
+    """
+    Initialize Sentry in a background thread, marked as started before the
+    thread runs so that no report or operation can miss it
+    """
+    sentry_ready.clear()
+    sentry_init_started.set()
+    threading.Thread(target=init_sentry, name="sentry-init", daemon=True).start()
+
+
+def sentry_client():
+    """
+    The Sentry client when Sentry is imported and initialized with a DSN, None otherwise.
+    Initialized without a DSN the client is active but has no transport
+    """
+    sentry_sdk = sys.modules.get("sentry_sdk")
+    if sentry_sdk is None:
+        return None
+    client = sentry_sdk.get_client()
+    return client if client.is_active() and getattr(client, "transport", None) is not None else None
+
+
+@contextmanager
+def operation(op: str, name: str) -> Iterator[None]:
+    """
+    Run the block in a Sentry transaction of this operation type, which traces_sampler
+    and profiles_sampler rate by their op. Nothing is traced when Sentry is not initialized,
+    it is not imported here for that, an initialization in progress is waited for
+    """
+    if sentry_init_started.is_set():
+        sentry_ready.wait(SENTRY_INIT_TIMEOUT)
+    if sentry_client() is None:
+        yield
+        return
+    with sys.modules["sentry_sdk"].start_transaction(op=op, name=name):
+        yield
+
+
+class BufferedReporter:
+    """
+    Collect the messages and exceptions reported by the CRM and send them
+    by batches from a background thread, to Sentry when it is configured and
+    reachable, otherwise to a local JSONL spool file
+    """
+    def __init__(self, spool_path: str = SPOOL_PATH, batch_size: int = 50, flush_interval: float = 2.0):
+        self.spool_path = spool_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.events = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.flushing = threading.Event()
+
+    def submit(self, event: dict) -> None:
+        """
+        Queue the event and return at once
+        """
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.run, name="crm-reporter", daemon=True)
+                    self.thread.start()
+        self.events.put(event)
+
+    def run(self) -> None:
+        while True:
+            batch = [self.events.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and not self.flushing.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.events.get(timeout=min(remaining, 0.05)))
+                except queue.Empty:
+                    continue
+            try:
+                self.send(batch)
+            except Exception as e:
+                # The batch is lost, the thread goes on with the next events
+                print(f"Could not send or spool {len(batch)} reported events: {type(e).__name__}: {e}",
+                      file=sys.stderr)
+            finally:
+                for _ in batch:
+                    self.events.task_done()
+
+    def send(self, batch: List[dict]) -> None:
+        """
+        Send the batch to Sentry and spool the events that could not be sent.
+        Sentry is imported here, in the background thread, to keep it out of the CLI startup
+        """
+        if sentry_init_started.is_set():
+            sentry_ready.wait(SENTRY_INIT_TIMEOUT)
+        import sentry_sdk
+        client = sentry_client()
+        if client is None or not client.transport.is_healthy():
+            self.spool(batch)
+            return
+
+        failed = []
+        for event in batch:
+            try:
+                if "error" in event:
+                    sentry_sdk.capture_exception(event["error"])
+                else:
+                    sentry_sdk.capture_message(event["message"], level=event["level"])
+            except Exception:
+                failed.append(event)
+        if failed:
+            self.spool(failed)
+
+    def spool(self, batch: List[dict]) -> None:
+        with open(self.spool_path, "a", encoding="utf-8") as spool_file:
+            for event in batch:
+                record = {key: value for key, value in event.items() if key != "error"}
+                if "error" in event:
+                    error = event["error"]
+                    record["message"] = str(error)
+                    record["exception"] = type(error).__name__
+                    record["traceback"] = "".join(traceback.format_exception(error))
+                spool_file.write(json.dumps(record) + "\n")
+
+    def flush(self, timeout: float = 2.0) -> None:
+        """
+        Wait until the queued events are sent or spooled, then until Sentry
+        has delivered them, at most timeout seconds
+        """
+        deadline = time.monotonic() + timeout
+        self.flushing.set()
+        try:
+            while self.events.unfinished_tasks and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            self.flushing.clear()
+        if sentry_client() is not None:
+            sys.modules["sentry_sdk"].flush(timeout=max(deadline - time.monotonic(), 0))
+
+
+reporter = BufferedReporter()
+atexit.register(reporter.flush)
+
+
+def capture_message(message: str, level: str = "info") -> None:
+    """
+    Report a message without waiting for it to be sent
+    """
+    reporter.submit({"timestamp": datetime.now(timezone.utc).isoformat(), "level": level, "message": message})
+
+
+def capture_exception(error: BaseException) -> None:
+    """
+    Report an exception without waiting for it to be sent
+    """
+    reporter.submit({"timestamp": datetime.now(timezone.utc).isoformat(), "level": "error", "error": error})
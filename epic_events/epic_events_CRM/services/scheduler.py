@@ -0,0 +1,110 @@
+import heapq
+from bisect import bisect_right
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+from django.db import transaction
+from django.db.models import F
+from crm.models import Collaborator, Evenement
+from services.calendar import as_day, events_between
+
+
+class AssignmentPlan:
+    """
+    Support contacts proposed for the unassigned events, with the events
+    no support contact could take and why
+    """
+    def __init__(self):
+        self.assignments: List[Tuple[Evenement, Collaborator]] = []
+        self.unassigned: List[Tuple[Evenement, str]] = []
+        # Attendees handled by each support contact over the planned days, by id
+        self.loads: Dict[int, int] = {}
+        self.support_contacts: Dict[int, Collaborator] = {}
+
+    def apply(self) -> int:
+        """
+        Assign the support contacts in a single transaction, one update per support contact.
+        Events assigned by someone else meanwhile keep their support contact
+        """
+        by_contact: Dict[int, List[int]] = {}
+        for event, support_contact in self.assignments:
+            by_contact.setdefault(support_contact.id, []).append(event.id)
+        with transaction.atomic():
+            return sum(Evenement.objects.filter(id__in=event_ids, support_contact__isnull=True)
+                       .update(support_contact_id=support_contact_id, version=F("version") + 1)
+                       for support_contact_id, event_ids in by_contact.items())
+
+
+class Bookings:
+    """
+    Days booked by one support contact, kept as disjoint intervals sorted by start,
+    so only the last one starting before an interval ends can overlap it
+    """
+    def __init__(self):
+        self.intervals: List[Tuple[date, date]] = []
+
+    def is_free(self, start: date, end: date) -> bool:
+        position = bisect_right(self.intervals, (end, date.max))
+        return position == 0 or self.intervals[position - 1][1] < start
+
+    def book(self, start: date, end: date) -> None:
+        # Merge with the bookings it overlaps, existing data may already hold double bookings
+        position = bisect_right(self.intervals, (start, date.max))
+        if position and self.intervals[position - 1][1] >= start:
+            position -= 1
+            start, end = self.intervals[position][0], max(end, self.intervals[position][1])
+            del self.intervals[position]
+        while position < len(self.intervals) and self.intervals[position][0] <= end:
+            end = max(end, self.intervals[position][1])
+            del self.intervals[position]
+        self.intervals.insert(position, (start, end))
+
+
+def plan_assignments(events: List[Evenement], support_contacts: List[Collaborator],
+                     max_attendees: Optional[int] = None) -> AssignmentPlan:
+    """
+    Greedy plan balancing the attendees handled by each support contact: the events are taken
+    by start day, largest first, and each goes to the least loaded contact free on its days.
+    The contacts are kept in a heap by load, those skipped because busy are pushed back afterwards.
+    max_attendees is the largest event a single support contact can handle
+    """
+    plan = AssignmentPlan()
+    plan.support_contacts = {contact.id: contact for contact in support_contacts}
+    if not events:
+        return plan
+    if not support_contacts:
+        plan.unassigned = [(event, "no support contact") for event in events]
+        return plan
+
+    window_start = min(as_day(event.day_start) for event in events)
+    window_end = max(as_day(event.date_end) for event in events)
+    bookings = {contact.id: Bookings() for contact in support_contacts}
+    plan.loads = {contact.id: 0 for contact in support_contacts}
+    # Existing bookings in the window, the load counts their attendees too
+    for contact_id, day_start, date_end, attendees in events_between(window_start, window_end).filter(
+            support_contact_id__in=list(bookings)).values_list("support_contact_id", "day_start", "date_end",
+                                                               "attendees"):
+        bookings[contact_id].book(day_start, date_end)
+        plan.loads[contact_id] += attendees
+
+    heap = [(plan.loads[contact.id], contact.id, contact) for contact in support_contacts]
+    heapq.heapify(heap)
+    for event in sorted(events, key=lambda event: (as_day(event.day_start), -event.attendees, event.id)):
+        if max_attendees is not None and event.attendees > max_attendees:
+            plan.unassigned.append((event, f"more than {max_attendees} attendees"))
+            continue
+
+        start, end = as_day(event.day_start), as_day(event.date_end)
+        busy = []
+        while heap and not bookings[heap[0][1]].is_free(start, end):
+            busy.append(heapq.heappop(heap))
+        if heap:
+            load, contact_id, contact = heapq.heappop(heap)
+            bookings[contact_id].book(start, end)
+            plan.loads[contact_id] = load + event.attendees
+            plan.assignments.append((event, contact))
+            heapq.heappush(heap, (plan.loads[contact_id], contact_id, contact))
+        else:
+            plan.unassigned.append((event, "every support contact is booked on these days"))
+        for entry in busy:
+            heapq.heappush(heap, entry)
+    return plan
@@ -0,0 +1,72 @@
+import re
+from typing import Dict, List
+from django.db import DatabaseError, connection
+from crm.models import Client, Contract, Evenement
+from services.reporting import capture_exception
+
+
+# Searched columns of each table, the same as the index created by the 0012_search_index migration
+SEARCHED_COLUMNS = {
+    "crm_client": ["name", "company_name", "email"],
+    "crm_evenement": ["name", "location", "notes"],
+}
+SEARCH_LIMIT = 20
+
+
+def terms(text: str) -> List[str]:
+    """
+    Words of the search text, without the characters the full-text query syntaxes give a meaning to
+    """
+    return [term for term in re.split(r"[^\w]+", text.lower()) if term]
+
+
+def match_query(text: str) -> str:
+    """
+    Full-text query requiring every word of the text, each as a prefix
+    """
+    if connection.vendor == "mysql":
+        return " ".join(f"+{term}*" for term in terms(text))
+    return " ".join(f'"{term}"*' for term in terms(text))
+
+
+def ranked_ids(table: str, text: str, limit: int) -> List[int]:
+    """
+    Ids of the rows of the table matching the text, best ranked first
+    """
+    query = match_query(text)
+    if not query:
+        return []
+    with connection.cursor() as cursor:
+        if connection.vendor == "mysql":
+            match = f"MATCH ({', '.join(SEARCHED_COLUMNS[table])}) AGAINST (%s IN BOOLEAN MODE)"
+            cursor.execute(f"SELECT id FROM {table} WHERE {match} ORDER BY {match} DESC, id LIMIT %s",
+                           [query, query, limit])
+        else:
+            cursor.execute(f"SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH %s ORDER BY rank, rowid LIMIT %s",
+                           [query, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def in_rank_order(queryset, ids: List[int]) -> list:
+    objects = queryset.in_bulk(ids)
+    return [objects[object_id] for object_id in ids if object_id in objects]
+
+
+def search(text: str, limit: int = SEARCH_LIMIT) -> Dict[str, list]:
+    """
+    Search the clients by name, company and email, their contracts, and the events
+    by name, location and notes, each list ranked by relevance
+    """
+    try:
+        client_ids = ranked_ids("crm_client", text, limit)
+        clients = in_rank_order(Client.objects.select_related("commercial_contact"), client_ids)
+        rank = {client_id: position for position, client_id in enumerate(client_ids)}
+        contracts = sorted(Contract.objects.filter(client_infos_id__in=client_ids)
+                           .select_related("client_infos", "commercial_contact")[:limit],
+                           key=lambda contract: (rank[contract.client_infos_id], contract.id)) if client_ids else []
+        events = in_rank_order(Evenement.objects.select_related("support_contact"),
+                               ranked_ids("crm_evenement", text, limit))
+        return {"clients": clients, "contracts": contracts, "events": events}
+    except DatabaseError as e:
+        capture_exception(e)
+        raise DatabaseError("Problem with the database access") from e
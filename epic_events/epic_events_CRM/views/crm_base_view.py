@@ -1,6 +1,6 @@
 import re
 from typing import List
-from typing import Optional, Any, Union
+from typing import Optional, Any, Tuple, Union
 from django.db.models.query import QuerySet
 import click
 from rich.box import ROUNDED
@@ -8,6 +8,7 @@ from rich.console import Console
 from rich.table import Table
 from rich.text import Text
 from crm.models import Contract, Client, Evenement, Collaborator
+from services.crm_functions import CRMFunctions, Page
 
 
 class BaseView:
@@ -114,14 +115,40 @@ class BaseView:
 
         console.print(message_text)
 
-    def display_list(self, objects: List, object_type: str) -> None:
+    def display_list(self, objects: Union[QuerySet, List], object_type: str) -> None:
         """
-        Display a list of objects according to the object_type str passed as parameter
+        Display a list of objects according to the object_type str passed as parameter,
+        one page at a time when a queryset is passed
+        """
+        if object_type.lower() not in ("events", "clients", "contracts"):
+            Console().print("Unsupported object type.")
+            return
+
+        if not isinstance(objects, QuerySet):
+            self.display_list_page(objects, object_type)
+            return
+
+        page = CRMFunctions.get_page(objects)
+        while True:
+            self.display_list_page(page.objects, object_type)
+            self.display_page_position(page)
+
+            if not page.has_previous and not page.has_next:
+                return
+
+            action, object_id = self.get_page_navigation_choice(page, allow_selection=False)
+            if action == "quit":
+                return
+            page = self.navigate_to_page(objects, page, action, object_id)
+            self.clear_screen()
+
+    def display_list_page(self, objects: List, object_type: str) -> None:
+        """
+        Display one page of objects according to the object_type str passed as parameter
         """
         console = Console()
         table = Table(title=f"List of all {object_type}", show_header=True, header_style="bold magenta", expand=True)
 
-        print('object_type', object_type)
         # Create columns based on object type
         if object_type.lower() == "events":
             table.add_column("ID", style="dim", width=10)
@@ -150,7 +177,6 @@ class BaseView:
             table.add_column("Creation Date", style="dim", width=20)
             table.add_column("Status", style="dim", width=15)
         else:
-            console.print("Unsupported object type.")
             return
 
         # Fill the table with objects' data
@@ -190,6 +216,89 @@ class BaseView:
         # Print the table using Rich
         console.print(table)
 
+    def display_page_position(self, page: Page) -> None:
+        """
+        Display the range of IDs shown on the current page
+        """
+        if not page.objects:
+            self.display_info_message("There is nothing to display on this page.")
+            return
+        self.display_message(f"IDs {page.first_id} to {page.last_id}"
+                             f"{' - more on the next page' if page.has_next else ''}")
+
+    def get_page_navigation_choice(self, page: Page, allow_selection: bool,
+                                   model_name: str = "") -> Tuple[str, Optional[int]]:
+        """
+        Ask the user to move to the next or previous page, to jump to an ID,
+        or to select an ID when allow_selection is True, and return the action
+        with the ID it applies to
+        """
+        options = []
+        if page.has_next:
+            options.append("n: next page")
+        if page.has_previous:
+            options.append("p: previous page")
+        options.append("j: jump to an ID")
+
+        if allow_selection:
+            prompt_text = f"Please enter the ID of the {model_name} you wish to select ({', '.join(options)})"
+        else:
+            options.append("q: quit the list")
+            prompt_text = f"Navigation ({', '.join(options)})"
+
+        while True:
+            choice = click.prompt(prompt_text, type=str).strip().lower()
+
+            if choice == "n" and page.has_next:
+                return "next", None
+            if choice == "p" and page.has_previous:
+                return "previous", None
+            if choice == "j":
+                return "jump", click.prompt("ID to jump to", type=int)
+            if choice == "q" and not allow_selection:
+                return "quit", None
+            if choice.isdigit() and allow_selection:
+                return "select", int(choice)
+            self.display_error_message("Invalid choice. Please try again.")
+
+    @staticmethod
+    def navigate_to_page(objects: QuerySet, page: Page, action: str, object_id: Optional[int] = None) -> Page:
+        """
+        Fetch the page matching the navigation action chosen by the user
+        """
+        if action == "next":
+            return CRMFunctions.get_page(objects, after_id=page.last_id)
+        if action == "previous":
+            return CRMFunctions.get_page(objects, before_id=page.first_id)
+        return CRMFunctions.get_page(objects, from_id=object_id)
+
+    def select_object_in_pages(self, objects: QuerySet, model_name: str,
+                               message: Optional[str] = None) -> Optional[Any]:
+        """
+        Display the objects one page at a time, let the user navigate
+        between the pages and return the object matching the selected ID
+        """
+        page = CRMFunctions.get_page(objects)
+        while True:
+            self.clear_screen()
+            if page.objects:
+                self.display_objects_for_selection(page.objects)
+            self.display_page_position(page)
+            if message:
+                self.display_info_message(message)
+
+            action, object_id = self.get_page_navigation_choice(page, allow_selection=True, model_name=model_name)
+            while action == "select":
+                selected_object = next((obj for obj in page.objects if obj.id == object_id), None)
+                if selected_object is None:
+                    selected_object = objects.filter(id=object_id).first()
+                if selected_object is not None:
+                    return selected_object
+                self.display_error_message(f"Invalid {model_name} ID. Please choose from the list.")
+                action, object_id = self.get_page_navigation_choice(page, allow_selection=True,
+                                                                    model_name=model_name)
+            page = self.navigate_to_page(objects, page, action, object_id)
+
     # ==========================  Management Controller    ===============================
 
     def show_menu(self, collaborator_name: str, menu_options: List[str]) -> None:
@@ -366,7 +475,7 @@ class BaseView:
 
         # Fill the table with contracts data
         for contract in contracts:
-            client_name = contract.client.full_name if contract.client.full_name else "No Name"
+            client_name = contract.client_infos.name or "No Name"
             status = contract.get_status_display()
 
             table.add_row(
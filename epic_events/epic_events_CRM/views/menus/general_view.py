@@ -5,14 +5,21 @@ from colorama import Fore, Style
 from typing import List, Any
 from rich.console import Console
 from rich.table import Table
-from crm.models import Contract, Client, Evenement, Collaborator 
-from datetime import datetime, timezone, timedelta
+from crm.models import Contract, Client, Evenement, Collaborator, ConcurrentModificationError
+from datetime import date, datetime, timezone, timedelta
 from django.utils.timezone import make_aware
 from django.utils.timezone import get_default_timezone
 from dateutil.parser import parse
 from typing import Optional
 from django.core.exceptions import ValidationError
 from django.db import DatabaseError
+from services.prefix_index import PrefixIndex, client_names, support_usernames
+
+try:
+    import readline
+except ImportError:
+    # Not available on Windows, the prompts then work without tab completion
+    readline = None
 
 
 class GeneralView(BaseView):
@@ -261,7 +268,7 @@ class GeneralView(BaseView):
         if new_name:
             modification_data["name"] = new_name
 
-        new_client_name = self.get_valid_input_with_limit("New Client Name (or leave blank)", 100, allow_blank=True)
+        new_client_name = self.get_indexed_name("New Client Name (or leave blank)", client_names, allow_blank=True)
         if new_client_name:
             modification_data["client_name"] = new_client_name
 
@@ -360,10 +367,11 @@ class GeneralView(BaseView):
             for key, value in modifications.items():
                 setattr(event, key, value)
 
-            event.full_clean()
-            event.save()
+            event.save_changes()
             return event
 
+        except ConcurrentModificationError:
+            raise
         except ValidationError as e:
             raise ValidationError(f"Validation error while modifying the event: {e}")
         except DatabaseError as e:
@@ -372,13 +380,17 @@ class GeneralView(BaseView):
             raise Exception(f"Unexpected error occurred while modifying the event: {e}")
 
 
-    def get_data_for_add_new_event(self) -> dict:
+    def get_data_for_add_new_event(self) -> Optional[dict]:
         self.display_info_message("Please provide the following information for the new event")
 
-        client_name = self.get_valid_input_with_limit("Client Name", 100)
+        client_name = self.get_indexed_name("Client Name", client_names)
+        if client_name is None:
+            return None
         name = self.get_valid_input_with_limit("Name", 255)
         client_contact = self.get_valid_input_with_limit("Client Contact", 1000)
-        support_contact = self.get_valid_input_with_limit("support Contact", 1000)
+        support_contact = self.get_indexed_name("Support Contact username", support_usernames)
+        if support_contact is None:
+            return None
         day_start = self.get_valid_start_date()
         date_end = self.get_valid_end_date(day_start)
         location = self.get_valid_input_with_limit("Location", 300)
@@ -413,3 +425,139 @@ class GeneralView(BaseView):
                     continue
 
                 return user_input_int
+
+
+    def get_search_text(self) -> str:
+        while True:
+            text = click.prompt("Search clients, contracts and events", type=str).strip()
+            if text:
+                return text
+            self.display_warning_message("The search cannot be empty.")
+
+
+    @staticmethod
+    def display_search_results(results: dict) -> None:
+        console = Console()
+        if results.get("clients"):
+            table = Table(title="Clients", show_header=True, header_style="bold magenta")
+            table.add_column("ID", style="dim", width=8)
+            table.add_column("Full Name", width=20)
+            table.add_column("Company Name", width=20)
+            table.add_column("Email", width=30)
+            for client in results["clients"]:
+                table.add_row(str(client.id), client.name, client.company_name, client.email)
+            console.print(table)
+
+        if results.get("contracts"):
+            table = Table(title="Contracts", show_header=True, header_style="bold magenta")
+            table.add_column("ID", style="dim", width=8)
+            table.add_column("Client Name", width=20)
+            table.add_column("Total Amount", justify="right", width=12)
+            table.add_column("Amount Remaining", justify="right", width=15)
+            table.add_column("Status", width=12)
+            for contract in results["contracts"]:
+                table.add_row(str(contract.id), contract.client_infos.name, f"${contract.value:.2f}",
+                              f"${contract.due:.2f}", contract.status)
+            console.print(table)
+
+        if results.get("events"):
+            table = Table(title="Events", show_header=True, header_style="bold magenta")
+            table.add_column("ID", style="dim", width=8)
+            table.add_column("Name", width=20)
+            table.add_column("Client Name", width=20)
+            table.add_column("Start Date", width=12)
+            table.add_column("Location", width=20)
+            table.add_column("Notes", width=30)
+            for event in results["events"]:
+                table.add_row(str(event.id), event.name or "No Named", event.client_name,
+                              event.day_start.strftime("%Y-%m-%d"), event.location, event.notes or "No Notes")
+            console.print(table)
+
+
+    def prompt_with_completion(self, prompt_text: str, index: PrefixIndex) -> str:
+        """
+        Prompt with the tab key completing from the index, when readline is available
+        """
+        if readline is None:
+            return click.prompt(prompt_text, type=str, default="", show_default=False).strip()
+
+        def complete(text: str, state: int) -> Optional[str]:
+            completions = index.complete(readline.get_line_buffer().lstrip())
+            return completions[state] if state < len(completions) else None
+
+        previous_completer, previous_delimiters = readline.get_completer(), readline.get_completer_delims()
+        readline.set_completer(complete)
+        # Names may contain spaces, complete the whole line
+        readline.set_completer_delims("")
+        readline.parse_and_bind("tab: complete")
+        try:
+            return click.prompt(prompt_text, type=str, default="", show_default=False).strip()
+        finally:
+            readline.set_completer(previous_completer)
+            readline.set_completer_delims(previous_delimiters)
+
+
+    def get_indexed_name(self, prompt_text: str, index: PrefixIndex, allow_blank: bool = False) -> Optional[str]:
+        """
+        Ask for a name of the index, suggesting the names starting with the input
+        instead of failing on a typo. A blank answer is returned as is when allowed,
+        otherwise it cancels and None is returned
+        """
+        while True:
+            if allow_blank:
+                user_input = self.prompt_with_completion(prompt_text, index)
+                if user_input == "":
+                    return user_input
+            else:
+                user_input = self.prompt_with_completion(f"{prompt_text} (leave blank to cancel)", index)
+                if not user_input:
+                    return None
+
+            name = index.lookup(user_input)
+            if name is not None:
+                return name
+
+            completions = index.complete(user_input, limit=5)
+            if len(completions) == 1:
+                if self.get_user_confirmation(f"Did you mean {completions[0]}?"):
+                    return completions[0]
+            elif completions:
+                self.display_info_message(f"Matching names: {', '.join(completions)}")
+            else:
+                self.display_error_message(f"No name starts with '{user_input}'. Please try again.")
+
+
+    def get_calendar_start(self) -> date:
+        """
+        First day of the calendar, the Monday of the current week when left blank
+        """
+        while True:
+            start = click.prompt("First day (YYYY-MM-DD, or leave blank for this week)", default="",
+                                 show_default=False).strip()
+            if not start:
+                return date.today() - timedelta(days=date.today().weekday())
+            try:
+                return datetime.strptime(start, "%Y-%m-%d").date()
+            except ValueError:
+                self.display_error_message("Invalid date format. Please use YYYY-MM-DD.")
+
+
+    @staticmethod
+    def display_calendar(events: List[Evenement], start: date, days: int, double_booked: set) -> None:
+        """
+        Display the events day by day, flagging those overlapping another event of the same support contact
+        """
+        table = Table(title=f"Calendar from {start:%Y-%m-%d} to {start + timedelta(days=days - 1):%Y-%m-%d}",
+                      show_header=True, header_style="bold magenta", show_lines=True)
+        table.add_column("Day", width=14)
+        table.add_column("Events", width=70)
+        for offset in range(days):
+            day = start + timedelta(days=offset)
+            lines = [f"{'[red]! [/red]' if event.id in double_booked else ''}{event.id} - "
+                     f"{event.name or 'No Named'} ({event.client_name}, {event.location}, "
+                     f"{event.day_start:%m-%d} to {event.date_end:%m-%d})"
+                     for event in events if event.day_start <= day <= event.date_end]
+            table.add_row(f"{day:%a %Y-%m-%d}", "\n".join(lines) or "-")
+        Console().print(table)
+        if double_booked:
+            Console().print("[red]![/red] overlaps another event of the same support contact")
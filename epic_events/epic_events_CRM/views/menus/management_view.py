@@ -311,3 +311,110 @@ class ManagementView(BaseView):
                 modification_data["company_name"] = new_company_name
 
             return modification_data
+
+
+    def display_dashboard(self, dashboard: dict) -> None:
+        """
+        Display the management KPIs computed by services.dashboard
+        """
+        self.clear_screen()
+        console = Console()
+
+        outstanding = dashboard["outstanding"]
+        events = dashboard["events"]
+        overview = Table(title=f"Dashboard - {dashboard['today']:%Y-%m-%d}", show_header=True,
+                         header_style="bold blue")
+        overview.add_column("Indicator", style="dim", width=40)
+        overview.add_column("Value", justify="right", width=20)
+        overview.add_row("Outstanding balance", f"${outstanding['due']:.2f}")
+        overview.add_row("Clients with an amount due", str(outstanding["clients_with_due"]))
+        overview.add_row("Events without support contact", str(events["unassigned"]))
+        overview.add_row(f"Events in the next {dashboard['days']} days", str(events["upcoming"]))
+        overview.add_row("  of which without support contact", str(events["upcoming_unassigned"]))
+        console.print(overview)
+
+        revenue = Table(title=f"Signed revenue, last {dashboard['months']} months", show_header=True,
+                        header_style="bold magenta")
+        revenue.add_column("Month", width=12)
+        revenue.add_column("Contracts", justify="right", width=10)
+        revenue.add_column("Revenue", justify="right", width=15)
+        for row in dashboard["signed_revenue"]:
+            revenue.add_row(f"{row['month']:%Y-%m}", str(row["contract_count"]), f"${row['revenue']:.2f}")
+        console.print(revenue)
+
+        debtors = Table(title="Largest outstanding balances", show_header=True, header_style="bold magenta")
+        debtors.add_column("Client", width=25)
+        debtors.add_column("Contracts", justify="right", width=10)
+        debtors.add_column("Amount Remaining", justify="right", width=17)
+        for summary in dashboard["top_debtors"]:
+            debtors.add_row(summary.client.name, str(summary.contract_count), f"${summary.total_due:.2f}")
+        console.print(debtors)
+
+        support = Table(title="Events per support contact", show_header=True, header_style="bold magenta")
+        support.add_column("Support Contact", width=25)
+        support.add_column("Events", justify="right", width=10)
+        support.add_column(f"Next {dashboard['days']} days", justify="right", width=14)
+        for row in dashboard["support_load"]:
+            name = f"{row['first_name']} {row['last_name']}".strip() or row["username"]
+            support.add_row(name, str(row["event_count"]), str(row["upcoming_count"]))
+        console.print(support)
+
+        upcoming = Table(title="Upcoming events", show_header=True, header_style="bold magenta")
+        upcoming.add_column("ID", style="dim", width=8)
+        upcoming.add_column("Client Name", width=20)
+        upcoming.add_column("Start Date", width=12)
+        upcoming.add_column("Support Contact", width=25)
+        for event in dashboard["upcoming_events"]:
+            upcoming.add_row(str(event.id), event.client_name, event.day_start.strftime("%Y-%m-%d"),
+                             event.support_contact.get_full_name() if event.support_contact
+                             else "No Contact Assigned")
+        console.print(upcoming)
+
+
+    def get_max_attendees(self) -> Optional[int]:
+        while True:
+            max_attendees = click.prompt("Largest number of attendees a support contact can handle "
+                                         "(or leave blank for no limit)", default="", show_default=False).strip()
+            if not max_attendees:
+                return None
+            if max_attendees.isdigit() and int(max_attendees) > 0:
+                return int(max_attendees)
+            self.display_error_message("Please enter a positive integer.")
+
+
+    @staticmethod
+    def display_assignment_plan(plan) -> None:
+        """
+        Display the planned assignments, the events left without support contact and the resulting loads
+        """
+        console = Console()
+        if plan.assignments:
+            table = Table(title="Planned assignments", show_header=True, header_style="bold magenta")
+            table.add_column("Event ID", style="dim", width=10)
+            table.add_column("Client Name", width=20)
+            table.add_column("Days", width=25)
+            table.add_column("Attendees", justify="right", width=10)
+            table.add_column("Support Contact", width=25)
+            for event, support_contact in plan.assignments:
+                table.add_row(str(event.id), event.client_name, f"{event.day_start} - {event.date_end}",
+                              str(event.attendees), support_contact.get_full_name() or support_contact.username)
+            console.print(table)
+
+        if plan.unassigned:
+            table = Table(title="Events left without support contact", show_header=True, header_style="bold red")
+            table.add_column("Event ID", style="dim", width=10)
+            table.add_column("Client Name", width=20)
+            table.add_column("Reason", width=50)
+            for event, reason in plan.unassigned:
+                table.add_row(str(event.id), event.client_name, reason)
+            console.print(table)
+
+        if plan.loads:
+            table = Table(title="Attendees per support contact over the planned days", show_header=True,
+                          header_style="bold magenta")
+            table.add_column("Support Contact", width=25)
+            table.add_column("Attendees", justify="right", width=10)
+            for contact_id, load in sorted(plan.loads.items(), key=lambda item: -item[1]):
+                support_contact = plan.support_contacts[contact_id]
+                table.add_row(support_contact.get_full_name() or support_contact.username, str(load))
+            console.print(table)
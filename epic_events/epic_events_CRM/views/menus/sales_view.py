@@ -31,7 +31,7 @@ class SalesView(BaseView):
         console.print(table)
 
     def get_user_menu_choice(self) -> int:
-        choice = self.get_collaborator_choice(limit=7)
+        choice = self.get_collaborator_choice(limit=8)
 
         return choice
 
@@ -31,7 +31,9 @@ class SupportView(BaseView):
         "3 - View the list of all events.",
         "4 - View your assigned events.",
         "5 - Modify one of your assigned events.",
-        "6 - Exit of CRM system."
+        "6 - Search clients, contracts and events.",
+        "7 - View your calendar.",
+        "8 - Exit of CRM system."
     ]
     MENU_LIMIT = len(MENU_OPTIONS)
 